@@ -1,14 +1,65 @@
+import os
+import time
 import streamlit as st
-from functions.management import Management
+from driver.chrome_driver import Driver
+from functions.browser_pool import BrowserPool, PoolExhausted
+from functions.http_reader import HttpConfigReader
+from functions.cache import TariffCache
+from functions.jobs import JobManager
+from functions.snapshot import SnapshotStore, drift
+from functions.tariff_index import TariffIndex
+from functions.management import DEFAULT_TENANT
+from functions.instrumentation import tracer
+from functions.throttle import limiter
 import pandas as pd
 
 st.set_page_config(page_title="Automated configs", layout="centered")
 
+CONFIG_REFRESH_SECONDS = int(os.environ.get("CONFIG_REFRESH_SECONDS", 300))  # refresco periódico de la lista
+LEASE_TIMEOUT = float(os.environ.get("LEASE_TIMEOUT", 60))  # espera máxima por un navegador libre del pool
+POOL_BUSY = "Todos los navegadores están ocupados con otros trabajos; inténtalo de nuevo en unos segundos."
+
+
+@st.cache_resource
+def tariff_cache():
+    """Caché en disco de tarifas y fechas de actualización, compartida entre sesiones"""
+    return TariffCache()
+
+
+@st.cache_resource
+def browser_pool():
+    """Navegadores ya lanzados y autenticados, compartidos por todas las sesiones del servidor"""
+    pool = BrowserPool(size=int(os.environ.get("BROWSER_POOL_SIZE", 4)))
+    pool.warm(1)
+    return pool
+
+
+@st.cache_resource
+def snapshot_store():
+    """Instantáneas en Parquet de las tablas de precios de todas las configuraciones"""
+    return SnapshotStore()
+
+
+@st.cache_resource
+def job_manager():
+    """Réplicas y escaneos en segundo plano: sobreviven a recargas de la página y se reanudan tras una caída"""
+    return JobManager(browser_pool=browser_pool(), cache=tariff_cache(), snapshots=snapshot_store())
+
+
+def http_reader(workers: int = 8):
+    """Lector HTTP con las cookies de un navegador del pool ya autenticado"""
+    with browser_pool().lease(ss.platform_user, timeout=LEASE_TIMEOUT, tenant=ss.tenant) as manage:
+        return HttpConfigReader.from_management(manage, workers=workers)
+
+
 # Estado incial:
 
 ss = st.session_state
 ss.setdefault("logged_in", False)
-ss.setdefault("manage", None)                # Sesión/cliente ya autenticado
+ss.setdefault("platform_user", None)         # Usuario con el que se piden navegadores al pool compartido
+ss.setdefault("account", None)               # Clave del usuario (y cliente) en las cachés persistentes
+ss.setdefault("tenant", None)                # Cliente impersonado
+ss.setdefault("config_index", {})            # { "cfg_name": "URL de edición" }
 ss.setdefault("configs", [])                 # lista completa de configuraciones
 ss.setdefault("origin", None)                # Selección actual de origen (1 único)
 ss.setdefault("destinations", [])            # Selección actual de destinos (>1)
@@ -16,13 +67,376 @@ ss.setdefault("origin_tariff", None)
 ss.setdefault("last_origin_checked", None)
 ss.setdefault("login_password", None)
 
-ss.setdefault("tariff_by_config", {})        # { "cfg_name": "2.0TD", ... }
-ss.setdefault("last_updated_by_config", {})  # { cfg: "YYYY-MM-DD ..." }
+ss.setdefault("tariff_index", TariffIndex())  # tarifa y última actualización de cada cfg, indexadas por tarifa
 ss.setdefault("last_filtered_origin", None)  # para no recalcular en cada rerun
 ss.setdefault("incompatible_cfgs", [])       # para mostrar cuáles quedaron fuera
 ss.setdefault("data_config", {})             # Datos de la configuración origen a replicar
 ss.setdefault("apply_mode", False)           # Tras pulsar "Aplicar selección"
-ss.setdefault("last_replication_summary", None) # {updated: [], failed: [], total: int}
+ss.setdefault("last_replication_summary", None) # {updated: [], failed: [], total: int, results: []}
+ss.setdefault("detect_workers", int(os.environ.get("DETECT_WORKERS", 4)))  # navegadores en paralelo para detectar tarifas
+ss.setdefault("batch_budget", float(os.environ.get("BATCH_BUDGET", 0)) or None)  # segundos máximos por lote (None = sin límite)
+ss.setdefault("scan_job_id", None)           # Trabajo de fondo que detecta las tarifas pendientes
+ss.setdefault("replication_job_id", None)    # Trabajo de fondo de la réplica en curso
+ss.setdefault("snapshot_job_id", None)       # Trabajo de fondo que toma la instantánea de precios
+ss.setdefault("timing_since", None)          # Inicio de la última ejecución para el panel de tiempos
+ss.setdefault("configs_refreshed_at", 0.0)   # Última lectura de la lista de configuraciones
+ss.setdefault("config_list_changes", None)   # {added: [], removed: []} del último refresco
+ss.setdefault("auto_refresh", False)         # Refrescar la lista en segundo plano cada CONFIG_REFRESH_SECONDS
+
+# ------------ TRABAJOS EN SEGUNDO PLANO ------------
+
+@st.fragment(run_every=1.0)
+def scan_progress():
+    """Progreso del escaneo de tarifas; al terminar vuelca las tarifas en la sesión y recarga la app"""
+    job = job_manager().get(ss.scan_job_id)
+    if job is None or job["status"] in ("done", "failed"):
+        if job is not None:
+            for cfg in job["items"]:
+                found = job["tariffs"].get(cfg)
+                if found and found["error"] is None:
+                    ss.tariff_index.set(cfg, found["tariff"], found["last_updated"])
+                elif cfg not in ss.tariff_index.tariffs:
+                    ss.tariff_index.set(cfg, None)
+        ss.scan_job_id = None
+        st.rerun()
+
+    total = job["total"] or 1
+    st.progress(job["completed"] / total, text=f"Calculando tarifas... ({job['completed']}/{job['total']})")
+
+
+@st.fragment(run_every=1.0)
+def replication_progress():
+    """Progreso de la réplica; al terminar deja el resumen para el siguiente run y recarga la app"""
+    job = job_manager().get(ss.replication_job_id)
+    if job is None or job["status"] in ("done", "failed"):
+        if job is not None:
+            summary = job_manager().summary(job["id"])
+            summary["error"] = job["error"]
+            for r in summary["results"]:
+                if r["status"] in ("updated", "skipped"):
+                    # Refrescamos la fecha (también de los que ya coincidían) para que el icono cambie en el rerun():
+                    ss.tariff_index.set_last_updated(r["destination"], r["last_updated"] or "")
+            ss.last_replication_summary = summary
+        ss.replication_job_id = None
+        ss.apply_mode = False
+        st.rerun()
+
+    total = job["total"] or 1
+    if job["phase"] == "preflight":
+        st.progress(job["compared"] / total, text=f"Comparando destinos con el origen... ({job['compared']}/{job['total']})")
+    elif job["phase"] == "replication":
+        st.progress(job["completed"] / total, text=f"Replicando... ({job['completed']}/{job['total']})")
+    else:
+        st.progress(0.0, text="Iniciando réplica...")
+    st.caption("La réplica continúa en segundo plano aunque recargues la página.")
+
+
+@st.fragment(run_every=1.0)
+def snapshot_progress():
+    """Progreso de la instantánea de precios; las tarifas leídas también actualizan la sesión"""
+    job = job_manager().get(ss.snapshot_job_id)
+    if job is None or job["status"] in ("done", "failed"):
+        if job is not None:
+            for cfg, found in job["tariffs"].items():
+                if found["error"] is None:
+                    ss.tariff_index.set(cfg, found["tariff"], found["last_updated"])
+            if job["error"]:
+                st.error(f"La instantánea se detuvo: {job['error']}")
+        ss.snapshot_job_id = None
+        st.rerun()
+
+    total = job["total"] or 1
+    st.progress(job["completed"] / total, text=f"Leyendo tablas de precios... ({job['completed']}/{job['total']})")
+
+
+def snapshot_panel():
+    """Toma de instantáneas y consultas de deriva sobre la última, sin visitar las configuraciones"""
+    if ss.snapshot_job_id is None:
+        ss.snapshot_job_id = job_manager().active(ss.account, "snapshot")
+    if ss.snapshot_job_id is not None:
+        snapshot_progress()
+    elif st.button("Tomar instantánea de todas las configuraciones"):
+        ss.snapshot_job_id = job_manager().submit_snapshot(
+            ss.platform_user, ss.account, ss.configs, workers=ss.detect_workers,
+            config_index=ss.config_index, batch_budget=ss.batch_budget, tenant=ss.tenant
+        )
+        st.rerun()
+
+    df = snapshot_store().load(ss.account)
+    if df is None:
+        st.caption("Aún no hay ninguna instantánea de esta cuenta.")
+        return
+    taken_at = df["taken_at"].iloc[0].tz_convert(None) if len(df) else None
+    st.caption(
+        f"Última instantánea: {df['config'].nunique()} configuraciones, tomada el {taken_at:%d/%m/%Y %H:%M} UTC"
+        if taken_at is not None else "La última instantánea está vacía."
+    )
+    if not len(df):
+        return
+
+    configs = sorted(df["config"].unique())
+    col1, col2 = st.columns(2)
+    with col1:
+        origin = st.selectbox("Comparar con", configs,
+                              index=configs.index(ss.origin) if ss.origin in configs else 0)
+        origin_tariff = df.loc[df["config"] == origin, "tariff"].iloc[0]
+        same_tariff = st.checkbox(f"Sólo tarifa {origin_tariff}", value=True)
+    with col2:
+        periods = sorted(df.loc[df["config"] == origin, "period"].unique())
+        period = st.selectbox("Periodo", ["Todos"] + periods)
+        field = st.selectbox("Precio", ["Todos", "energy", "power"],
+                             format_func={"Todos": "Todos", "energy": "Energía", "power": "Potencia"}.get)
+
+    result = drift(df, origin, tariff=origin_tariff if same_tariff else None,
+                   period=None if period == "Todos" else period, field=None if field == "Todos" else field)
+    st.caption(f"{result['config'].nunique()} configuraciones difieren de {origin}")
+    st.dataframe(result, hide_index=True, use_container_width=True)
+
+
+# ------------ PANELES DE SELECCIÓN Y RÉPLICA ------------
+# Cada panel es un fragmento: cambiar de destinos o pulsar una casilla sólo vuelve a ejecutar su panel.
+# Lo que afecta a otros paneles (cambio de origen, aplicar selección...) fuerza un st.rerun() completo.
+
+@st.fragment
+def origin_panel():
+    """Selector de origen y detección de su tarifa"""
+    opts_origen = ["— Selecciona —"] + ss.configs
+    idx = opts_origen.index(ss.origin) if ss.origin in ss.configs else 0
+    chosen = st.selectbox("Configuración origen (única)", options=opts_origen, index=idx)
+
+    new_origin = None if chosen == "— Selecciona —" else chosen
+    if new_origin != ss.origin:
+        # reset de estados dependientes del origen y recarga completa (los destinos dependen de él)
+        ss.origin = new_origin
+        ss.timing_since = time.time()
+        ss.origin_tariff = None
+        ss.origin_last_updated = None
+        ss.last_origin_checked = None
+        ss.last_filtered_origin = None
+        ss.incompatible_cfgs = []
+        ss.destinations = []
+        ss.apply_mode = False
+        ss.data_config = {}
+        st.rerun()
+
+    # Detectar tarifa del origen (una sola vez por cambio):
+    if ss.origin and ss.origin != ss.last_origin_checked:
+        try:
+            with st.spinner("Determinando el tipo de tarifa de la configuración origen..."):
+                try:
+                    reader = http_reader(workers=1)
+                    try:
+                        origin_last_updated, ss.data_config, ss.origin_tariff = reader.detect_config(
+                            ss.origin, origin=True
+                        )
+                    finally:
+                        reader.close()
+                except PoolExhausted:
+                    raise
+                except Exception:
+                    # Si no se puede leer por HTTP, lo hacemos con el navegador
+                    with browser_pool().lease(ss.platform_user, timeout=LEASE_TIMEOUT, tenant=ss.tenant) as manage:
+                        manage.ensure_session()
+                        origin_last_updated, ss.data_config, ss.origin_tariff = manage.detect_config(
+                            ss.origin, origin=True
+                        )
+                ss.origin_last_updated = (origin_last_updated or "")
+                ss.tariff_index.set(ss.origin, ss.origin_tariff, ss.origin_last_updated)
+                tariff_cache().put(ss.account, ss.origin, ss.origin_tariff, ss.origin_last_updated)
+                ss.last_origin_checked = ss.origin
+        except PoolExhausted:
+            st.warning(POOL_BUSY)
+        except Exception as e:
+            st.error("No se pudo determinar la tarifa de la configuración origen")
+            with st.expander("Más detalles..."):
+                st.exception(e)
+
+    if ss.origin_tariff:
+        st.info(
+            f"**Origen:** {ss.origin}\n\n"
+            f"• Tarifa: **{ss.origin_tariff}**\n\n"
+            f"• Última actualización: **{ss.origin_last_updated or '—'}**"
+        )
+
+
+@st.fragment
+def destinations_panel():
+    """Destinos filtrados por la tarifa del origen, resumen de la selección y botón de aplicar"""
+    index = ss.tariff_index
+    # Si hemos detectado la tarifa origen pero aún no hemos filtrado por este tipo de tarifa:
+    if ss.origin and ss.origin_tariff and ss.last_filtered_origin != ss.origin:
+        try:
+            if ss.origin not in index.tariffs:
+                index.set(ss.origin, ss.origin_tariff, ss.origin_last_updated)
+            pending = index.pending()
+            if pending:
+                # La detección (HTTP primero, navegadores después) corre en segundo plano; el fragmento
+                # recarga la app cuando termina y entonces se construyen las opciones compatibles
+                if ss.scan_job_id is None:
+                    ss.scan_job_id = job_manager().submit_scan(
+                        ss.platform_user, ss.account, pending, workers=ss.detect_workers,
+                        config_index=ss.config_index, batch_budget=ss.batch_budget, tenant=ss.tenant
+                    )
+                scan_progress()
+            else:
+                compatible = set(index.compatible(ss.origin_tariff, exclude=ss.origin))
+                ss.incompatible_cfgs = index.incompatible(ss.origin_tariff, exclude=ss.origin)
+                ss.destinations = [d for d in ss.destinations if d in compatible]
+                ss.last_filtered_origin = ss.origin
+
+        except Exception as e:
+            st.error("Ocurrió un problema al filtrar los destinos")
+            with st.expander("Más detalles..."):
+                st.exception(e)
+
+    # Opciones destino con la misma tarifa que la configuración origen (ya ordenadas en el índice):
+    if ss.origin and ss.origin_tariff:
+        dest_options = index.compatible(ss.origin_tariff, exclude=ss.origin)
+    else:
+        dest_options = []
+
+    # Multiselect de destinos (>=1), sin el origen; las etiquetas con iconos identifican las configuraciones
+    # actualizadas de las que no y se calculan una vez por fecha del origen
+    previous = list(ss.destinations)
+    ss.destinations = st.multiselect(
+        "Configuraciones destino (mínimo 1, misma tarifa que configuración origen)",
+        options=dest_options,
+        default=[d for d in ss.destinations if d in dest_options],
+        disabled=not (ss.origin and ss.origin_tariff), # Lo bloqueamos hasta escoger origen y determinar su tarifa
+        key="destinations_multiselect",
+        help="Selecciona primero la configuración origen, luego podrás escoger entre las configuraciones destino compatibles",
+        format_func=lambda name: index.label(name, ss.origin_last_updated)
+    )
+    if ss.apply_mode and ss.destinations != previous:
+        # El panel de réplica muestra la selección: hay que redibujarlo
+        st.rerun()
+
+    # Leyenda
+    st.caption("✅ actualizada | ⚠️ pendiente  | ❓ sin info")
+
+    # Vista rápida de lo elegido con la clasificación de configuraciones en función del tipo de tarifa:
+    st.markdown("### Resumen")
+    st.write(
+        {
+            "Origen": ss.origin if ss.origin else "—",
+            "Tarifa origen": ss.origin_tariff if ss.origin_tariff else "-",
+            "Destinos": ss.destinations if ss.destinations else []
+        }
+    )
+
+    # Validación: requiere origen y >=1 destino
+    valid = (ss.origin is not None) and (len(ss.destinations) >= 1)
+    if st.button("Aplicar selección", type="primary", disabled=not valid) and valid:
+        ss.apply_mode = True
+        st.rerun()
+    if not valid:
+        st.caption("Selecciona 1 origen y al menos 1 destino para continuar.")
+
+
+@st.fragment
+def replication_panel():
+    """Datos del origen, opciones de réplica y lanzamiento del trabajo en segundo plano"""
+    st.markdown("### Datos de la configuración origen")
+    try:
+        df = pd.DataFrame(ss.data_config)
+        st.dataframe(df, use_container_width=True)
+    except Exception as e:
+        st.error("No se pudo construir el DataFrame de la configuración origen.")
+        with st.expander("Más detalles..."):
+            st.exception(e)
+
+    st.markdown("### Réplica")
+    skip_matching = st.checkbox(
+        "Comparar antes de replicar y omitir los destinos que ya coinciden con el origen", value=True
+    )
+    http_write = st.checkbox(
+        "Guardar con una petición HTTP directa (si el formulario cambia se usa el navegador)", value=True
+    )
+    if ss.replication_job_id is None:
+        if st.button("Comenzar réplica", type="primary"):
+            ss.timing_since = time.time()
+            # La réplica corre en segundo plano y anota cada destino en su journal: una recarga de la
+            # página o un corte del websocket ya no la interrumpen
+            ss.replication_job_id = job_manager().submit_replication(
+                ss.platform_user, ss.account, ss.data_config, ss.origin_last_updated, ss.destinations,
+                skip_matching=skip_matching, workers=ss.detect_workers,
+                config_index=ss.config_index, batch_budget=ss.batch_budget, http_write=http_write,
+                tenant=ss.tenant
+            )
+            st.rerun()
+
+
+# ------------ REFRESCO DE LA LISTA DE CONFIGURACIONES ------------
+
+def refresh_configs():
+    """Relee sólo los nombres de mainTable y aplica las altas y bajas sin perder las tarifas conocidas"""
+    try:
+        reader = http_reader(workers=1)
+        try:
+            configs, added, removed = reader.refresh_config_list(ss.configs)
+            config_index = dict(reader.config_index)
+        finally:
+            reader.close()
+    except PoolExhausted:
+        raise
+    except Exception:
+        with browser_pool().lease(ss.platform_user, timeout=LEASE_TIMEOUT, tenant=ss.tenant) as manage:
+            configs, added, removed = manage.refresh_config_list(ss.configs)
+            config_index = dict(manage.config_index)
+
+    ss.configs = sorted({str(c) for c in configs})
+    ss.config_index = config_index
+    ss.configs_refreshed_at = time.time()
+    ss.config_list_changes = {"added": added, "removed": removed}
+    ss.tariff_index.set_configs(ss.configs)
+
+    if removed:
+        gone = set(removed)
+        ss.incompatible_cfgs = [c for c in ss.incompatible_cfgs if c not in gone]
+        ss.destinations = [d for d in ss.destinations if d not in gone]
+        ss.pop("destinations_multiselect", None)  # el widget se recrea con los destinos que siguen existiendo
+        tariff_cache().forget(ss.account, removed)
+        if ss.origin in gone:
+            # El origen ya no existe: limpiamos todo lo que dependía de él
+            ss.origin, ss.origin_tariff, ss.origin_last_updated = None, None, None
+            ss.last_origin_checked, ss.last_filtered_origin = None, None
+            ss.destinations, ss.incompatible_cfgs, ss.data_config = [], [], {}
+            ss.apply_mode = False
+
+    if added and ss.origin_tariff:
+        # Volvemos a filtrar: sólo las configuraciones nuevas quedan pendientes de detectar su tarifa
+        ss.last_filtered_origin = None
+
+    return bool(added or removed)
+
+
+def config_list_refresher():
+    """Botón de refresco de la lista y, si se activa, refresco periódico sin recargar toda la app"""
+    @st.fragment(run_every=CONFIG_REFRESH_SECONDS if ss.auto_refresh else None)
+    def _refresher():
+        clicked = st.button("Actualizar lista de configuraciones")
+        due = ss.auto_refresh and time.time() - ss.configs_refreshed_at >= CONFIG_REFRESH_SECONDS
+        if clicked or due:
+            try:
+                with st.spinner("Buscando configuraciones nuevas o eliminadas..."):
+                    changed = refresh_configs()
+            except PoolExhausted:
+                st.warning(POOL_BUSY)
+                return
+            except Exception as e:
+                st.error(f"No se pudo actualizar la lista: {e}")
+                return
+            if changed:
+                st.rerun()
+        changes = ss.config_list_changes
+        if changes is not None:
+            st.caption(
+                f"Lista actualizada a las {time.strftime('%H:%M', time.localtime(ss.configs_refreshed_at))}: "
+                f"{len(changes['added'])} nuevas, {len(changes['removed'])} eliminadas"
+            )
+
+    _refresher()
+
 
 # st.subheader("Réplica de configuraciones en App: Gestión Energética")
 
@@ -30,6 +444,12 @@ if not ss.logged_in:
     with st.form("login", clear_on_submit=False):
         user = st.text_input("Usuario", key="login_user")
         pswd = st.text_input("Contraseña", type="password", key="login_password")
+        tenant = st.text_input("Cliente", value=DEFAULT_TENANT,
+                               help="Usuario de la plataforma como el que se inicia sesión para ver sus configuraciones")
+        ss.detect_workers = st.number_input(
+            "Navegadores en paralelo", min_value=1, max_value=16, value=ss.detect_workers, step=1,
+            help="Número de navegadores que se usarán para detectar las tarifas de las configuraciones"
+        )
         ok = st.form_submit_button("Entrar")
     if ok:
         if not user or not pswd:
@@ -37,19 +457,30 @@ if not ss.logged_in:
             st.stop()
         try:
             with st.spinner("Accediendo a la plataforma y cargando configuraciones..."):
-                manage = Management(user, pswd)
-                # Hacemos un login explícito ya que ahora no cerramos el browser
-                if not manage.login():
-                    raise RuntimeError("Login fallido")
-
-                cfgs = manage.get_config_list()
-                ss.manage = manage
+                # El pool valida las credenciales y reutiliza un navegador ya autenticado si lo hay:
+                with browser_pool().lease(user, pswd, timeout=LEASE_TIMEOUT, tenant=tenant.strip() or None) as manage:
+                    cfgs = manage.get_config_list()
+                    ss.platform_user = user
+                    ss.tenant = manage.tenant
+                    ss.account = manage.account
+                    ss.config_index = dict(manage.config_index)
                 ss.configs = sorted({str(c) for c in cfgs})
+                ss.configs_refreshed_at = time.time()
                 ss.logged_in = True
 
+                # Cargamos las tarifas ya conocidas (no caducadas) para no volver a detectarlas:
+                cached_tariffs, cached_last_updated = tariff_cache().load(ss.account)
+                ss.tariff_index = TariffIndex(ss.configs, cached_tariffs, cached_last_updated)
+
+                # Trabajos que quedaron a medias si el servidor se cayó:
+                job_manager().resume(ss.account)
+
             # Clear and rerun the password
             ss.pop("login_password", None)
 
+        except PoolExhausted:
+            st.warning(POOL_BUSY)
+            st.stop()
         except Exception as e:
             st.error("El usuario o la contraseña son incorrectos, o hubo un problema al conectar.")
             with st.expander("Más detalles..."):
@@ -60,19 +491,104 @@ if not ss.logged_in:
 # ------------ UI PRINCIPAL ------------
 if ss.logged_in:
 
+    pool_stats = browser_pool().stats()
+    chrome_stats = Driver.metrics()
+    st.sidebar.caption(
+        f"Navegadores compartidos: {pool_stats['alive']}/{pool_stats['size']} "
+        f"(en uso: {pool_stats['in_use']}, libres: {pool_stats['idle'] + pool_stats['spare']})\n\n"
+        f"Procesos Chrome vivos: {chrome_stats['alive']} (lanzados: {chrome_stats['launched']}, "
+        f"arranque medio: {chrome_stats['avg_startup_seconds'] or '—'} s)\n\n"
+        f"Memoria de Chrome: {chrome_stats['rss_mb'] or '—'} MB (reciclados: {chrome_stats['recycled']})"
+    )
+    if chrome_stats["nodes"]:
+        with st.sidebar.expander("Nodos de Remote WebDriver"):
+            st.dataframe(
+                pd.DataFrame(chrome_stats["nodes"])[["url", "healthy", "sessions", "max_sessions", "launched",
+                                                     "failures", "last_error"]],
+                hide_index=True, use_container_width=True
+            )
+
+    with st.sidebar.expander("Tiempos por operación"):
+        timings = tracer.summary(ss.account, since=ss.timing_since)
+        if timings:
+            st.dataframe(
+                pd.DataFrame(timings)[["operation", "count", "mean", "seconds", "commands", "navigations",
+                                       "idle_seconds", "errors"]],
+                hide_index=True, use_container_width=True
+            )
+        else:
+            st.caption("Aún no hay operaciones registradas en esta ejecución.")
+        st.download_button("Exportar JSON", tracer.to_json(ss.account, since=ss.timing_since),
+                           file_name="timings.json", mime="application/json")
+        st.download_button("Exportar Prometheus", tracer.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+
+    with st.sidebar.expander("Control de carga de la plataforma"):
+        load = limiter.stats()
+        st.caption(
+            f"Peticiones en vuelo: {load['in_flight']}/{load['limit']} (máx. {load['max_in_flight']}), "
+            f"{load['rate']:g}/s · p90 {load['p90_latency']} s · errores: {load['errors']}/{load['requests']}"
+            + (f" · en pausa {load['paused_for']} s" if load["paused_for"] else "")
+        )
+        decisions = limiter.recent_decisions()
+        if decisions:
+            st.dataframe(
+                pd.DataFrame(decisions)[["action", "limit_before", "limit", "p90_latency", "reason"]].iloc[::-1],
+                hide_index=True, use_container_width=True
+            )
+
+    with st.sidebar:
+        ss.auto_refresh = st.checkbox(
+            f"Actualizar la lista automáticamente (cada {CONFIG_REFRESH_SECONDS // 60} min)", value=ss.auto_refresh
+        )
+        config_list_refresher()
+
+    with st.expander("Instantánea de precios de la flota"):
+        snapshot_panel()
+
+    # Reenganchamos la réplica en curso de la cuenta (p. ej. tras recargar la página):
+    if ss.replication_job_id is None:
+        ss.replication_job_id = job_manager().active(ss.account, "replicate")
+    if ss.replication_job_id is not None:
+        st.markdown("### Réplica en curso")
+        replication_progress()
+
     if ss.get("last_replication_summary"):
         res = ss.last_replication_summary
-        ok = len(res.get("updated", []))
+        skipped = len(res.get("skipped", []))
+        ok = len(res.get("updated", [])) + skipped
         total = res.get("total", 0)
         failed = res.get("failed", [])
 
         if ok == total:
-            st.success(f"✅ Proceso de réplica completado con éxito en {ok}/{total} destinos.")
+            st.success(
+                f"✅ Proceso de réplica completado con éxito en {ok}/{total} destinos"
+                + (f" ({skipped} ya coincidían con el origen y no se modificaron)." if skipped else ".")
+            )
         elif ok > 0:
             st.warning(
                 f"Réplica completada con incidencias: {ok}/{total} destinos OK. Fallaron: {', '.join(failed) or '—'}")
         else:
             st.error("La réplica no se pudo completar en ningún destino.")
+        if res.get("error"):
+            st.error(f"La réplica se detuvo: {res['error']}")
+
+        if res.get("results"):
+            with st.expander("Detalle por destino"):
+                st.dataframe(pd.DataFrame(res["results"]), use_container_width=True)
+
+        if res.get("diffs"):
+            with st.expander("Diferencias encontradas antes de replicar"):
+                diff_rows = []
+                for d in res["diffs"]:
+                    if not d["differences"]:
+                        # Coincide con el origen (o no se pudo leer)
+                        diff_rows.append({"Destino": d["destination"], "Estado": d["status"], "Error": d["error"]})
+                    for x in d["differences"]:
+                        diff_rows.append({
+                            "Destino": d["destination"], "Estado": d["status"], "Periodo": x["period"],
+                            "Campo": x["field"], "Origen": x["origin"], "Destino (antes)": x["destination"]
+                        })
+                st.dataframe(pd.DataFrame(diff_rows), use_container_width=True)
 
         # Limpiar para que no se repita en el siguiente run:
         ss.last_replication_summary = None
@@ -88,158 +604,16 @@ if ss.logged_in:
     if ss.origin not in ss.configs:
         ss.origin = None
 
-    # ------------ CONFIGURACIÓN ORIGEN ------------
+    # ------------ CONFIGURACIÓN ORIGEN Y DESTINOS ------------
 
     col1, col2 = st.columns(2, gap="large")
-
     with col1:
-        # Selectbox de origen (único)
-        opts_origen = ["— Selecciona —"] + ss.configs
-        idx = opts_origen.index(ss.origin) if ss.origin in ss.configs else 0
-        chosen = st.selectbox("Configuración origen (única)", options=opts_origen, index=idx)
-
-        new_origin = None if chosen == "— Selecciona —" else chosen
-        if new_origin != ss.origin:
-            # reset de estados dependientes del origen
-            ss.origin = new_origin
-            ss.origin_tariff = None
-            ss.origin_last_updated = None
-            ss.last_origin_checked = None
-            ss.last_filtered_origin = None
-            ss.incompatible_cfgs = []
-            ss.destinations = []
-            ss.apply_mode = False
-            ss.data_config = {}
-
-        # Detectar tarifa del origen (una sola vez por cambio):
-        if ss.origin and ss.origin != ss.last_origin_checked:
-            try:
-                with st.spinner("Determinando el tipo de tarifa de la configuración origen..."):
-                    ss.manage.ensure_session()
-                    origin_last_updated, ss.data_config, ss.origin_tariff = ss.manage.detect_config(
-                        ss.origin, origin=True
-                    )
-                    ss.origin_last_updated = (origin_last_updated or "")
-                    ss.last_updated_by_config[ss.origin] = ss.origin_last_updated
-                    ss.tariff_by_config[ss.origin] = ss.origin_tariff
-                    ss.last_origin_checked = ss.origin
-            except Exception as e:
-                st.error("No se pudo determinar la tarifa de la configuración origen")
-                with st.expander("Más detalles..."):
-                    st.exception(e)
-
-        if ss.origin_tariff:
-            st.info(
-                f"**Origen:** {ss.origin}\n\n"
-                f"• Tarifa: **{ss.origin_tariff}**\n\n"
-                f"• Última actualización: **{ss.origin_last_updated or '—'}**"
-            )
-
-    # --- DESTINOS (filtrados por tarifa del origen) ---
-
+        origin_panel()
     with col2:
-        # Si hemos detectado la tarifa origen pero aún no hemos filtrado por este tipo de tarifa:
-        if ss.origin and ss.origin_tariff and ss.last_filtered_origin != ss.origin:
-            try:
-                with st.spinner("Filtrando destinos por tipo de tarifa..."):
-                    ss.manage.ensure_session()
-                    origin_tariff = ss.origin_tariff
-                    origin_last_updated = ss.origin_last_updated
-                    # Calculamos la tarifa para cada config si aún no está cacheada:
-                    pending = [c for c in ss.configs if c not in ss.tariff_by_config]
-                    total = len(pending)
-                    if total:
-                        prog = st.progress(0.0, text="Calculando tarifas...")
-                        for i, cfg in enumerate(pending, start=1):
-                            try:
-                                if cfg == ss.origin:
-                                    ss.tariff_by_config[cfg] = origin_tariff
-                                    ss.last_updated_by_config[cfg] = origin_last_updated
-                                else:
-                                    ss.last_updated_by_config[cfg], ss.tariff_by_config[cfg] = ss.manage.detect_config(cfg)
-                            except Exception:
-                                ss.tariff_by_config[cfg] = None
-                            prog.progress(i/total)
-                        prog.empty()
-
-                    # Construimos las opciones compatibles:
-                    compatible = [
-                        c for c in ss.configs
-                        if c != ss.origin and ss.tariff_by_config.get(c) == origin_tariff
-                    ]
-
-                    ss.incompatible_cfgs = [
-                        c for c in ss.configs
-                        if c != ss.origin and ss.tariff_by_config.get(c) not in (origin_tariff, None)
-                    ]
-
-                    ss.destinations = [d for d in ss.destinations if d in compatible]
-                    ss.last_filtered_origin = ss.origin
-
-            except Exception as e:
-                st.error("Ocurrió un problema al filtrar los destinos")
-                with st.expander("Más detalles..."):
-                    st.exception(e)
-
-        # Opciones destino con la misma tarifa que la configuración origen:
-        if ss.origin and ss.origin_tariff:
-            dest_options = [
-                c for c in ss.configs
-                if c != ss.origin and ss.tariff_by_config.get(c) == ss.origin_tariff
-            ]
-
-        else:
-            dest_options = []
-
-        # Etiquetamos con iconos para identificar las configuraciones actualizadas de las que no:
-        def dest_label(name: str) -> str:
-            lu = ss.last_updated_by_config.get(name)
-            o = (ss.origin_last_updated or "").strip()
-            if lu is None:
-                icon, tag = "❓", "sin info"
-            elif o and (lu.strip() == o):
-                icon, tag = "✅", "actualizada"
-            else:
-                icon, tag = "⚠️", "pendiente"
-
-            return f"{icon} {name} - {lu or '--'} ({tag})"
-
-
-        # Multiselect de destinos (>=1), sin el origen
-        ss.destinations = st.multiselect(
-            "Configuraciones destino (mínimo 1, misma tarifa que configuración origen)",
-            options=dest_options,
-            default=ss.destinations,
-            disabled=not (ss.origin and ss.origin_tariff), # Lo bloqueamos hasta escoger origen y determinar su tarifa
-            key="destinations_multiselect",
-            help="Selecciona primero la configuración origen, luego podrás escoger entre las configuraciones destino compatibles",
-            format_func=dest_label
-        )
-
-        # Leyenda
-        st.caption("✅ actualizada | ⚠️ pendiente  | ❓ sin info")
-
-    # Vista rápida de lo elegido con la clasificación de configuraciones en función del tipo de tarifa:
-    st.markdown("### Resumen")
-    st.write(
-        {
-            "Origen": ss.origin if ss.origin else "—",
-            "Tarifa origen": ss.origin_tariff if ss.origin_tariff else "-",
-            "Destinos": ss.destinations if ss.destinations else []
-        }
-    )
+        destinations_panel()
 
     # Botonera
-    colA, colB, colC = st.columns(3)
-    with colA:
-        # Validación: requiere origen y >=1 destino
-        valid = (ss.origin is not None) and (len(ss.destinations) >= 1)
-        apply_clicked = st.button("Aplicar selección", type="primary", disabled=not valid)
-        if apply_clicked and valid:
-            ss.apply_mode = True
-        if not valid:
-            st.caption("Selecciona 1 origen y al menos 1 destino para continuar.")
-
+    colB, colC = st.columns(2)
     with colB:
         if st.button("Limpiar selección"):
             # Limpiamos estados sin cerrar sesión:
@@ -259,76 +633,21 @@ if ss.logged_in:
 
     with colC:
         if st.button("Cerrar sesión"):
-            try:
-                with st.spinner("Cerrando sesión del navegador..."):
-                    ss.manage.close(hard=True)
-            finally:
-                for k in [
-                    "manage", "logged_in", "configs", "origin", "destinations",
-                    "origin_tariff", "origin_last_updated", "last_origin_checked",
-                    "last_filtered_origin", "login_password", "tariff_by_config",
-                    "last_updated_by_config", "incompatible_cfgs", "data_config", "apply_mode"
-                ]:
-                    ss.pop(k, None)
-
-                st.rerun()
-
-    # ----- UNA VEZ HEMOS SELECCIONADO ORIGEN Y DESTINOS Y APLICADO LOS CAMBIOS -----
-
-    if ss.get("apply_mode") and valid:
-        st.markdown("### Datos de la configuración origen")
-        try:
-            df = pd.DataFrame(ss.data_config)
-            st.dataframe(df, use_container_width=True)
-        except Exception as e:
-            st.error("No se pudo construir el DataFrame de la configuración origen.")
-            with st.expander("Más detalles..."):
-                st.exception(e)
-
-        st.markdown("### Réplica")
-        start = st.button("Comenzar réplica", type="primary")
-        if start:
-            # Progreso por destino
-            total = len(ss.destinations)
-            prog = st.progress(0.0, text="Iniciando réplica...")
-            updated, failed = [], []
-
-            for i, dst in enumerate(ss.destinations, start=1):
-                try:
-                    with st.spinner(f"Replicando en: {dst} ({i}/{total})..."):
-                        try:
-                            new_lu = ss.manage.replicate_to(dst, ss.data_config, ss.origin_last_updated)
-                        except TypeError:
-                            new_lu = None
-
-                        # Refrescamos la caché para que el icono cambie en el próximo rerun():
-                        ss.last_updated_by_config[dst] = (new_lu or ss.origin_last_updated or "")
-                        updated.append(dst)
-
-                except Exception as e:
-                    st.error(f"Fallo al replicar en **{dst}**")
-                    with st.expander(f"Detalles ({dst})"):
-                        st.exception(e)
-                finally:
-                    prog.progress(i / total)
-
-            prog.empty()
-
-            # Guardamos el resumen y salimos de apply_mode:
-            ss.last_replication_summary = {"updated": updated, "failed": failed, "total": total}
-            ss.apply_mode = False
-
-            # Forzamos el rerender para que:
-            # - se vea el mensaje (lo mostramos al inicio del próximo run)
-            # - el multiselect se re renderice con los iconos actualizados
+            # Los navegadores se quedan abiertos en el pool compartido para el siguiente login
+            for k in [
+                "platform_user", "account", "tenant", "config_index", "logged_in", "configs", "origin",
+                "destinations",
+                "origin_tariff", "origin_last_updated", "last_origin_checked",
+                "last_filtered_origin", "login_password", "tariff_index", "incompatible_cfgs", "data_config",
+                "apply_mode",
+                "scan_job_id", "replication_job_id", "snapshot_job_id", "configs_refreshed_at",
+                "config_list_changes"
+            ]:
+                ss.pop(k, None)
 
             st.rerun()
 
+    # ----- UNA VEZ HEMOS SELECCIONADO ORIGEN Y DESTINOS Y APLICADO LOS CAMBIOS -----
 
-
-
-
-
-
-
-
+    if ss.get("apply_mode") and ss.origin is not None and ss.destinations:
+        replication_panel()
@@ -0,0 +1,356 @@
+"""Plataforma simulada con las páginas que recorre Management, para medir sin tocar app.smartdatasystem.es.
+
+    python -m benchmarks.fake_platform --configs 100 --latency 0.05 --port 8000
+    SDS_BASE_URL=http://127.0.0.1:8000 streamlit run app.py   (usuario "bench", contraseña "bench")
+"""
+import argparse
+import html
+import json
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+
+# Periodos de cada tarifa y si el precio de potencia del periodo es editable:
+TARIFF_PERIODS = {
+    "2.0TD": [("P1", True), ("P2", True), ("P3", False)],
+    "3.0TD": [(f"P{i}", True) for i in range(1, 7)],
+    "6.1TD": [(f"P{i}", True) for i in range(1, 7)],
+}
+DEFAULT_MIX = {"2.0TD": 0.6, "3.0TD": 0.3, "6.1TD": 0.1}
+MANAGED_USERS = ["Irene López", "Iván Ruiz", "Marta Gil", "Jorge Díaz"]
+
+ENERGY_KEY = "(precio/unidad energía)"
+POWER_KEY = "(precio/unidad potencia/día)"
+
+
+def _page(title, body, head=""):
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>{head}</head>'
+            f'<body>{body}</body></html>')
+
+
+class FakePlatform:
+    """Servidor HTTP local con configs configuraciones, un reparto de tarifas y latencia inyectada"""
+
+    def __init__(self, configs=10, mix=None, latency=0.0, user="bench", password="bench", host="127.0.0.1",
+                 port=0, seed=0, assets=0, asset_kb=64):
+        self.user = user
+        self.password = password
+        self.latency = latency
+        # Imágenes, fuente y script de analítica por página, como en la plataforma real (0 = páginas desnudas)
+        self.assets = assets
+        self.asset_kb = asset_kb
+        self.lock = threading.Lock()
+        self.sessions = {}  # { sid: {"user": ..., "impersonated": bool} }
+        self.requests = Counter()
+        self.configs = self._generate(configs, mix or DEFAULT_MIX, random.Random(seed))
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @staticmethod
+    def _generate(n, mix, rng):
+        tariffs, weights = list(mix), list(mix.values())
+        configs = []
+        for i in range(1, n + 1):
+            tariff = rng.choices(tariffs, weights)[0]
+            periods = TARIFF_PERIODS[tariff]
+            configs.append({
+                "id": i,
+                "name": f"Config {i:04d}",
+                "tariff": tariff,
+                "changes": [f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"],
+                "energy": [f"{rng.uniform(0.05, 0.30):.6f}" for _ in periods],
+                "power": [f"{rng.uniform(0.01, 0.12):.6f}" for _ in periods],
+            })
+        return configs
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-platform", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def config(self, config_id):
+        try:
+            return self.configs[int(config_id) - 1]
+        except (ValueError, IndexError):
+            return None
+
+    # ------------ Páginas ------------
+
+    def page(self, title, body):
+        if not self.assets:
+            return _page(title, body)
+        head = ('<style>@font-face { font-family: Corp; src: url("/static/corp.woff2"); } body { font-family: Corp; }'
+                '</style><script src="/static/analytics.js"></script>')
+        images = "".join(f'<img src="/static/img{i}.png" width="16" height="16" alt="">' for i in range(self.assets))
+        return _page(title, images + body, head)
+
+    def asset(self, path):
+        """(content-type, bytes) de un recurso estático simulado"""
+        ext = path.rsplit(".", 1)[-1]
+        if ext == "js":
+            return "application/javascript", b"window.__analytics = (window.__analytics || 0) + 1;"
+        content_type = {"png": "image/png", "woff2": "font/woff2"}.get(ext, "application/octet-stream")
+        return content_type, b"\0" * (self.asset_kb * 1024)
+
+    def login_page(self, error=False):
+        return self.page("Acceso", (
+            '<form method="post" action="/?target=auth">'
+            + ('<p class="error">Usuario o contraseña incorrectos</p>' if error else "")
+            + '<p><input type="text" id="username" name="username"></p>'
+              '<p><input type="password" id="password" name="password"></p>'
+              '<p><input type="submit" value="Entrar"></p>'
+              '</form>'
+        ))
+
+    def dashboard_page(self):
+        return self.page("Inicio", (
+            '<ul class="menu"><li>Administración<ul class="submenu">'
+            '<li><a href="/?target=users">Usuarios</a></li>'
+            '<li><a href="/?target=powermanagement">Gestión energética</a></li>'
+            '</ul></li></ul>'
+            '<div class="gridster ready"><ul><li>Widget</li></ul></div>'
+        ))
+
+    def users_page(self):
+        # Filtro al estilo DataTables: redibuja el tbody con las filas que contienen el término
+        users = [{"id": i, "name": name} for i, name in enumerate(MANAGED_USERS, start=2)]
+        return self.page("Usuarios", (
+            '<label>Buscar: <input type="search" id="search"></label>'
+            '<table id="users"><thead><tr><th>Nombre</th><th>Acciones</th></tr></thead><tbody></tbody></table>'
+            '<script>'
+            f'var USERS = {json.dumps(users)};'
+            'function draw(term) {'
+            '  term = (term || "").toLowerCase();'
+            '  var rows = USERS.filter(function (u) { return u.name.toLowerCase().indexOf(term) >= 0; });'
+            '  var body = document.querySelector("#users tbody");'
+            '  if (!rows.length) {'
+            '    body.innerHTML = \'<tr class="odd"><td class="dataTables_empty" colspan="2">Sin resultados</td></tr>\';'
+            '    return;'
+            '  }'
+            '  body.innerHTML = rows.map(function (u, i) {'
+            '    return \'<tr class="\' + (i % 2 ? "even" : "odd") + \'"><td>\' + u.name + \'</td><td>\''
+            '      + \'<a title="Iniciar sesión como este usuario" href="/?target=impersonate&id=\' + u.id + \'">Entrar</a>\''
+            '      + "</td></tr>";'
+            '  }).join("");'
+            '}'
+            'document.getElementById("search").addEventListener("input", function () { draw(this.value); });'
+            'draw("");'
+            '</script>'
+        ))
+
+    def configs_page(self):
+        rows = "".join(
+            f'<tr><td>{html.escape(c["name"])}</td><td>{c["tariff"]}</td><td>{c["changes"][-1]}</td>'
+            f'<td>{len(c["changes"])}</td><td>Activa</td>'
+            f'<td><div><a title="Modificar configuración" '
+            f'href="/?target=powermanagement&action=edit&id={c["id"]}">Editar</a></div></td></tr>'
+            for c in self.configs
+        )
+        return self.page("Gestión energética", (
+            '<table id="mainTable"><thead><tr><th>Nombre</th><th>Tarifa</th><th>Último cambio</th>'
+            '<th>Cambios</th><th>Estado</th><th>Acciones</th></tr></thead>'
+            f'<tbody>{rows}</tbody></table>'
+        ))
+
+    def edit_page(self, cfg):
+        changes = "".join(
+            f'<tr><td>{n}</td><td>{date}</td><td>{cfg["tariff"]}</td></tr>'
+            for n, date in reversed(list(enumerate(cfg["changes"], start=1)))
+        )
+        return self.page(cfg["name"], (
+            f'<h1>{html.escape(cfg["name"])}</h1>'
+            '<table id="mainTable"><thead><tr><th>#</th><th>Fecha</th><th>Tarifa</th></tr></thead>'
+            f'<tbody>{changes}</tbody></table>'
+            '<form method="get" action="/">'
+            '<input type="hidden" name="target" value="powermanagement">'
+            '<input type="hidden" name="action" value="newrate">'
+            f'<input type="hidden" name="id" value="{cfg["id"]}">'
+            '<p><input type="submit" name="B4" value="Añadir nuevo cambio"></p>'
+            '</form>'
+        ))
+
+    def rate_form_page(self, cfg):
+        selected = ' selected="selected"'
+        options = "".join(
+            f'<option value="{i}"{selected if t == cfg["tariff"] else ""}>{t}</option>'
+            for i, t in enumerate(TARIFF_PERIODS, start=1)
+        )
+        periods = TARIFF_PERIODS[cfg["tariff"]]
+        rows = []
+        for i, (period, power_editable) in enumerate(periods):
+            disabled = "" if power_editable else ' disabled="disabled"'
+            rows.append(
+                f'<tr><td>{period}</td>'
+                f'<td><input type="text" name="energia_{i}" value="{cfg["energy"][i]}"></td><td></td><td></td>'
+                f'<td><input type="text" name="potencia_{i}" value="{cfg["power"][i]}"{disabled}></td></tr>'
+            )
+        # Los periodos que no aplican a la tarifa están en el DOM pero ocultos:
+        for i in range(len(periods), 6):
+            rows.append(
+                f'<tr style="display: none"><td>P{i + 1}</td><td><input type="text" value=""></td><td></td><td></td>'
+                '<td><input type="text" value=""></td></tr>'
+            )
+        return self.page(f"Nuevo cambio - {cfg['name']}", (
+            f'<form id="powermanagementrate" method="post" action="/?target=powermanagement&action=saverate&id={cfg["id"]}">'
+            f'<fieldset><select name="timeschemaid">{options}</select>'
+            f'<input type="text" name="fecha" class="hasDatepicker" readonly="readonly" value="{cfg["changes"][-1]}">'
+            '</fieldset>'
+            '<div class="scrollabletable"><table>'
+            '<thead><tr><th>Periodo</th>'
+            f'<th>Energía<p class="smalltext">{ENERGY_KEY}</p></th><th>Desde</th><th>Hasta</th>'
+            f'<th>Potencia<p class="smalltext">{POWER_KEY}</p></th></tr></thead>'
+            f'<tbody>{"".join(rows)}</tbody></table></div>'
+            '<p>Revise los precios antes de guardar.</p><p></p><p></p>'
+            '<p class="right"><input type="submit" value="Guardar"></p>'
+            '</form>'
+        ))
+
+    def save_rate(self, cfg, fields):
+        with self.lock:
+            for i in range(len(TARIFF_PERIODS[cfg["tariff"]])):
+                if f"energia_{i}" in fields:
+                    cfg["energy"][i] = fields[f"energia_{i}"]
+                if f"potencia_{i}" in fields:
+                    cfg["power"][i] = fields[f"potencia_{i}"]
+            cfg["changes"].append(fields.get("fecha") or time.strftime("%Y-%m-%d"))
+
+    # ------------ HTTP ------------
+
+    def _handler(self):
+        platform = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _session(self):
+                for part in (self.headers.get("Cookie") or "").split(";"):
+                    name, _, value = part.strip().partition("=")
+                    if name == "sid":
+                        return platform.sessions.get(value)
+                return None
+
+            def _send(self, body, status=200, headers=None):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _redirect(self, location, headers=None):
+                self._send("", status=303, headers={"Location": location, **(headers or {})})
+
+            def _route(self, method):
+                if platform.latency:
+                    time.sleep(platform.latency)
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                target = query.get("target", "dashboard")
+                action = query.get("action")
+                if url.path.startswith("/static/"):
+                    platform.requests["GET static"] += 1
+                    content_type, data = platform.asset(url.path)
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                platform.requests[f"{method} {target}{'/' + action if action else ''}"] += 1
+
+                if target == "auth":
+                    if method == "POST":
+                        length = int(self.headers.get("Content-Length") or 0)
+                        form = {k: v[-1] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+                        if form.get("username") == platform.user and form.get("password") == platform.password:
+                            sid = secrets.token_hex(16)
+                            platform.sessions[sid] = {"user": platform.user, "impersonated": False}
+                            return self._redirect("/?target=dashboard", {"Set-Cookie": f"sid={sid}; Path=/"})
+                        return self._send(platform.login_page(error=True))
+                    return self._send(platform.login_page())
+
+                session = self._session()
+                if session is None:
+                    return self._redirect("/?target=auth")
+
+                if target == "dashboard":
+                    return self._send(platform.dashboard_page())
+                if target == "users":
+                    return self._send(platform.users_page())
+                if target == "impersonate":
+                    session["impersonated"] = True
+                    return self._redirect("/?target=dashboard")
+                if target != "powermanagement":
+                    return self._send(_page("No encontrado", "<p>No encontrado</p>"), status=404)
+
+                if action is None:
+                    return self._send(platform.configs_page())
+                cfg = platform.config(query.get("id"))
+                if cfg is None:
+                    return self._send(_page("No encontrado", "<p>Configuración inexistente</p>"), status=404)
+                if action == "edit":
+                    return self._send(platform.edit_page(cfg))
+                if action == "newrate":
+                    return self._send(platform.rate_form_page(cfg))
+                if action == "saverate" and method == "POST":
+                    length = int(self.headers.get("Content-Length") or 0)
+                    fields = {k: v[-1] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+                    platform.save_rate(cfg, fields)
+                    return self._redirect("/?" + urlencode({"target": "powermanagement", "action": "edit",
+                                                            "id": cfg["id"]}))
+                return self._send(_page("Error", "<p>Acción no soportada</p>"), status=400)
+
+            def do_GET(self):
+                self._route("GET")
+
+            def do_POST(self):
+                self._route("POST")
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plataforma simulada para pruebas de rendimiento")
+    parser.add_argument("--configs", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos añadidos a cada petición")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--assets", type=int, default=0, help="Imágenes por página (más fuente y analítica)")
+    args = parser.parse_args(argv)
+
+    platform = FakePlatform(configs=args.configs, latency=args.latency, port=args.port, seed=args.seed,
+                            assets=args.assets)
+    print(f"Plataforma simulada en {platform.url} (usuario {platform.user!r}, contraseña {platform.password!r})")
+    try:
+        platform.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        platform.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
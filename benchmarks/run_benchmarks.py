@@ -0,0 +1,217 @@
+"""Tiempos y número de comandos WebDriver de las operaciones de Management contra la plataforma simulada.
+
+    python -m benchmarks.run_benchmarks --sizes 10,100,1000 --latency 0.02 --output bench.json
+    python -m benchmarks.run_benchmarks --compare-lean --assets 20 --latency 0.05   (perfil completo vs ligero)
+"""
+import argparse
+import copy
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from benchmarks.fake_platform import FakePlatform, ENERGY_KEY
+from functions.management import Management
+from functions.http_writer import HttpConfigWriter
+
+
+class CommandCounter:
+    """Cuenta los comandos que el cliente envía a chromedriver (cada uno es un viaje de ida y vuelta)"""
+
+    def __init__(self, driver):
+        self.counts = Counter()
+        self._execute = driver.execute
+
+        def _counting(command, params=None):
+            self.counts[command] += 1
+            return self._execute(command, params)
+
+        # WebElement también llama a driver.execute, así que se cuentan todos los comandos
+        driver.execute = _counting
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def reset(self):
+        self.counts.clear()
+
+
+def _measure(counter, platform, func, *args, **kwargs):
+    counter.reset()
+    requests_before = sum(platform.requests.values())
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, {
+        "seconds": round(time.perf_counter() - start, 4),
+        "commands": counter.total(),
+        "http_requests": sum(platform.requests.values()) - requests_before,
+        "by_command": dict(counter.counts.most_common()),
+    }
+
+
+def _aggregate(samples):
+    seconds = [s["seconds"] for s in samples]
+    commands = [s["commands"] for s in samples]
+    return {
+        "n": len(samples),
+        "seconds_mean": round(statistics.mean(seconds), 4),
+        "seconds_p50": round(statistics.median(seconds), 4),
+        "seconds_max": round(max(seconds), 4),
+        "commands_mean": round(statistics.mean(commands), 1),
+        "http_requests_mean": round(statistics.mean(s["http_requests"] for s in samples), 1),
+    }
+
+
+def _bumped(data, delta):
+    """Copia de data con la energía subida delta; las celdas vacías (filas ocultas de 2.0TD) se dejan igual"""
+    bumped = copy.copy(data)
+    bumped[ENERGY_KEY] = [f"{float(v) + delta:.6f}" if v else v for v in data[ENERGY_KEY]]
+    return bumped
+
+
+def bench_size(size, latency=0.0, samples=5, headless=True):
+    """Mide login, get_config_list, detect_config y replicate_to (navegador y POST directo) con size configuraciones"""
+    with FakePlatform(configs=size, latency=latency) as platform:
+        manage = Management(platform.user, platform.password, base_url=platform.url)
+        manage.driver_instance.headless = headless
+        try:
+            counter = CommandCounter(manage.driver)
+            results = {"configs": size, "latency": latency}
+
+            ok, results["login"] = _measure(counter, platform, manage.login)
+            if not ok:
+                raise RuntimeError("Login fallido contra la plataforma simulada")
+
+            # La primera llamada incluye la impersonación; la segunda es el refresco habitual
+            cfgs, results["get_config_list_first"] = _measure(counter, platform, manage.get_config_list)
+            _, results["get_config_list"] = _measure(counter, platform, manage.get_config_list)
+            if len(cfgs) != size:
+                raise RuntimeError(f"Se esperaban {size} configuraciones y se leyeron {len(cfgs)}")
+
+            # Muestras repartidas por toda la tabla (el coste de localizar la fila crece con su posición)
+            step = max(1, size // samples)
+            picked = cfgs[::step][:samples]
+
+            detect = [_measure(counter, platform, manage.detect_config, cfg)[1] for cfg in picked]
+            origin = [_measure(counter, platform, manage.detect_config, cfg, origin=True) for cfg in picked]
+            results["detect_config"] = _aggregate(detect)
+            results["detect_config_origin"] = _aggregate([m for _, m in origin])
+
+            replicate = []
+            for cfg, ((last_update, data, _), _) in zip(picked, origin):
+                data = _bumped(data, 0.001)
+                replicate.append(_measure(counter, platform, manage.replicate_to, cfg, data, "2025-01-01")[1])
+            results["replicate_to"] = _aggregate(replicate)
+            results["fill_mode"] = (manage.last_fill_report or {}).get("mode")
+
+            # Mismo guardado con un POST directo: las primeras escrituras de cada tarifa capturan la plantilla
+            writer = HttpConfigWriter.from_management(manage)
+            try:
+                writer.tariffs = {cfg: tariff for cfg, ((_, _, tariff), _) in zip(picked, origin)}
+                replicate_http = []
+                for cfg, ((_, data, _), _) in zip(picked, origin):
+                    data = _bumped(data, 0.002)
+                    replicate_http.append(_measure(counter, platform, writer.write, cfg, data, "2025-01-02")[1])
+                results["replicate_http"] = _aggregate(replicate_http)
+            finally:
+                writer.close()
+            return results
+        finally:
+            manage.close(hard=True)
+
+
+def bench_page_loads(size, latency=0.0, samples=5, assets=20, lean=False, headless=True):
+    """Tiempo hasta poder usar cfgs_url y las páginas de edición con el perfil completo o el ligero"""
+    with FakePlatform(configs=size, latency=latency, assets=assets) as platform:
+        manage = Management(platform.user, platform.password, base_url=platform.url, lean=lean)
+        manage.driver_instance.headless = headless
+        try:
+            if not manage.login():
+                raise RuntimeError("Login fallido contra la plataforma simulada")
+            cfgs = manage.get_config_list()
+
+            def _cfgs_page():
+                manage._navigate(manage.cfgs_url)
+                manage._wait_config_table()
+
+            listing = []
+            for _ in range(samples):
+                start = time.perf_counter()
+                _cfgs_page()
+                listing.append(time.perf_counter() - start)
+
+            step = max(1, len(cfgs) // samples)
+            editing = []
+            for cfg in cfgs[::step][:samples]:
+                start = time.perf_counter()
+                manage._open_config(cfg)
+                editing.append(time.perf_counter() - start)
+
+            return {
+                "lean": lean,
+                "cfgs_url": round(statistics.mean(listing), 4),
+                "edit_page": round(statistics.mean(editing), 4),
+                "static_requests": platform.requests["GET static"],
+            }
+        finally:
+            manage.close(hard=True)
+
+
+def compare_lean(size, latency=0.0, samples=5, assets=20, headless=True, out=sys.stdout):
+    full = bench_page_loads(size, latency, samples, assets, lean=False, headless=headless)
+    lean = bench_page_loads(size, latency, samples, assets, lean=True, headless=headless)
+    print(f"{'página':<12} {'completo (s)':>13} {'ligero (s)':>11} {'mejora':>8}", file=out)
+    for page in ("cfgs_url", "edit_page"):
+        gain = 1 - lean[page] / full[page] if full[page] else 0.0
+        print(f"{page:<12} {full[page]:>13.3f} {lean[page]:>11.3f} {gain:>7.0%}", file=out)
+    print(f"recursos estáticos descargados: {full['static_requests']} -> {lean['static_requests']}", file=out)
+    return {"full": full, "lean": lean}
+
+
+def _print_table(all_results, out=sys.stdout):
+    ops = ["login", "get_config_list_first", "get_config_list", "detect_config", "detect_config_origin",
+           "replicate_to", "replicate_http"]
+    print(f"{'configs':>8} {'operación':<24} {'segundos':>10} {'comandos':>10} {'peticiones':>11}", file=out)
+    for res in all_results:
+        for op in ops:
+            m = res[op]
+            seconds = m.get("seconds_mean", m.get("seconds"))
+            commands = m.get("commands_mean", m.get("commands"))
+            requests = m.get("http_requests_mean", m.get("http_requests"))
+            print(f"{res['configs']:>8} {op:<24} {seconds:>10.3f} {commands:>10} {requests:>11}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de Management contra la plataforma simulada")
+    parser.add_argument("--sizes", default="10,100,1000", help="Números de configuraciones separados por comas")
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos añadidos a cada petición HTTP")
+    parser.add_argument("--samples", type=int, default=5, help="Configuraciones medidas por operación")
+    parser.add_argument("--output", help="Guardar los resultados en JSON")
+    parser.add_argument("--headed", action="store_true", help="Mostrar el navegador")
+    parser.add_argument("--compare-lean", action="store_true",
+                        help="Comparar la carga de páginas con el perfil completo y el ligero")
+    parser.add_argument("--assets", type=int, default=20, help="Imágenes por página en --compare-lean")
+    args = parser.parse_args(argv)
+
+    if args.compare_lean:
+        size = int(args.sizes.split(",")[0])
+        result = compare_lean(size, latency=args.latency, samples=args.samples, assets=args.assets,
+                              headless=not args.headed)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        return
+
+    all_results = []
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        print(f"Midiendo {size} configuraciones...", file=sys.stderr, flush=True)
+        all_results.append(bench_size(size, latency=args.latency, samples=args.samples, headless=not args.headed))
+
+    _print_table(all_results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(all_results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""Réplica de configuraciones por línea de comandos (sin Streamlit).
+
+Credenciales en las variables de entorno SDS_USER y SDS_PASSWORD. El plan es un JSON con la forma:
+
+    {"jobs": [
+        {"origin": "Config A", "destinations": ["Config B", "Config C"]},
+        {"origin": "Config D", "destinations": "same-tariff"}
+    ]}
+
+"same-tariff" replica en todas las configuraciones con la misma tarifa que el origen.
+
+Varios clientes: cada trabajo puede llevar "tenant" (usuario a impersonar) y la lista "tenants" del plan (o
+--tenants) aplica los trabajos sin "tenant" a todos ellos. Cada cliente tiene su propia sesión y navegadores
+y todos se ejecutan a la vez; el informe agrupa los resultados por cliente.
+
+    python cli.py plan.json --workers 4 --report informe.json
+    python cli.py --snapshot   (sólo instantánea Parquet de las tablas de precios de todas las configuraciones)
+    python cli.py plan.json --tenants "Cliente A,Cliente B" --snapshot
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functions.management import Management, DEFAULT_TENANT
+from functions.pool import ManagementPool
+from functions.http_reader import HttpConfigReader
+from functions.http_writer import HttpConfigWriter
+from functions.replication import iter_replicate, iter_preflight, skipped_result
+from functions.cache import TariffCache
+from functions.snapshot import SnapshotStore, price_rows
+from functions.instrumentation import tracer
+from functions.throttle import limiter
+from functions.waits import parse_budgets
+
+SAME_TARIFF = "same-tariff"
+
+
+def log(msg):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", file=sys.stderr, flush=True)
+
+
+def load_plan(path, tenants=None):
+    """Trabajos del plan, cada uno con su "tenant" (None = el cliente habitual)"""
+    with open(path, encoding="utf-8") as f:
+        plan = json.load(f)
+    jobs = plan.get("jobs") if isinstance(plan, dict) else plan
+    if not isinstance(jobs, list) or not jobs:
+        raise ValueError("El plan debe contener una lista 'jobs' con al menos un trabajo")
+    if tenants is None and isinstance(plan, dict):
+        tenants = plan.get("tenants")
+    expanded = []
+    for job in jobs:
+        if not job.get("origin"):
+            raise ValueError(f"Trabajo sin 'origin': {job}")
+        destinations = job.get("destinations")
+        if destinations != SAME_TARIFF and not isinstance(destinations, list):
+            raise ValueError(f"'destinations' debe ser una lista o \"{SAME_TARIFF}\": {job}")
+        if job.get("tenant") or not tenants:
+            expanded.append({**job, "tenant": job.get("tenant") or None})
+        else:
+            expanded += [{**job, "tenant": tenant} for tenant in tenants]
+    return expanded
+
+
+class Runner:
+    """Ejecuta los trabajos de un cliente reutilizando la sesión, el lector HTTP y el pool de navegadores"""
+
+    def __init__(self, user, pswd, workers=4, use_http=True, use_diff=True, dry_run=False,
+                 batch_budget=None, cache=None, use_http_write=True, tenant=None, budgets=None):
+        self.user = user
+        self.pswd = pswd
+        self.tenant = tenant or DEFAULT_TENANT
+        self.workers = workers
+        self.use_http = use_http
+        self.use_http_write = use_http_write
+        self.use_diff = use_diff
+        self.dry_run = dry_run
+        self.batch_budget = batch_budget
+        self.budgets = budgets
+        self.cache = cache
+        self.timings = {}
+        self.manage = None
+        self.reader = None
+        self.writer = None
+        self.pool = None
+        self.configs = []
+        self.tariffs, self.last_updated = {}, {}
+
+    def log(self, msg):
+        log(f"[{self.tenant}] {msg}")
+
+    def _timed(self, phase, start):
+        self.timings[phase] = round(self.timings.get(phase, 0.0) + time.monotonic() - start, 3)
+
+    def start(self):
+        start = time.monotonic()
+        self.manage = Management(self.user, self.pswd, tenant=self.tenant, budgets=self.budgets)
+        if not self.manage.login():
+            raise RuntimeError("Login fallido")
+        self.configs = self.manage.get_config_list()
+        self._timed("login", start)
+        self.log(f"Sesión iniciada: {len(self.configs)} configuraciones")
+
+        if self.use_http:
+            try:
+                self.reader = HttpConfigReader.from_management(self.manage, workers=max(8, self.workers))
+            except Exception as e:
+                self.log(f"Lectura HTTP no disponible, se usará el navegador: {e}")
+        if self.use_http_write and not self.dry_run:
+            try:
+                self.writer = HttpConfigWriter.from_management(self.manage, workers=max(8, self.workers))
+            except Exception as e:
+                self.log(f"Escritura HTTP no disponible, se usará el navegador: {e}")
+
+        self.pool = ManagementPool(
+            self.user, self.pswd, workers=self.workers,
+            config_index=self.manage.config_index, batch_budget=self.batch_budget, tenant=self.tenant,
+            budgets=self.budgets
+        )
+        if self.cache is not None:
+            self.tariffs, self.last_updated = self.cache.load(self.manage.account)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+        if self.writer is not None:
+            self.writer.close()
+        if self.pool is not None:
+            self.pool.close()
+        if self.manage is not None:
+            self.manage.close(hard=True)
+
+    def read_origin(self, origin):
+        if self.reader is not None:
+            try:
+                return self.reader.detect_config(origin, origin=True)
+            except Exception:
+                pass
+        return self.manage.detect_config(origin, origin=True)
+
+    def detect_tariffs(self, cfgs):
+        """Tarifa de las configuraciones que aún no se conocen (HTTP primero, navegadores después)"""
+        pending = [c for c in cfgs if c not in self.tariffs]
+        if not pending:
+            return
+        start = time.monotonic()
+        browser_pending = pending
+        if self.reader is not None:
+            browser_pending = []
+            for cfg, last_update, tariff, error in self.reader.detect_many(pending):
+                if error is None:
+                    self._store_tariff(cfg, tariff, last_update)
+                else:
+                    browser_pending.append(cfg)
+        for cfg, last_update, tariff, error in self.pool.detect_configs(browser_pending):
+            if error is None:
+                self._store_tariff(cfg, tariff, last_update)
+            else:
+                self.log(f"No se pudo detectar la tarifa de {cfg}: {error}")
+        self._timed("detection", start)
+
+    def _store_tariff(self, cfg, tariff, last_update):
+        self.tariffs[cfg], self.last_updated[cfg] = tariff, last_update
+        if self.cache is not None:
+            self.cache.put(self.manage.account, cfg, tariff, last_update)
+
+    def snapshot(self, store):
+        """Lee la tabla de precios de todas las configuraciones y la guarda como instantánea Parquet"""
+        start = time.monotonic()
+        rows, browser_pending, failed = [], list(self.configs), []
+
+        def _add(cfg, read):
+            last_update, data, tariff = read
+            self._store_tariff(cfg, tariff, last_update)
+            rows.extend(price_rows(cfg, last_update, data, tariff))
+
+        if self.reader is not None:
+            browser_pending = []
+            for cfg, read, error in self.reader.imap(self.configs, origin=True):
+                if error is None:
+                    _add(cfg, read)
+                else:
+                    browser_pending.append(cfg)
+        for cfg, read, error in self.pool.imap(lambda manage, c: manage.detect_config(c, origin=True),
+                                               browser_pending):
+            if error is None:
+                _add(cfg, read)
+            else:
+                failed.append(cfg)
+                self.log(f"No se pudo leer la tabla de precios de {cfg}: {error}")
+
+        path = store.write(self.manage.account, rows)
+        self._timed("snapshot", start)
+        self.log(f"Instantánea guardada en {path}: {len(self.configs) - len(failed)} configuraciones")
+        return path, failed
+
+    def run_job(self, job):
+        origin = job["origin"]
+        if origin not in self.configs:
+            raise ValueError(f"La configuración origen {origin} no existe")
+
+        start = time.monotonic()
+        origin_last_updated, data_config, origin_tariff = self.read_origin(origin)
+        self._store_tariff(origin, origin_tariff, origin_last_updated)
+        self._timed("origin", start)
+        self.log(f"Origen {origin}: tarifa {origin_tariff}, última actualización {origin_last_updated}")
+
+        destinations = job["destinations"]
+        if destinations == SAME_TARIFF:
+            self.detect_tariffs(self.configs)
+            destinations = [c for c in self.configs if c != origin and self.tariffs.get(c) == origin_tariff]
+        else:
+            unknown = [d for d in destinations if d not in self.configs]
+            destinations = [d for d in destinations if d in self.configs and d != origin]
+            for d in unknown:
+                self.log(f"Destino desconocido, se omite: {d}")
+
+        results, diffs = [], {}
+        to_write = list(destinations)
+        if self.use_diff and to_write:
+            start = time.monotonic()
+            for report in iter_preflight(self.pool, data_config, to_write, reader=self.reader,
+                                         last_updated=origin_last_updated):
+                diffs[report["destination"]] = report
+                if report["status"] == "matches":
+                    results.append(skipped_result(report))
+            skipped = {r["destination"] for r in results}
+            to_write = [d for d in to_write if d not in skipped]
+            self._timed("preflight", start)
+
+        self.log(f"{len(destinations)} destinos, {len(to_write)} por escribir")
+        start = time.monotonic()
+        if self.dry_run:
+            results += [{"destination": d, "status": "pending"} for d in to_write]
+        else:
+            if self.writer is not None:
+                # Sólo la tarifa leída en la comprobación previa: una tarifa desfasada usaría otra plantilla
+                self.writer.tariffs.update({d: r["tariff"] for d, r in diffs.items() if r.get("tariff")})
+            for result in iter_replicate(self.pool, data_config, origin_last_updated, to_write, writer=self.writer):
+                results.append(result)
+                self.log(f"{result['destination']}: {result['status']} ({result['duration']} s, {result['backend']})"
+                    + (f" - {result['error']}" if result["error"] else ""))
+            updated = [r["destination"] for r in results if r["status"] == "updated"]
+            if self.cache is not None and updated:
+                self.cache.invalidate(self.manage.account, updated)
+        self._timed("replication", start)
+
+        rows = []
+        for result in results:
+            report = diffs.get(result["destination"], {})
+            rows.append({
+                "tenant": self.tenant,
+                "origin": origin,
+                "tariff": origin_tariff,
+                "destination": result["destination"],
+                "status": result["status"],
+                "error": result.get("error"),
+                "attempts": result.get("attempts", 0),
+                "duration": result.get("duration", 0.0),
+                "written": result.get("written", 0),
+                "differences": len(report.get("differences", [])),
+                "backend": result.get("backend"),
+            })
+        return rows
+
+
+def write_report(path, rows, summary):
+    if path.lower().endswith(".csv"):
+        fields = ["tenant", "origin", "tariff", "destination", "status", "error", "attempts", "duration", "written",
+                  "differences", "backend"]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "results": rows}, f, ensure_ascii=False, indent=2)
+
+
+def run_tenant(runner, jobs, snapshot_store=None):
+    """Ejecuta los trabajos de un cliente; los fallos se anotan sin afectar a los demás clientes"""
+    start = time.monotonic()
+    outcome = {"rows": [], "errors": [], "snapshot": None}
+    try:
+        runner.start()
+        if snapshot_store is not None:
+            try:
+                path, failed = runner.snapshot(snapshot_store)
+                outcome["snapshot"] = {"path": path, "failed": failed}
+            except Exception as e:
+                runner.log(f"Error al tomar la instantánea: {e}")
+                outcome["errors"].append({"tenant": runner.tenant, "origin": None, "error": f"{type(e).__name__}: {e}"})
+        for job in jobs:
+            try:
+                outcome["rows"] += runner.run_job(job)
+            except Exception as e:
+                runner.log(f"Error en el trabajo con origen {job['origin']}: {e}")
+                outcome["errors"].append({"tenant": runner.tenant, "origin": job["origin"],
+                                          "error": f"{type(e).__name__}: {e}"})
+    except Exception as e:
+        # Login o impersonación fallidos: ningún trabajo del cliente llegó a ejecutarse
+        runner.log(f"No se pudo iniciar la sesión: {e}")
+        outcome["errors"].append({"tenant": runner.tenant, "origin": None, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        runner.close()
+    outcome["wall_seconds"] = round(time.monotonic() - start, 3)
+    return outcome
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Réplica de configuraciones sin Streamlit")
+    parser.add_argument("plan", nargs="?", help="Fichero JSON con los trabajos (origen -> destinos)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("DETECT_WORKERS", 4)),
+                        help="Navegadores en paralelo (por defecto 4)")
+    parser.add_argument("--report", default="replication_report.json",
+                        help="Informe de salida (.json o .csv)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Segundos máximos por lote de detección/réplica")
+    parser.add_argument("--budgets", type=parse_budgets, default=None,
+                        help="Segundos máximos por tipo de espera, p. ej. login=40,save=30 (por defecto WAIT_BUDGETS)")
+    parser.add_argument("--no-http", action="store_true", help="Leer siempre con el navegador")
+    parser.add_argument("--no-http-write", action="store_true",
+                        help="Guardar siempre con el navegador en lugar de con un POST directo")
+    parser.add_argument("--no-diff", action="store_true", help="Escribir todos los destinos sin comparar antes")
+    parser.add_argument("--no-cache", action="store_true", help="No usar la caché persistente de tarifas")
+    parser.add_argument("--dry-run", action="store_true", help="Calcular el plan sin escribir en la plataforma")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Guardar antes una instantánea Parquet de los precios de todas las configuraciones")
+    parser.add_argument("--tenants", help="Clientes a impersonar separados por comas (sustituye a 'tenants' del plan)")
+    parser.add_argument("--metrics", help="Guardar los contadores de WebDriver en formato de texto de Prometheus")
+    args = parser.parse_args(argv)
+
+    user, pswd = os.environ.get("SDS_USER"), os.environ.get("SDS_PASSWORD")
+    if not user or not pswd:
+        parser.error("Define las variables de entorno SDS_USER y SDS_PASSWORD")
+
+    if not args.plan and not args.snapshot:
+        parser.error("Indica un plan o --snapshot")
+    tenants = [t.strip() for t in args.tenants.split(",") if t.strip()] if args.tenants else None
+    jobs = load_plan(args.plan, tenants) if args.plan else []
+
+    # Un Runner (sesión, lector, escritor y navegadores propios) por cliente, todos a la vez:
+    by_tenant = {}
+    for job in jobs:
+        by_tenant.setdefault(job["tenant"] or DEFAULT_TENANT, []).append(job)
+    for tenant in (tenants or [DEFAULT_TENANT]) if args.snapshot else []:
+        by_tenant.setdefault(tenant, [])
+    cache = None if args.no_cache else TariffCache()
+    runners = {
+        tenant: Runner(
+            user, pswd, workers=args.workers, use_http=not args.no_http, use_diff=not args.no_diff,
+            dry_run=args.dry_run, batch_budget=args.budget, cache=cache,
+            use_http_write=not (args.no_http or args.no_http_write), tenant=tenant, budgets=args.budgets
+        )
+        for tenant in by_tenant
+    }
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(runners)) as executor:
+        futures = {
+            tenant: executor.submit(run_tenant, runners[tenant], by_tenant[tenant],
+                                    SnapshotStore() if args.snapshot else None)
+            for tenant in runners
+        }
+        outcomes = {tenant: future.result() for tenant, future in futures.items()}
+
+    rows = [row for outcome in outcomes.values() for row in outcome["rows"]]
+    errors = [error for outcome in outcomes.values() for error in outcome["errors"]]
+    snapshot_failed = [cfg for outcome in outcomes.values() for cfg in (outcome["snapshot"] or {}).get("failed", [])]
+
+    def _counts(tenant_rows):
+        return {status: sum(r["status"] == status for r in tenant_rows) for status in ("updated", "skipped", "failed")}
+
+    summary = {
+        "jobs": len(jobs),
+        "destinations": len(rows),
+        **_counts(rows),
+        "job_errors": errors,
+        "tenants": {
+            tenant: {
+                "jobs": len(by_tenant[tenant]),
+                **_counts(outcome["rows"]),
+                "errors": outcome["errors"],
+                "snapshot": outcome["snapshot"],
+                "wall_seconds": outcome["wall_seconds"],
+                "phase_seconds": runners[tenant].timings,
+            }
+            for tenant, outcome in outcomes.items()
+        },
+        "workers": args.workers,
+        "dry_run": args.dry_run,
+        "wall_seconds": round(time.monotonic() - start, 3),
+        "operations": tracer.summary(),
+        "throttle": {**limiter.stats(), "decisions": list(limiter.decisions)},
+    }
+    write_report(args.report, rows, summary)
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(tracer.to_prometheus())
+    log(f"Informe guardado en {args.report}: {json.dumps({k: summary[k] for k in ('updated', 'skipped', 'failed')})}")
+    return 1 if summary["failed"] or errors or snapshot_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Raíz del repositorio: pytest la añade a sys.path para que los tests importen functions/, driver/ y benchmarks/
@@ -1,17 +1,217 @@
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.remote.client_config import ClientConfig
+from driver.remote_nodes import nodes
+import atexit
+import os
 import subprocess
+import threading
+import time
+
+
+# Perfil ligero: Management sólo lee texto de tablas y valores de inputs
+LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hotjar.com*",
+    "*clarity.ms*", "*facebook.net*", "*analytics*.js*",
+]
+
+
+def _process_tree_rss_mb(root_pids):
+    """Memoria residente (MB) de cada proceso raíz más todos sus descendientes, leyendo /proc (sólo Linux)"""
+    if not os.path.isdir("/proc"):
+        return {pid: None for pid in root_pids}
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    page = os.sysconf("SC_PAGE_SIZE")
+    result = {}
+    for root in root_pids:
+        total, stack = 0, [root]
+        while stack:
+            pid = stack.pop()
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * page
+            except (OSError, IndexError, ValueError):
+                continue
+            stack.extend(children.get(pid, []))
+        # La memoria compartida entre procesos de Chrome se suma varias veces: es una cota superior
+        result[root] = round(total / 2 ** 20, 1)
+    return result
+
+
+def _service_pid(driver):
+    try:
+        return driver.service.process.pid
+    except Exception:
+        return None
 
 
 class Driver:
-    def __init__(self, headless: bool = True):
-        self.driver = self.iniciar_chrome(headless=headless)
+    # Registro de todos los Chrome lanzados por el proceso, para poder cerrarlos al salir:
+    _registry = set()
+    _registry_lock = threading.Lock()
+    _metrics = {"launched": 0, "quit": 0, "recycled": 0, "startup_seconds": 0.0, "last_startup_seconds": None}
+
+    def __init__(self, headless: bool = True, lean: bool = None):
+        self.headless = headless
+        # Perfil ligero opcional (BROWSER_LEAN=1): carga "eager" y sin imágenes, fuentes ni analítica
+        self.lean = lean if lean is not None else os.environ.get("BROWSER_LEAN", "0") == "1"
+        # Páginas que fallan con el perfil ligero (fragmentos de URL, LEAN_EXCLUDE separado por comas)
+        self.lean_exclude = [p.strip() for p in os.environ.get("LEAN_EXCLUDE", "").split(",") if p.strip()]
+        self._driver = None
+        self._lock = threading.Lock()
+        self.page_loads = 0  # páginas cargadas por el Chrome actual (vuelve a 0 al relanzarlo)
+        self._rss = (0.0, None)  # (instante, MB) de la última medición
+        self.node = None  # nodo remoto del Chrome actual (None = local)
 
-    def iniciar_chrome(self, headless: bool = True):
+    @property
+    def driver(self):
+        """Chrome se lanza una sola vez y sólo cuando se necesita por primera vez"""
+        if self._driver is None:
+            with self._lock:
+                if self._driver is None:
+                    self._driver = self.iniciar_chrome(headless=self.headless, lean=self.lean)
+        return self._driver
+
+    def is_lean_excluded(self, url) -> bool:
+        return self.lean and any(p in url for p in self.lean_exclude)
+
+    def set_blocking(self, enabled: bool):
+        """Activa o desactiva el bloqueo de recursos del perfil ligero (p. ej. para una página excluida)"""
+        # Sin CDP en Remote WebDriver: en los nodos remotos sólo se bloquean las imágenes (preferencias)
+        if self.lean and self._driver is not None and self.node is None:
+            self._driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS if enabled else []})
+
+    @property
+    def is_running(self) -> bool:
+        return self._driver is not None
+
+    def quit(self):
+        with self._lock:
+            driver, self._driver = self._driver, None
+            node, self.node = self.node, None
+            self.page_loads = 0
+            self._rss = (0.0, None)
+        if driver is not None:
+            Driver._reap(driver)
+        if node is not None:
+            nodes.release(node)
+
+    def mark_node_failed(self, error=None):
+        """El Chrome remoto dejó de responder: su nodo no recibe sesiones hasta que pase la comprobación"""
+        if self.node is not None:
+            nodes.mark_failed(self.node, error)
+
+    def memory_mb(self, max_age: float = 5.0):
+        """Memoria residente de chromedriver y sus procesos Chrome (MB); None si no se puede medir"""
+        driver = self._driver
+        if driver is None:
+            return 0.0
+        measured_at, value = self._rss
+        if value is not None and time.monotonic() - measured_at < max_age:
+            return value
+        pid = _service_pid(driver)
+        value = _process_tree_rss_mb([pid])[pid] if pid is not None else None
+        self._rss = (time.monotonic(), value)
+        return value
+
+    @classmethod
+    def note_recycled(cls):
+        with cls._registry_lock:
+            cls._metrics["recycled"] += 1
+
+    @classmethod
+    def _reap(cls, driver):
+        """Cierra el navegador y, si chromedriver no responde, mata su proceso"""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        finally:
+            try:
+                process = driver.service.process
+                if process is not None and process.poll() is None:
+                    process.kill()
+            except Exception:
+                pass
+            with cls._registry_lock:
+                if driver in cls._registry:
+                    cls._registry.discard(driver)
+                    cls._metrics["quit"] += 1
+
+    @classmethod
+    def quit_all(cls):
+        with cls._registry_lock:
+            drivers = list(cls._registry)
+        for driver in drivers:
+            cls._reap(driver)
+
+    @classmethod
+    def metrics(cls):
+        """Número de Chrome lanzados/vivos y tiempo de arranque (segundos)"""
+        with cls._registry_lock:
+            pids = [p for p in (_service_pid(d) for d in cls._registry) if p is not None]
+        rss = [mb for mb in _process_tree_rss_mb(pids).values() if mb is not None] if pids else []
+        with cls._registry_lock:
+            launched = cls._metrics["launched"]
+            return {
+                "launched": launched,
+                "alive": len(cls._registry),
+                "quit": cls._metrics["quit"],
+                "recycled": cls._metrics["recycled"],
+                "rss_mb": round(sum(rss), 1) if rss else None,
+                "avg_startup_seconds": round(cls._metrics["startup_seconds"] / launched, 2) if launched else None,
+                "last_startup_seconds": cls._metrics["last_startup_seconds"],
+                "nodes": nodes.stats(),
+            }
+
+    def _start_remote(self, options):
+        """Abre la sesión en el nodo sano menos cargado, probando el siguiente si uno falla.
+
+        Sin nodos disponibles se usa Chrome local salvo con REMOTE_WEBDRIVER_LOCAL_FALLBACK=0.
+        """
+        timeout = float(os.environ.get("REMOTE_WEBDRIVER_TIMEOUT", 60))
+        tried = []
+        while True:
+            node = nodes.acquire(exclude=tried)
+            if node is None:
+                break
+            tried.append(node)
+            try:
+                config = ClientConfig(remote_server_addr=node.url, timeout=timeout)
+                driver = webdriver.Remote(command_executor=node.url, options=options, client_config=config)
+            except Exception as e:
+                nodes.release(node)
+                nodes.mark_failed(node, e)
+                continue
+            self.node = node
+            return driver
+
+        if os.environ.get("REMOTE_WEBDRIVER_LOCAL_FALLBACK", "1") == "1":
+            return None
+        raise WebDriverException(f"Ningún nodo de Remote WebDriver disponible ({len(nodes.nodes)} configurados)")
+
+    def iniciar_chrome(self, headless: bool = True, lean: bool = False):
+        start = time.monotonic()
 
         # Opciones de chrome
         options = Options()
+        if lean:
+            # Devuelve el control en DOMContentLoaded: las esperas por condición cubren el resto
+            options.page_load_strategy = "eager"
 
         if headless:
             options.add_argument("--headless=new")
@@ -52,15 +252,37 @@ class Driver:
             'intl.accept_languages': ['es-ES', 'es'],
             'credentials_enable_service': False
         }
+        if lean:
+            prefs['profile.managed_default_content_settings.images'] = 2
         options.add_experimental_option("prefs", prefs)
 
-        service = Service()
+        driver = self._start_remote(options) if nodes else None
+        if driver is None:
+            service = Service()
 
-        try:
-            service.creation_flags = subprocess.CREATE_NO_WINDOW
-        except Exception:
-            pass
+            try:
+                service.creation_flags = subprocess.CREATE_NO_WINDOW
+            except Exception:
+                pass
+
+            driver = webdriver.Chrome(options=options, service=service)
+
+        if lean and self.node is None:
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+            except Exception:
+                pass  # Sin CDP seguimos con el bloqueo de imágenes de las preferencias
+
+        elapsed = round(time.monotonic() - start, 2)
+        with Driver._registry_lock:
+            Driver._registry.add(driver)
+            Driver._metrics["launched"] += 1
+            Driver._metrics["startup_seconds"] += elapsed
+            Driver._metrics["last_startup_seconds"] = elapsed
+
+        return driver
 
-        driver = webdriver.Chrome(options=options, service=service)
 
-        return driver
\ No newline at end of file
+# Ningún Chrome debe sobrevivir al proceso de Python:
+atexit.register(Driver.quit_all)
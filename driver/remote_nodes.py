@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+import urllib.request
+
+
+class Node:
+    """Un endpoint de Remote WebDriver (nodo de Selenium Grid o chromedriver en otra máquina/puerto)"""
+
+    def __init__(self, url, max_sessions):
+        self.url = url.rstrip("/")
+        self.max_sessions = max(1, int(max_sessions))
+        self.sessions = 0          # navegadores abiertos ahora mismo en el nodo
+        self.healthy = None        # None hasta la primera comprobación
+        self.checked_at = 0.0
+        self.failures = 0          # caídas o comprobaciones fallidas seguidas
+        self.launched = 0
+        self.last_error = None
+
+    def as_dict(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "sessions": self.sessions,
+            "max_sessions": self.max_sessions,
+            "launched": self.launched,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class NodeRegistry:
+    """Reparte los navegadores entre varios endpoints de Remote WebDriver.
+
+    Cada navegador nuevo va al nodo sano con menos sesiones en proporción a su capacidad. La salud se
+    comprueba con GET /status (como mucho cada check_interval segundos por nodo); un nodo marcado como caído
+    no recibe sesiones hasta que vuelve a responder.
+
+    Para probar en una sola máquina, varios chromedriver en distintos puertos hacen de nodos:
+        chromedriver --port=9515 & chromedriver --port=9516 &
+        REMOTE_WEBDRIVER_URLS=http://127.0.0.1:9515,http://127.0.0.1:9516 streamlit run app.py
+    """
+
+    def __init__(self, urls=(), max_sessions=4, check_interval=15.0, timeout=3.0):
+        self.nodes = [Node(u, max_sessions) for u in urls if u.strip()]
+        self.check_interval = float(check_interval)
+        self.timeout = float(timeout)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            urls=os.environ.get("REMOTE_WEBDRIVER_URLS", "").split(","),
+            max_sessions=int(os.environ.get("REMOTE_WEBDRIVER_SESSIONS", 4)),
+            check_interval=float(os.environ.get("REMOTE_WEBDRIVER_CHECK_SECONDS", 15)),
+        )
+
+    def __bool__(self):
+        return bool(self.nodes)
+
+    # ------------ Salud ------------
+
+    def _probe(self, node):
+        """True si el nodo acepta sesiones nuevas (campo ready de /status en W3C)"""
+        try:
+            with urllib.request.urlopen(f"{node.url}/status", timeout=self.timeout) as response:
+                value = json.loads(response.read().decode("utf-8")).get("value", {})
+            ready = value.get("ready", True) if isinstance(value, dict) else True
+            return bool(ready), None if ready else "el nodo no está listo"
+        except Exception as e:
+            return False, f"{type(e).__name__}: {e}"
+
+    def check(self, node, force=False):
+        if not force and time.monotonic() - node.checked_at < self.check_interval and node.healthy is not None:
+            return node.healthy
+        healthy, error = self._probe(node)
+        with self._lock:
+            node.healthy, node.checked_at = healthy, time.monotonic()
+            if healthy:
+                node.failures, node.last_error = 0, None
+            else:
+                node.failures += 1
+                node.last_error = error
+        return healthy
+
+    # ------------ Reparto ------------
+
+    def acquire(self, exclude=()):
+        """Reserva una sesión en el nodo sano menos cargado; None si no queda ninguno con hueco"""
+        for node in self.nodes:
+            if node not in exclude:
+                self.check(node)
+        with self._lock:
+            candidates = [n for n in self.nodes
+                          if n not in exclude and n.healthy and n.sessions < n.max_sessions]
+            if not candidates:
+                return None
+            node = min(candidates, key=lambda n: (n.sessions / n.max_sessions, n.failures))
+            node.sessions += 1
+            node.launched += 1
+            return node
+
+    def release(self, node):
+        with self._lock:
+            node.sessions = max(0, node.sessions - 1)
+
+    def mark_failed(self, node, error=None):
+        """El nodo falló (al crear la sesión o a mitad de una tarea): deja de recibir sesiones hasta que
+        vuelva a pasar la comprobación de salud"""
+        with self._lock:
+            node.healthy = False
+            node.checked_at = time.monotonic()
+            node.failures += 1
+            if error is not None:
+                node.last_error = f"{type(error).__name__}: {error}" if isinstance(error, Exception) else str(error)
+
+    def stats(self):
+        with self._lock:
+            return [n.as_dict() for n in self.nodes]
+
+
+# Nodos compartidos por todos los navegadores del proceso (vacío = sólo Chrome local)
+nodes = NodeRegistry.from_env()
@@ -0,0 +1,194 @@
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+from functions.management import Management, DEFAULT_TENANT, account_key
+
+
+class PoolExhausted(RuntimeError):
+    """No quedó ningún navegador libre dentro del tiempo de espera"""
+
+
+class BrowserPool:
+    """Pool de navegadores autenticados compartido por todas las sesiones de Streamlit del proceso.
+
+    Cada sesión pide prestado un navegador para una operación y lo devuelve al terminar, de modo que el
+    número de Chrome abiertos depende de size y no del número de operadores conectados. Los navegadores
+    libres se agrupan por cuenta (usuario y cliente impersonado): uno impersonado como un cliente no sirve
+    para otro.
+    """
+
+    def __init__(self, size: int = 2, budgets=None):
+        self.size = max(1, int(size))
+        self.budgets = budgets  # presupuestos de espera de los navegadores (ver functions/waits.py)
+        self._cond = threading.Condition()
+        self._idle = {}         # { cuenta: [Management autenticado e impersonado, ...] }
+        self._spare = []        # Chrome ya lanzados pero sin login, listos para cualquier usuario
+        self._credentials = {}  # { user: pswd } de los logins verificados
+        self._total = 0         # navegadores vivos (libres + prestados + arrancando)
+
+    # ------------ Creación y salud ------------
+
+    def _launch(self):
+        """Lanza un Chrome sin autenticar (lo más lento del arranque)"""
+        manage = Management(None, None, budgets=self.budgets)
+        manage._init_driver()
+        return manage
+
+    def _authenticate(self, manage, user, pswd, tenant=None):
+        manage.user, manage.pswd = user, pswd
+        manage.tenant = tenant or DEFAULT_TENANT
+        manage.config_index = {}
+        if not manage.login():
+            raise RuntimeError("Login fallido")
+        manage.impersonate()
+        return manage
+
+    @staticmethod
+    def _is_healthy(manage) -> bool:
+        return manage.driver_instance.is_running and manage._is_window_alive()
+
+    def _dispose(self, manage):
+        try:
+            manage.close(hard=True)
+        except Exception:
+            pass
+
+    def warm(self, n: int = 1):
+        """Lanza en segundo plano hasta n navegadores de reserva sin superar el tamaño del pool"""
+        def _run():
+            for _ in range(n):
+                with self._cond:
+                    if self._total >= self.size:
+                        return
+                    self._total += 1
+                try:
+                    manage = self._launch()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify_all()
+                    return
+                with self._cond:
+                    self._spare.append(manage)
+                    self._cond.notify_all()
+
+        threading.Thread(target=_run, name="browser-pool-warm", daemon=True).start()
+
+    # ------------ Préstamo ------------
+
+    def checkout(self, user, pswd=None, timeout=None, tenant=None):
+        """Presta un navegador autenticado como user e impersonado como tenant; si se indica pswd se verifica
+        contra el último login"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        key = account_key(user, tenant)
+
+        with self._cond:
+            known = self._credentials.get(user)
+            if pswd is None:
+                if known is None:
+                    raise KeyError(f"No hay credenciales registradas para {user}")
+                pswd = known
+            # Con una contraseña distinta a la conocida no se toca ningún navegador autenticado: se verifica con
+            # un login nuevo y, si falla, el préstamo se rechaza sin cerrar nada de las otras sesiones
+            verified = known is not None and hmac.compare_digest(known, pswd)
+
+            while True:
+                reuse = self._idle.get(key) if verified else None
+                if reuse:
+                    manage, source = reuse.pop(), "idle"
+                    break
+                if self._spare:
+                    manage, source = self._spare.pop(), "spare"
+                    break
+                if self._total < self.size:
+                    self._total += 1
+                    manage, source = None, "new"
+                    break
+                # Pool lleno: liberamos un navegador libre de otra cuenta, si lo hay
+                victim = next((k for k, lst in self._idle.items() if k != key and lst), None) if verified else None
+                if victim is not None:
+                    manage, source = self._idle[victim].pop(), "evict"
+                    break
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolExhausted(f"No hay navegadores libres en el pool (tamaño {self.size})")
+                self._cond.wait(remaining if remaining is not None else 1.0)
+
+        try:
+            if source == "idle" and not self._is_healthy(manage):
+                self._dispose(manage)
+                source = "new"
+            if source == "evict":
+                self._dispose(manage)
+                source = "new"
+            if source == "new":
+                manage = self._launch()
+            if source != "idle":
+                self._authenticate(manage, user, pswd, tenant)
+        except Exception:
+            if manage is not None:
+                self._dispose(manage)
+            with self._cond:
+                self._total -= 1
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._credentials[user] = pswd
+        return manage
+
+    def checkin(self, manage):
+        """Devuelve un navegador al pool (si sigue vivo)"""
+        if not self._is_healthy(manage):
+            self.discard(manage)
+            return
+        with self._cond:
+            self._idle.setdefault(manage.account, []).append(manage)
+            self._cond.notify_all()
+
+    def discard(self, manage):
+        self._dispose(manage)
+        with self._cond:
+            self._total -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, user, pswd=None, timeout=None, tenant=None):
+        manage = self.checkout(user, pswd, timeout=timeout, tenant=tenant)
+        try:
+            yield manage
+        finally:
+            self.checkin(manage)
+
+    # ------------ Gestión ------------
+
+    def _take_idle(self, user):
+        """Saca del pool los navegadores libres de user, de cualquier cliente (llamar con el lock tomado)"""
+        taken = []
+        for key in [k for k, lst in self._idle.items() if any(m.user == user for m in lst)]:
+            taken.extend(self._idle.pop(key))
+        self._total -= len(taken)
+        self._cond.notify_all()
+        return taken
+
+    def forget(self, user):
+        """Olvida las credenciales de user y cierra sus navegadores libres"""
+        with self._cond:
+            self._credentials.pop(user, None)
+            taken = self._take_idle(user)
+        # Cerrar Chrome es lento: fuera del lock para no bloquear al resto de sesiones
+        for manage in taken:
+            self._dispose(manage)
+
+    def stats(self):
+        with self._cond:
+            idle = sum(len(lst) for lst in self._idle.values())
+            return {
+                "size": self.size,
+                "alive": self._total,
+                "idle": idle,
+                "spare": len(self._spare),
+                "in_use": self._total - idle - len(self._spare),
+            }
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TariffCache:
+    """Caché persistente (SQLite) de tarifa y última actualización por usuario de plataforma y configuración"""
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or os.environ.get("CONFIG_CACHE_PATH", os.path.join(".cache", "configs.sqlite"))
+        self.ttl = float(ttl if ttl is not None else os.environ.get("CONFIG_CACHE_TTL", 24 * 3600))  # segundos
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS configs (
+                    account TEXT NOT NULL,
+                    config TEXT NOT NULL,
+                    tariff TEXT,
+                    last_updated TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (account, config)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commit / rollback
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self, account):
+        """Entradas no caducadas: ({cfg: tariff}, {cfg: last_updated})"""
+        min_fetched_at = time.time() - self.ttl
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT config, tariff, last_updated FROM configs WHERE account = ? AND fetched_at >= ?",
+                (account, min_fetched_at)
+            ).fetchall()
+        tariffs = {cfg: tariff for cfg, tariff, _ in rows}
+        last_updated = {cfg: lu for cfg, _, lu in rows}
+        return tariffs, last_updated
+
+    def put(self, account, cfg, tariff, last_updated):
+        self.put_many(account, [(cfg, tariff, last_updated)])
+
+    def put_many(self, account, entries):
+        """Guarda (cfg, tariff, last_updated); las detecciones fallidas (tarifa None) no se guardan"""
+        now = time.time()
+        rows = [(account, cfg, tariff, lu, now) for cfg, tariff, lu in entries if tariff is not None]
+        if not rows:
+            return
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO configs (account, config, tariff, last_updated, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def invalidate(self, account, cfgs):
+        """Marca como caducadas las configuraciones (p. ej. tras escribirlas con replicate_to)"""
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "UPDATE configs SET fetched_at = 0 WHERE account = ? AND config = ?",
+                [(account, cfg) for cfg in cfgs]
+            )
+
+    def forget(self, account, cfgs=None):
+        """Elimina las configuraciones indicadas (o todas las del usuario)"""
+        with self._lock, self._connect() as conn:
+            if cfgs is None:
+                conn.execute("DELETE FROM configs WHERE account = ?", (account,))
+            else:
+                conn.executemany(
+                    "DELETE FROM configs WHERE account = ? AND config = ?",
+                    [(account, cfg) for cfg in cfgs]
+                )
@@ -0,0 +1,93 @@
+from decimal import Decimal, InvalidOperation
+
+
+def normalize_price(value):
+    """Normaliza un precio para compararlo: '0,123400', '0.1234' y ' 0.12340 ' valen lo mismo.
+
+    Devuelve un Decimal, None si la celda está vacía o el texto original si no es un número.
+    """
+    text = str(value if value is not None else "").strip().replace(" ", "")
+    if not text:
+        return None
+    if "," in text and "." in text:
+        # Con ambos separadores, el último es el decimal y el otro el de miles
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    else:
+        text = text.replace(",", ".")
+    try:
+        return Decimal(text).normalize()
+    except InvalidOperation:
+        return text
+
+
+class PriceTable(dict):
+    """{columna: [valores]} de una tabla de precios leída de la plataforma.
+
+    writable indica, fila a fila, qué celdas escribe de verdad el formulario: {"visible": [...], "energy": [...],
+    "power": [...]} (None si no se conoce). Las filas ocultas y los inputs deshabilitados no se replican nunca.
+    """
+
+    def __init__(self, data, writable=None):
+        super().__init__(data)
+        self.writable = writable
+
+
+def _column(data, position):
+    keys = list(data)
+    return list(data[keys[position]]) if len(keys) > position else []
+
+
+def _written_cells(origin_data, writable):
+    """[(campo, posición, fila del origen, fila del destino)] que escribiría el formulario en el destino.
+
+    Igual que fill_rate_form: la fila visible i del destino recibe el valor i del origen, sólo hasta el número de
+    precios de energía del origen y sólo en los inputs editables.
+    """
+    visible = [r for r, shown in enumerate(writable["visible"]) if shown]
+    n = min(len(visible), len(_column(origin_data, 1)))
+    cells = []
+    for field, position, key in (("energía", 1, "energy"), ("potencia", 2, "power")):
+        o_len = len(_column(origin_data, position))
+        cells.extend((field, position, i, r) for i, r in enumerate(visible[:n]) if writable[key][r] and i < o_len)
+    return cells
+
+
+def diff_config(origin_data: dict, dest_data: dict, writable=None):
+    """Diferencias campo a campo entre dos tablas de precios: [{period, field, origin, destination}]
+
+    Con writable (el de PriceTable del destino) sólo se comparan las celdas que escribe la réplica.
+    """
+    differences = []
+    o_periods, d_periods = _column(origin_data, 0), _column(dest_data, 0)
+    writable = writable if writable is not None else getattr(dest_data, "writable", None)
+
+    if writable is not None:
+        for field, position, i, r in _written_cells(origin_data, writable):
+            o, d_values = _column(origin_data, position)[i], _column(dest_data, position)
+            d = d_values[r] if r < len(d_values) else None
+            if normalize_price(o) != normalize_price(d):
+                period = d_periods[r] if r < len(d_periods) else str(r + 1)
+                differences.append({"period": period, "field": field, "origin": o, "destination": d})
+        return differences
+
+    for field, position in (("energía", 1), ("potencia", 2)):
+        o_values, d_values = _column(origin_data, position), _column(dest_data, position)
+        for i in range(max(len(o_values), len(d_values))):
+            o = o_values[i] if i < len(o_values) else None
+            d = d_values[i] if i < len(d_values) else None
+            if normalize_price(o) != normalize_price(d):
+                period = o_periods[i] if i < len(o_periods) else (d_periods[i] if i < len(d_periods) else str(i + 1))
+                differences.append({"period": period, "field": field, "origin": o, "destination": d})
+
+    return differences
+
+
+def diff_names(known, current):
+    """Altas y bajas de la lista de configuraciones: (añadidas en el orden de current, eliminadas)"""
+    known, current_set = set(known), set(current)
+    added = [c for c in dict.fromkeys(current) if c not in known]
+    removed = sorted(known - current_set)
+    return added, removed
@@ -0,0 +1,100 @@
+from selenium.common.exceptions import NoSuchElementException
+from functions.diff import PriceTable
+
+# Extracción masiva del DOM: un único execute_script por página en lugar de un find_element por celda.
+
+CONFIG_ROWS_JS = """
+var rows = document.querySelectorAll('table#mainTable > tbody > tr');
+var out = [];
+for (var i = 0; i < rows.length; i++) {
+    var cells = rows[i].cells;
+    var link = cells.length >= 6
+        ? cells[5].querySelector('div > a[title*="Modificar configuración"]')
+        : null;
+    out.push({
+        index: i,
+        name: cells.length ? (cells[0].innerText || '').trim() : '',
+        has_link: link !== null,
+        href: (link && link.getAttribute('href') !== null) ? link.href : '',
+        onclick: link ? (link.getAttribute('onclick') || '') : ''
+    });
+}
+return out;
+"""
+
+PRICE_TABLE_JS = """
+var table = document.querySelector('div[class="scrollabletable"] > table');
+if (!table) { return null; }
+
+function text(el) { return el ? (el.innerText || '').trim() : ''; }
+function editable(input) {
+    if (!input || input.disabled) { return false; }
+    if (input.hasAttribute('disabled') || ['true', '1'].indexOf(input.getAttribute('aria-disabled')) >= 0) { return false; }
+    if (input.hasAttribute('readonly') || ['true', '1'].indexOf(input.getAttribute('aria-readonly')) >= 0) { return false; }
+    return true;
+}
+
+// Cabeceras: periodo (th[1]) y unidades de energía (th[2]) y potencia (th[5])
+var headers = [];
+var ths = table.querySelectorAll('thead > tr > th');
+if (ths.length) { headers.push(text(ths[0])); }
+[1, 4].forEach(function (i) {
+    var p = ths.length > i ? ths[i].querySelector('p[class="smalltext"]') : null;
+    if (p) { headers.push(text(p)); }
+});
+
+var rows = [];
+var trs = table.querySelectorAll('tbody > tr');
+for (var r = 0; r < trs.length; r++) {
+    var cells = trs[r].cells;
+    var energy = cells.length > 1 ? cells[1].querySelector('input') : null;
+    var power = cells.length > 4 ? cells[4].querySelector('input') : null;
+    rows.push({
+        period: text(cells[0]),
+        energy: energy ? (energy.value || '') : null,
+        power: power ? (power.value || '') : null,
+        energy_editable: editable(energy),
+        power_editable: editable(power),
+        visible: (trs[r].getAttribute('style') || '').indexOf('display: none') < 0
+    });
+}
+return {headers: headers, rows: rows};
+"""
+
+
+def config_rows(driver):
+    """Filas de mainTable: [{index, name, has_link, href, onclick}, ...]"""
+    return driver.execute_script(CONFIG_ROWS_JS) or []
+
+
+def price_table(driver):
+    """Tabla de precios del formulario: {headers: [...], rows: [{period, energy, power, ...}, ...]} o None"""
+    return driver.execute_script(PRICE_TABLE_JS)
+
+
+def price_table_ready(driver):
+    """Condición de espera: devuelve la tabla de precios en cuanto tiene filas"""
+    table = price_table(driver)
+    if table and table["rows"]:
+        return table
+    return False
+
+
+def to_data_config(table):
+    """Convierte la tabla extraída al diccionario {columna: [valores]} que usa la app (un PriceTable)"""
+    keys = table["headers"]
+    if len(keys) < 3:
+        raise NoSuchElementException(f"La cabecera de la tabla de precios no es la esperada: {keys}")
+
+    data = {k: [] for k in keys}
+    writable = {"visible": [], "energy": [], "power": []}
+    for row in table["rows"]:
+        if row["energy"] is None or row["power"] is None:
+            raise NoSuchElementException(f"La fila '{row['period']}' de la tabla de precios no tiene los campos esperados")
+        data[keys[0]].append(row["period"])
+        data[keys[1]].append(row["energy"])
+        data[keys[2]].append(row["power"])
+        writable["visible"].append(row["visible"])
+        writable["energy"].append(row["energy_editable"])
+        writable["power"].append(row["power_editable"])
+    return PriceTable(data, writable)
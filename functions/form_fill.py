@@ -0,0 +1,62 @@
+# Escritura masiva del formulario powermanagementrate: un único execute_script por destino.
+
+FILL_RATE_FORM_JS = """
+var lastUpdated = arguments[0], energy = arguments[1], power = arguments[2];
+
+// Mismo criterio que Management._is_editable:
+function editable(input) {
+    if (!input || input.disabled) { return false; }
+    if (input.hasAttribute('disabled') || ['true', '1'].indexOf(input.getAttribute('aria-disabled')) >= 0) { return false; }
+    if (input.hasAttribute('readonly') || ['true', '1'].indexOf(input.getAttribute('aria-readonly')) >= 0) { return false; }
+    return true;
+}
+function setValue(input, value) {
+    input.value = value;
+    input.dispatchEvent(new Event('input', {bubbles: true}));
+    input.dispatchEvent(new Event('change', {bubbles: true}));
+}
+
+var result = {date: null, cells: [], skipped: []};
+
+// El datepicker suele ser readonly: lo desbloqueamos igual que en el modo clásico
+var date = document.querySelector('form#powermanagementrate > fieldset > input.hasDatepicker');
+if (date) {
+    date.removeAttribute('readonly');
+    setValue(date, lastUpdated);
+    result.date = date.value;
+}
+
+var rows = Array.prototype.filter.call(
+    document.querySelectorAll('div[class="scrollabletable"] > table > tbody > tr'),
+    function (tr) { return (tr.getAttribute('style') || '').indexOf('display: none') < 0; }
+);
+var n = Math.min(rows.length, energy.length);
+for (var i = 0; i < n; i++) {
+    var cells = rows[i].cells;
+    var fields = [
+        ['energy', cells.length > 1 ? cells[1].querySelector('input') : null, energy[i]],
+        ['power', cells.length > 4 ? cells[4].querySelector('input') : null, i < power.length ? power[i] : null]
+    ];
+    fields.forEach(function (f) {
+        if (f[2] === null || f[2] === undefined) { return; }
+        if (!editable(f[1])) { result.skipped.push({row: i, field: f[0]}); return; }
+        setValue(f[1], f[2]);
+        result.cells.push({row: i, field: f[0], value: f[1].value});
+    });
+}
+return result;
+"""
+
+
+def fill_rate_form(driver, last_updated, energy, power):
+    """Escribe fecha y precios visibles de una vez: {date, cells: [{row, field, value}], skipped: [...]}"""
+    return driver.execute_script(FILL_RATE_FORM_JS, last_updated, list(energy), list(power))
+
+
+def mismatches(report, last_updated, energy, power):
+    """Celdas cuyo valor leído tras escribir no coincide con el solicitado"""
+    expected = {"energy": list(energy), "power": list(power)}
+    wrong = [c for c in report["cells"] if c["value"] != expected[c["field"]][c["row"]]]
+    if report["date"] != last_updated:
+        wrong.append({"row": None, "field": "date", "value": report["date"]})
+    return wrong
@@ -0,0 +1,331 @@
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+import re
+import requests
+from requests.adapters import HTTPAdapter
+from functions.diff import diff_names, PriceTable
+from functions.throttle import limiter
+
+
+class HttpReadError(Exception):
+    """La página no se pudo leer por HTTP (sesión caducada, maquetación distinta...): usar Selenium"""
+
+
+# Etiquetas sin cierre y etiquetas que el navegador cierra implícitamente (tag: (cierra, ámbito))
+_VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+_AUTOCLOSE = {
+    "td": ({"td", "th"}, {"tr", "table"}),
+    "th": ({"td", "th"}, {"tr", "table"}),
+    "tr": ({"tr"}, {"table", "tbody", "thead", "tfoot"}),
+    "option": ({"option"}, {"select"}),
+    "li": ({"li"}, {"ul", "ol"}),
+    "p": ({"p"}, {"div", "form", "fieldset", "td", "th", "body"}),
+}
+
+
+class _TreeBuilder(HTMLParser):
+    """Convierte HTML (no necesariamente XHTML válido) en un árbol de ElementTree consultable con XPath"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = ET.Element("document")
+        self.stack = [self.root]
+
+    @staticmethod
+    def _attrs(attrs):
+        # Los atributos booleanos (selected, disabled...) llegan sin valor: los guardamos como en el DOM
+        return {k: (v if v is not None else k) for k, v in attrs}
+
+    def handle_starttag(self, tag, attrs):
+        closes, scope = _AUTOCLOSE.get(tag, (None, None))
+        if closes:
+            for i in range(len(self.stack) - 1, 0, -1):
+                current = self.stack[i].tag
+                if current in closes:
+                    del self.stack[i:]
+                    break
+                if current in scope:
+                    break
+
+        el = ET.SubElement(self.stack[-1], tag, self._attrs(attrs))
+        if tag not in _VOID:
+            self.stack.append(el)
+
+    def handle_startendtag(self, tag, attrs):
+        ET.SubElement(self.stack[-1], tag, self._attrs(attrs))
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                break
+
+    def handle_data(self, data):
+        parent = self.stack[-1]
+        if len(parent):
+            parent[-1].tail = (parent[-1].tail or "") + data
+        else:
+            parent.text = (parent.text or "") + data
+
+
+def parse_html(html: str):
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def _text(el) -> str:
+    if el is None:
+        return ""
+    return " ".join("".join(el.itertext()).split())
+
+
+def _body_rows(table):
+    """Filas de datos de una tabla, tenga o no <tbody> en el HTML original"""
+    rows = table.findall("./tbody/tr")
+    if not rows:
+        rows = [tr for tr in table.findall("./tr") if tr.find("./td") is not None]
+    return rows
+
+
+def _cell(row, position):
+    cells = row.findall("./td")
+    return cells[position - 1] if len(cells) >= position else None
+
+
+def _editable(el) -> bool:
+    """Mismo criterio que Management._is_editable sobre un <input> del HTML"""
+    if el is None or el.get("disabled") is not None or el.get("readonly") is not None:
+        return False
+    return el.get("aria-disabled") not in ("true", "1") and el.get("aria-readonly") not in ("true", "1")
+
+
+class HttpConfigReader:
+    """Lector de configuraciones por HTTP que reutiliza las cookies de la sesión de Selenium"""
+
+    def __init__(self, base_url, cookies, user_agent=None, config_index=None, workers: int = 8):
+        self.base_url = base_url
+        self.cfgs_url = f'{self.base_url}/?target=powermanagement'
+        self.workers = max(1, int(workers))
+        self.config_index = dict(config_index or {})  # { "cfg_name": "URL de edición" }
+        self._index_lock = threading.Lock()
+
+        self.session = requests.Session()
+        # Conexiones keep-alive suficientes para todas las peticiones concurrentes:
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+        self.session.headers["Accept-Language"] = "es-ES,es;q=0.9"
+
+        for c in cookies:
+            self.session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+
+    @classmethod
+    def from_management(cls, manage, workers: int = 8):
+        """Crea el lector a partir de un Management ya autenticado (tras login() y la impersonación)"""
+        manage.ensure_session()
+        cookies = manage.driver.get_cookies()
+        try:
+            user_agent = manage.driver.execute_script("return navigator.userAgent")
+        except Exception:
+            user_agent = None
+        return cls(manage.base_url, cookies, user_agent=user_agent,
+                   config_index=manage.config_index, workers=workers)
+
+    def close(self):
+        self.session.close()
+
+    def _fetch(self, url, method="get", **kwargs):
+        """Descarga una página y la devuelve parseada junto con su URL final"""
+        # Mismo limitador que los navegadores: un 429/5xx o una sesión expulsada reducen la concurrencia
+        with limiter.slot("http") as handle:
+            try:
+                response = self.session.request(method, url, timeout=30, **kwargs)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise HttpReadError(f"Error HTTP al acceder a {url}: {e}") from e
+
+            if "target=auth" in response.url:
+                handle["error"] = "redirección al login"
+                raise HttpReadError("La sesión HTTP no está autenticada (redirección al login)")
+
+        root = parse_html(response.text)
+        if root.find(".//input[@id='password']") is not None:
+            raise HttpReadError("La sesión HTTP no está autenticada (formulario de login)")
+        return root, response.url
+
+    def _edit_url(self, row, page_url):
+        for link in row.iterfind(".//a"):
+            if "Modificar configuración" not in link.get("title", ""):
+                continue
+            href = (link.get("href") or "").strip()
+            onclick = (link.get("onclick") or "").strip()
+            if (not href or href.lower().startswith("javascript")) and onclick:
+                m = re.search(r"window\.open\(['\"]([^'\"]+)", onclick)
+                if m:
+                    href = m.group(1).strip()
+            if href and urlparse(href).scheme.lower() in ("", "http", "https"):
+                return urljoin(page_url, href)
+        return None
+
+    def get_config_list(self):
+        """Devuelve la lista de configuraciones y refresca el índice nombre -> URL de edición"""
+        root, page_url = self._fetch(self.cfgs_url)
+        table = root.find(".//table[@id='mainTable']")
+        if table is None:
+            raise HttpReadError("No se encontró la tabla de configuraciones")
+
+        index, config_names = {}, []
+        for row in _body_rows(table):
+            config_name = _text(_cell(row, 1))
+            if not config_name or config_name in index:
+                continue
+            index[config_name] = self._edit_url(row, page_url)
+            config_names.append(config_name)
+
+        if not config_names:
+            # Si la tabla se rellena con JS no hay filas en el HTML: no podemos leerla por HTTP
+            raise HttpReadError("La tabla de configuraciones no tiene filas en el HTML")
+
+        with self._index_lock:
+            self.config_index = index
+        return config_names
+
+    def refresh_config_list(self, known):
+        """Mismo contrato que Management.refresh_config_list: (configs, añadidas, eliminadas)"""
+        config_names = self.get_config_list()
+        added, removed = diff_names(known, config_names)
+        return config_names, added, removed
+
+    def _submit_b4(self, root, page_url):
+        """Reproduce el click en "B4" (añadir nuevo cambio) enviando su formulario"""
+        parents = {child: parent for parent in root.iter() for child in parent}
+        button = root.find(".//p/input[@name='B4']")
+        if button is None:
+            raise HttpReadError("No se encontró el botón B4 en la página de edición")
+
+        form = parents.get(button)
+        while form is not None and form.tag != "form":
+            form = parents.get(form)
+
+        if form is None:
+            # Sin formulario: sólo podemos seguirlo si el onclick lleva a una URL
+            m = re.search(r"(?:location(?:\.href)?\s*=|window\.open\()\s*['\"]([^'\"]+)", button.get("onclick", ""))
+            if not m:
+                raise HttpReadError("El botón B4 no pertenece a ningún formulario")
+            return self._fetch(urljoin(page_url, m.group(1)))
+
+        fields = []
+        for el in form.iter():
+            name = el.get("name")
+            if not name or el.get("disabled") is not None:
+                continue
+            if el.tag == "input":
+                kind = el.get("type", "text").lower()
+                if kind in ("submit", "button", "image", "reset") and el is not button:
+                    continue
+                if kind in ("checkbox", "radio") and el.get("checked") is None:
+                    continue
+                fields.append((name, el.get("value", "")))
+            elif el.tag == "select":
+                options = el.findall(".//option")
+                selected = [o for o in options if o.get("selected") is not None] or options[:1]
+                fields.extend((name, o.get("value", _text(o))) for o in selected)
+            elif el.tag == "textarea":
+                fields.append((name, el.text or ""))
+
+        action = urljoin(page_url, form.get("action") or page_url)
+        if form.get("method", "get").lower() == "post":
+            return self._fetch(action, method="post", data=fields)
+        # En un envío GET el navegador sustituye la query de la acción por los campos del formulario
+        return self._fetch(urlparse(action)._replace(query="").geturl(), params=fields)
+
+    def _resolve(self, cfg):
+        with self._index_lock:
+            edit_url = self.config_index.get(cfg)
+        if edit_url is None:
+            self.get_config_list()
+            with self._index_lock:
+                edit_url = self.config_index.get(cfg)
+        if edit_url is None:
+            raise HttpReadError(f"No se encontró la configuración {cfg}")
+        return edit_url
+
+    def detect_config(self, cfg, origin=False):
+        """Mismo contrato que Management.detect_config: (last_update, tariff) o (last_update, data, tariff)"""
+        root, page_url = self._fetch(self._resolve(cfg))
+
+        changes = root.find(".//table[@id='mainTable']")
+        rows = _body_rows(changes) if changes is not None else []
+        if not rows:
+            raise HttpReadError(f"No se encontró el histórico de cambios de {cfg}")
+        last_update = _text(_cell(rows[0], 2))
+
+        root, page_url = self._submit_b4(root, page_url)
+
+        option = root.find(".//form[@id='powermanagementrate']/fieldset/select[@name='timeschemaid']/option[@selected]")
+        if option is None:
+            raise HttpReadError(f"No se encontró la tarifa de {cfg}")
+        tariff = _text(option)
+
+        if not origin:
+            return last_update, tariff
+
+        table = root.find(".//div[@class='scrollabletable']/table")
+        if table is None:
+            raise HttpReadError(f"No se encontró la tabla de precios de {cfg}")
+
+        # Columnas: periodo (th[1]) y las unidades de energía (th[2]) y potencia (th[5]):
+        headers = table.findall("./thead/tr/th")
+        if len(headers) < 5:
+            raise HttpReadError(f"La tabla de precios de {cfg} no tiene la cabecera esperada")
+        keys = [_text(headers[0])] + [_text(headers[i].find("./p[@class='smalltext']")) for i in (1, 4)]
+
+        data = {k: [] for k in keys}
+        writable = {"visible": [], "energy": [], "power": []}
+        for row in _body_rows(table):
+            energy_input = _cell(row, 2)
+            power_input = _cell(row, 5)
+            energy_input = energy_input.find("./input") if energy_input is not None else None
+            power_input = power_input.find("./input") if power_input is not None else None
+            if energy_input is None or power_input is None:
+                raise HttpReadError(f"La tabla de precios de {cfg} no tiene la maquetación esperada")
+
+            data[keys[0]].append(_text(_cell(row, 1)))
+            data[keys[1]].append(energy_input.get("value") or "")
+            data[keys[2]].append(power_input.get("value") or "")
+            writable["visible"].append("display: none" not in (row.get("style") or ""))
+            writable["energy"].append(_editable(energy_input))
+            writable["power"].append(_editable(power_input))
+
+        return last_update, PriceTable(data, writable), tariff
+
+    def imap(self, cfgs, origin=False):
+        """Lee varias configuraciones en paralelo: (cfg, resultado de detect_config, error) según terminan"""
+        cfgs = list(cfgs)
+        if not cfgs:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(cfgs))) as executor:
+            futures = {executor.submit(self.detect_config, cfg, origin): cfg for cfg in cfgs}
+            for future in as_completed(futures):
+                cfg = futures[future]
+                try:
+                    yield cfg, future.result(), None
+                except Exception as e:
+                    yield cfg, None, e
+
+    def detect_many(self, cfgs):
+        """Detecta la tarifa de varias configuraciones en paralelo: (cfg, last_update, tariff, error)"""
+        for cfg, result, error in self.imap(cfgs):
+            if error is not None:
+                yield cfg, None, None, error
+            else:
+                last_update, tariff = result
+                yield cfg, last_update, tariff, None
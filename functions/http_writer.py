@@ -0,0 +1,253 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse, parse_qsl, urlencode
+from functions.http_reader import HttpConfigReader, HttpReadError, _body_rows, _cell, _editable, _text
+
+ENERGY_KEY = "(precio/unidad energía)"
+POWER_KEY = "(precio/unidad potencia/día)"
+
+# Campos que cambian en cada carga del formulario: con ellos la plantilla no se puede reutilizar
+_PER_REQUEST_FIELD = re.compile(r"token|csrf|nonce|viewstate", re.IGNORECASE)
+
+
+class HttpWriteError(HttpReadError):
+    """El guardado por HTTP no fue posible; sent indica si el POST llegó a enviarse"""
+
+    def __init__(self, message, sent=False):
+        super().__init__(message)
+        self.sent = sent
+
+
+class HttpConfigWriter(HttpConfigReader):
+    """Guarda réplicas con un único POST usando una plantilla del formulario powermanagementrate por tarifa.
+
+    La plantilla (nombres de campos, ocultos y acción) se captura renderizando el formulario de cada tipo de
+    tarifa; los campos que no dependen del destino sólo se reutilizan cuando dos configuraciones distintas
+    coinciden en ellos. Si la maquetación no es la esperada se lanza HttpWriteError(sent=False) y el destino se
+    escribe con Selenium; un fallo tras enviar el POST no se repite para no duplicar el cambio.
+    """
+
+    def __init__(self, base_url, cookies, user_agent=None, config_index=None, workers: int = 8, tariffs=None):
+        super().__init__(base_url, cookies, user_agent=user_agent, config_index=config_index, workers=workers)
+        self.tariffs = dict(tariffs or {})  # { cfg: tarifa } conocida de antemano (evita capturar el formulario)
+        self.templates = {}                 # { tarifa: plantilla }
+        self._candidates = {}               # { tarifa: (cfg, campos no ligados) } de la primera captura
+        self._templates_lock = threading.Lock()
+
+    # ------------ Plantilla ------------
+
+    @staticmethod
+    def _history(root):
+        """Número de cambios del historial de la página de edición (None si no está la tabla)"""
+        changes = root.find(".//table[@id='mainTable']")
+        return len(_body_rows(changes)) if changes is not None else None
+
+    @staticmethod
+    def _bind(value, params):
+        """Nombre del parámetro de la URL de edición cuyo valor coincide con value (p. ej. el id de la config)"""
+        for key, param_value in params.items():
+            if value and value == param_value:
+                return key
+        return None
+
+    def _capture(self, cfg):
+        """Renderiza el formulario de cfg y devuelve (plantilla, valores actuales de sus campos e historial)"""
+        edit_url = self._resolve(cfg)
+        params = dict(parse_qsl(urlparse(edit_url).query))
+        root, page_url = self._fetch(edit_url)
+        history = self._history(root)
+        root, form_url = self._submit_b4(root, page_url)
+
+        form = root.find(".//form[@id='powermanagementrate']")
+        if form is None:
+            raise HttpWriteError(f"No se encontró el formulario powermanagementrate de {cfg}")
+        option = form.find("./fieldset/select[@name='timeschemaid']/option[@selected]")
+        date = next((i for i in form.findall("./fieldset/input") if "hasDatepicker" in i.get("class", "")), None)
+        table = form.find(".//div[@class='scrollabletable']/table")
+        if option is None or date is None or not date.get("name") or table is None:
+            raise HttpWriteError(f"El formulario de {cfg} no tiene la maquetación esperada")
+
+        rows, row_inputs = [], set()
+        for tr in _body_rows(table):
+            if "display: none" in (tr.get("style") or ""):
+                continue
+            energy, power = _cell(tr, 2), _cell(tr, 5)
+            energy = energy.find("./input") if energy is not None else None
+            power = power.find("./input") if power is not None else None
+            if energy is None or not energy.get("name"):
+                raise HttpWriteError(f"La tabla de precios de {cfg} no tiene la maquetación esperada")
+            # Mismo criterio que el lector y que Selenium: un input bloqueado no se escribe (ni se envía)
+            rows.append({"period": _text(_cell(tr, 1)), "energy": energy.get("name") if _editable(energy) else None,
+                         "power": power.get("name") if _editable(power) and power.get("name") else None})
+            row_inputs.update(id(el) for el in (energy, power) if el is not None)
+
+        # Resto de campos que enviaría el navegador (ocultos, selects, filas ocultas, botón Guardar con nombre...)
+        static, per_request = [], False
+        for el in form.iter():
+            name = el.get("name")
+            if not name or el.get("disabled") is not None or id(el) in row_inputs or el is date:
+                continue
+            bind = None
+            if el.tag == "input":
+                kind = el.get("type", "text").lower()
+                if kind in ("button", "image", "reset") or (kind == "submit" and el.get("value") != "Guardar"):
+                    continue
+                if kind in ("checkbox", "radio") and el.get("checked") is None:
+                    continue
+                value = el.get("value", "")
+                if kind == "hidden":
+                    # Sólo los ocultos pueden llevar el id del destino; un select cuyo valor coincida es casualidad
+                    bind = self._bind(value, params)
+            elif el.tag == "select":
+                selected = el.find(".//option[@selected]")
+                if selected is None:
+                    selected = el.find(".//option")
+                value = selected.get("value", _text(selected)) if selected is not None else ""
+            elif el.tag == "textarea":
+                value = el.text or ""
+            else:
+                continue
+            per_request = per_request or bool(_PER_REQUEST_FIELD.search(name))
+            static.append((name, value, bind))
+
+        method = form.get("method", "get").lower()
+        action = urlparse(urljoin(form_url, form.get("action") or form_url))
+        # En un envío GET el navegador sustituye la query de la acción por los campos del formulario
+        action_query = [(k, v, self._bind(v, params)) for k, v in parse_qsl(action.query)] if method == "post" else []
+
+        # Sólo se reutiliza si la acción o algún campo se ligan a la URL de edición (el id del destino);
+        # si no, no podemos garantizar que el POST vaya a la configuración correcta
+        bound = any(p for *_, p in static) or any(p for *_, p in action_query)
+        template = {
+            "tariff": _text(option),
+            "method": method,
+            "action": action._replace(query="").geturl(),
+            "action_query": action_query,
+            "static": static,
+            "date": date.get("name"),
+            "rows": rows,
+            "reusable": bound and not per_request,
+        }
+        current = {
+            "energy": [self._value(form, r["energy"]) if r["energy"] else None for r in rows],
+            "power": [self._value(form, r["power"]) if r["power"] else None for r in rows],
+            "history": history,
+        }
+        return template, current
+
+    @staticmethod
+    def _value(form, name):
+        # Sin interpolar name en el XPath: un nombre con comillas rompería (o cambiaría) la consulta
+        el = next((i for i in form.iter("input") if i.get("name") == name), None)
+        return el.get("value", "") if el is not None else ""
+
+    @staticmethod
+    def _unbound(template):
+        return [(name, value) for name, value, p in template["static"] if not p]
+
+    def _template_for(self, cfg):
+        """(plantilla, valores actuales o None): sólo se renderiza el formulario si no hay plantilla reutilizable"""
+        tariff = self.tariffs.get(cfg)
+        with self._templates_lock:
+            template = self.templates.get(tariff) if tariff else None
+        if template is not None:
+            return template, None
+
+        template, current = self._capture(cfg)
+        if template["reusable"]:
+            tariff, unbound = template["tariff"], self._unbound(template)
+            with self._templates_lock:
+                # Los campos no ligados se copiarían tal cual a otros destinos: sólo se reutiliza la plantilla si
+                # no hay ninguno o si la captura de otra configuración tenía exactamente los mismos
+                first = self._candidates.setdefault(tariff, (cfg, unbound))
+                if not unbound or (first[0] != cfg and first[1] == unbound):
+                    self.templates.setdefault(tariff, template)
+        return template, current
+
+    def forget_template(self, tariff):
+        with self._templates_lock:
+            self.templates.pop(tariff, None)
+            self._candidates.pop(tariff, None)
+
+    # ------------ Guardado ------------
+
+    def write(self, cfg, data_config, last_updated):
+        """Guarda fecha y precios en cfg con un POST; devuelve un informe como el de replicate_to"""
+        start = time.monotonic()
+        energy = list(data_config.get(ENERGY_KEY, []))
+        power = list(data_config.get(POWER_KEY, []))
+        template, current = self._template_for(cfg)
+        if self.tariffs.get(cfg) and template["tariff"] != self.tariffs[cfg]:
+            raise HttpWriteError(f"La tarifa de {cfg} no es {self.tariffs[cfg]}")
+
+        rows = template["rows"]
+        if current is None and len(energy) < len(rows):
+            # Con la plantilla no conocemos los valores de las filas que no se escriben: mejor Selenium
+            raise HttpWriteError(f"Faltan precios para {len(rows) - len(energy)} periodos de {cfg}")
+
+        edit_url = self._resolve(cfg)
+        history = current["history"] if current is not None else self._history(self._fetch(edit_url)[0])
+        if history is None:
+            raise HttpWriteError(f"No se encontró el historial de cambios de {cfg}")
+
+        params = dict(parse_qsl(urlparse(edit_url).query))
+        fields = [(name, params[p] if p else value) for name, value, p in template["static"]]
+        fields.append((template["date"], last_updated))
+
+        report = {"date": last_updated, "cells": [], "skipped": [], "mismatches": [], "mode": "http"}
+        for i, row in enumerate(rows):
+            if row["energy"] is None:
+                if i < len(energy):
+                    report["skipped"].append({"row": i, "field": "energy"})
+            elif i < len(energy):
+                fields.append((row["energy"], energy[i]))
+                report["cells"].append({"row": i, "field": "energy", "value": energy[i]})
+            else:
+                fields.append((row["energy"], current["energy"][i]))
+            if row["power"] is None:
+                if i < len(power):
+                    report["skipped"].append({"row": i, "field": "power"})
+                continue
+            if i < len(energy) and i < len(power):
+                fields.append((row["power"], power[i]))
+                report["cells"].append({"row": i, "field": "power", "value": power[i]})
+            elif current is not None:
+                fields.append((row["power"], current["power"][i]))
+            # Sin valor actual conocido (plantilla reutilizada) el campo no se envía en lugar de vaciarlo
+
+        query = [(k, params[p] if p else v) for k, v, p in template["action_query"]]
+        action = template["action"] + ("?" + urlencode(query) if query else "")
+        try:
+            if template["method"] == "post":
+                root, _ = self._fetch(action, method="post", data=fields)
+            else:
+                root, _ = self._fetch(action, params=fields)
+        except HttpReadError as e:
+            raise HttpWriteError(f"Error al guardar {cfg} por HTTP: {e}", sent=True) from e
+
+        # La plataforma vuelve a la página de edición: debe haber exactamente un cambio más y ser el nuestro
+        # (comparar sólo la fecha daría por bueno un guardado anterior del mismo día)
+        changes = root.find(".//table[@id='mainTable']")
+        rows_after = _body_rows(changes) if changes is not None else []
+        if len(rows_after) != history + 1 or _text(_cell(rows_after[0], 2)) != last_updated.strip():
+            self.forget_template(template["tariff"])
+            raise HttpWriteError(f"La plataforma no confirmó el guardado de {cfg}", sent=True)
+        report["seconds"] = round(time.monotonic() - start, 3)
+        return report
+
+    def imap_write(self, cfgs, data_config, last_updated):
+        """Guarda varias configuraciones en paralelo: (cfg, informe, error) según terminan"""
+        cfgs = list(cfgs)
+        if not cfgs:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(cfgs))) as executor:
+            futures = {executor.submit(self.write, cfg, data_config, last_updated): cfg for cfg in cfgs}
+            for future in as_completed(futures):
+                cfg = futures[future]
+                try:
+                    yield cfg, future.result(), None
+                except Exception as e:
+                    yield cfg, None, e
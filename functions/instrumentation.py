@@ -0,0 +1,208 @@
+import functools
+import itertools
+import json
+import threading
+import time
+from collections import Counter, deque
+
+
+class Span:
+    """Una operación de alto nivel (login, detect_config(cfg)...) con los comandos WebDriver que lanzó"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, operation, target=None, account=None, parent=None):
+        self.id = next(Span._ids)
+        self.operation = operation
+        self.target = target
+        self.account = account
+        self.parent = parent
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.seconds = None
+        self.commands = Counter()          # { comando: veces }
+        self.command_seconds = Counter()   # { comando: segundos }
+        self.error = None
+
+    def as_dict(self):
+        command_seconds = sum(self.command_seconds.values())
+        return {
+            "id": self.id,
+            "parent": self.parent,
+            "operation": self.operation,
+            "target": self.target,
+            "account": self.account,
+            "started_at": round(self.started_at, 3),
+            "seconds": round(self.seconds or 0.0, 4),
+            "commands": sum(self.commands.values()),
+            "navigations": self.commands.get("get", 0),
+            "command_seconds": round(command_seconds, 4),
+            # Tiempo fuera de chromedriver: esperas entre sondeos, sleeps y Python
+            "idle_seconds": round(max(0.0, (self.seconds or 0.0) - command_seconds), 4),
+            "by_command": dict(self.commands.most_common()),
+            "error": self.error,
+        }
+
+
+class Tracer:
+    """Cuenta y cronometra cada comando WebDriver y lo agrupa en spans por operación de Management"""
+
+    def __init__(self, max_spans: int = 1000):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.spans = deque(maxlen=max_spans)  # spans terminados (los más recientes al final)
+        self.commands = Counter()             # totales del proceso por comando
+        self.command_seconds = Counter()
+        self.operations = Counter()           # { (operación, ok|error): veces }
+        self.operation_seconds = Counter()
+
+    # ------------ Comandos ------------
+
+    def instrument(self, driver):
+        """Envuelve driver.execute (también lo usan los WebElement); idempotente"""
+        if getattr(driver, "_sds_instrumented", False):
+            return driver
+        execute = driver.execute
+
+        def _execute(command, params=None):
+            start = time.perf_counter()
+            try:
+                return execute(command, params)
+            finally:
+                self._record_command(command, time.perf_counter() - start)
+
+        driver.execute = _execute
+        driver._sds_instrumented = True
+        return driver
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record_command(self, command, seconds):
+        # Los spans anidados (p. ej. un login dentro de detect_config) cuentan también para sus padres
+        for span in self._stack():
+            span.commands[command] += 1
+            span.command_seconds[command] += seconds
+        with self._lock:
+            self.commands[command] += 1
+            self.command_seconds[command] += seconds
+
+    # ------------ Spans ------------
+
+    def start(self, operation, target=None, account=None):
+        stack = self._stack()
+        span = Span(operation, target, account, parent=stack[-1].id if stack else None)
+        stack.append(span)
+        return span
+
+    def finish(self, span, error=None):
+        span.seconds = time.perf_counter() - span._start
+        if error is not None and span.error is None:
+            span.error = f"{type(error).__name__}: {error}"
+        stack = self._stack()
+        if span in stack:
+            stack.remove(span)
+        status = "error" if span.error else "ok"
+        with self._lock:
+            self.spans.append(span.as_dict())
+            self.operations[(span.operation, status)] += 1
+            self.operation_seconds[span.operation] += span.seconds
+
+    def fail(self, error):
+        """Marca como fallida la operación en curso aunque el error no se propague (p. ej. login)"""
+        stack = self._stack()
+        if stack:
+            stack[-1].error = f"{type(error).__name__}: {error}"
+
+    # ------------ Consulta y exportación ------------
+
+    def recent(self, account=None, since=None, limit=None):
+        with self._lock:
+            spans = [s for s in self.spans
+                     if (account is None or s["account"] == account) and (since is None or s["started_at"] >= since)]
+        return spans[-limit:] if limit else spans
+
+    def summary(self, account=None, since=None):
+        """Agregado por operación: [{operation, count, errors, seconds, mean, commands, command_seconds, ...}]"""
+        grouped = {}
+        for s in self.recent(account, since):
+            g = grouped.setdefault(s["operation"], {
+                "operation": s["operation"], "count": 0, "errors": 0, "seconds": 0.0, "commands": 0,
+                "navigations": 0, "command_seconds": 0.0, "idle_seconds": 0.0,
+            })
+            g["count"] += 1
+            g["errors"] += bool(s["error"])
+            for k in ("seconds", "commands", "navigations", "command_seconds", "idle_seconds"):
+                g[k] += s[k]
+        for g in grouped.values():
+            g["mean"] = round(g["seconds"] / g["count"], 4)
+            for k in ("seconds", "command_seconds", "idle_seconds"):
+                g[k] = round(g[k], 4)
+        return sorted(grouped.values(), key=lambda g: g["seconds"], reverse=True)
+
+    def to_json(self, account=None, since=None):
+        with self._lock:
+            commands = {c: {"count": n, "seconds": round(self.command_seconds[c], 4)}
+                        for c, n in self.commands.most_common()}
+        return json.dumps({
+            "operations": self.summary(account, since),
+            "spans": self.recent(account, since),
+            "commands": commands,
+        }, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Totales del proceso en formato de texto de Prometheus"""
+        def esc(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        with self._lock:
+            lines = [
+                "# HELP sds_operation_total Operaciones de Management terminadas",
+                "# TYPE sds_operation_total counter",
+            ]
+            lines += [f'sds_operation_total{{operation="{esc(op)}",status="{status}"}} {n}'
+                      for (op, status), n in sorted(self.operations.items())]
+            lines += [
+                "# HELP sds_operation_seconds_total Tiempo total por operación de Management",
+                "# TYPE sds_operation_seconds_total counter",
+            ]
+            lines += [f'sds_operation_seconds_total{{operation="{esc(op)}"}} {s:.6f}'
+                      for op, s in sorted(self.operation_seconds.items())]
+            lines += [
+                "# HELP sds_webdriver_commands_total Comandos enviados a chromedriver",
+                "# TYPE sds_webdriver_commands_total counter",
+            ]
+            lines += [f'sds_webdriver_commands_total{{command="{esc(c)}"}} {n}'
+                      for c, n in sorted(self.commands.items())]
+            lines += [
+                "# HELP sds_webdriver_command_seconds_total Tiempo total en comandos de chromedriver",
+                "# TYPE sds_webdriver_command_seconds_total counter",
+            ]
+            lines += [f'sds_webdriver_command_seconds_total{{command="{esc(c)}"}} {s:.6f}'
+                      for c, s in sorted(self.command_seconds.items())]
+        return "\n".join(lines) + "\n"
+
+
+# Instancia compartida por todo el proceso (app, CLI, pools y trabajos en segundo plano):
+tracer = Tracer()
+
+
+def traced(operation):
+    """Decorador para métodos de Management: abre un span con el primer argumento como objetivo"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            span = tracer.start(operation, target=args[0] if args else None, account=getattr(self, "account", None))
+            error = None
+            try:
+                return method(self, *args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                tracer.finish(span, error=error)
+        return wrapper
+    return decorator
@@ -0,0 +1,471 @@
+import json
+import os
+import threading
+import time
+import uuid
+from functions.browser_pool import PoolExhausted
+from functions.pool import ManagementPool
+from functions.http_reader import HttpConfigReader
+from functions.http_writer import HttpConfigWriter
+from functions.replication import iter_replicate, iter_preflight, skipped_result, summarize, _describe
+from functions.snapshot import price_rows
+
+DEFAULT_JOBS_DIR = os.path.join(".cache", "jobs")
+DEFAULT_RETENTION_DAYS = 30  # días que se conservan los journals de trabajos terminados
+LEASE_TIMEOUT = 120  # segundos máximos esperando un navegador libre del que tomar las cookies
+
+
+class Journal:
+    """Registro de eventos de un trabajo en JSON Lines: sólo se añaden líneas; al terminar se compacta"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, event):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def rewrite(self, events):
+        """Sustituye el journal por events de forma atómica (fichero temporal + rename)"""
+        tmp = self.path + ".tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+    def read(self):
+        events = []
+        if not os.path.exists(self.path):
+            return events
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # Última línea a medio escribir si el proceso murió durante el append
+                    break
+        return events
+
+
+class Job:
+    """Estado de un trabajo reconstruido a partir de los eventos de su journal"""
+
+    def __init__(self, job_id, journal):
+        self.id = job_id
+        self.journal = journal
+        self.kind = None          # replicate | scan | snapshot
+        self.user = None
+        self.account = None
+        self.params = {}
+        self.status = "pending"   # pending | running | interrupted | done | failed
+        self.phase = None
+        self.error = None
+        self.created_at = None
+        self.finished_at = None
+        self.runs = 0
+        self.results = {}         # { destino: resultado de réplica }
+        self.diffs = {}           # { destino: informe de diferencias }
+        self.tariffs = {}         # { cfg: {tariff, last_updated, error} }
+        self.prices = {}          # { cfg: tabla de precios } (sólo en las instantáneas)
+        self.output = None        # fichero Parquet de la instantánea
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        job = cls(os.path.splitext(os.path.basename(path))[0], Journal(path))
+        for event in job.journal.read():
+            job.apply(event)
+        if job.status in ("pending", "running"):
+            # El proceso terminó sin cerrar el trabajo
+            job.status = "interrupted"
+        return job
+
+    def apply(self, event):
+        """Única transición de estado, usada tanto al ejecutar como al reproducir el journal"""
+        kind = event["event"]
+        with self._lock:
+            if kind == "created":
+                self.kind, self.user, self.account = event["kind"], event["user"], event["account"]
+                self.params, self.created_at = event["params"], event["ts"]
+            elif kind == "started":
+                self.status, self.error, self.finished_at = "running", None, None
+                self.runs += 1
+            elif kind == "phase":
+                self.phase = event["phase"]
+            elif kind == "diff":
+                self.diffs[event["report"]["destination"]] = event["report"]
+            elif kind == "result":
+                self.results[event["result"]["destination"]] = event["result"]
+            elif kind == "tariff":
+                self.tariffs[event["cfg"]] = {k: event[k] for k in ("tariff", "last_updated", "error")}
+                if event.get("data") is not None:
+                    self.prices[event["cfg"]] = event["data"]
+            elif kind == "output":
+                self.output = event["path"]
+            elif kind == "finished":
+                self.status, self.phase, self.finished_at = "done", None, event["ts"]
+            elif kind == "failed":
+                self.status, self.error, self.finished_at = "failed", event["error"], event["ts"]
+
+    def record(self, event, **fields):
+        event = {"ts": time.time(), "event": event, **fields}
+        self.journal.append(event)
+        self.apply(event)
+
+    def items(self):
+        return self.params.get("destinations" if self.kind == "replicate" else "cfgs", [])
+
+    def done(self):
+        """Elementos que no hay que repetir al reanudar (incluidos los guardados enviados sin confirmar)"""
+        with self._lock:
+            if self.kind == "replicate":
+                return {d for d, r in self.results.items() if r["status"] in ("updated", "skipped") or r.get("sent")}
+            return {c for c, t in self.tariffs.items() if t["error"] is None}
+
+    def compact(self):
+        """Reescribe el journal con sólo los eventos que determinan el estado final (para trabajos terminados):
+        sin cambios de fase y con el último evento de cada destino o configuración"""
+        latest = {}
+        for i, event in enumerate(self.journal.read()):
+            kind = event["event"]
+            if kind == "phase":
+                continue
+            if kind == "diff":
+                key = (kind, event["report"]["destination"])
+            elif kind == "result":
+                key = (kind, event["result"]["destination"])
+            elif kind == "tariff":
+                key = (kind, event["cfg"])
+            elif kind == "started":
+                key = (kind, i)
+            else:
+                key = (kind,)
+            latest.pop(key, None)
+            latest[key] = event
+        self.journal.rewrite(latest.values())
+
+    def snapshot(self):
+        with self._lock:
+            total = len(self.items())
+            completed = len(self.results) if self.kind == "replicate" else len(self.tariffs)
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "account": self.account,
+                "status": self.status,
+                "phase": self.phase,
+                "error": self.error,
+                "runs": self.runs,
+                "items": list(self.items()),
+                "total": total,
+                "completed": completed,
+                "compared": len(self.diffs),
+                "tariffs": dict(self.tariffs),
+                "output": self.output,
+            }
+
+    def summary(self):
+        """Resumen de réplica con el mismo formato que replication.summarize"""
+        with self._lock:
+            destinations = self.params.get("destinations", [])
+            results = [self.results[d] for d in destinations if d in self.results]
+            diffs = [self.diffs[d] for d in destinations if d in self.diffs]
+        return summarize(results, len(destinations), diffs)
+
+
+class JobManager:
+    """Ejecuta réplicas y escaneos de tarifas en hilos de fondo, fuera del script de Streamlit.
+
+    Cada paso se anota en un journal en disco; si el proceso muere, el trabajo se reanuda desde el journal
+    sin repetir los destinos que ya se guardaron.
+    """
+
+    def __init__(self, browser_pool, cache=None, root=None, snapshots=None, retention_days=DEFAULT_RETENTION_DAYS):
+        self.browser_pool = browser_pool
+        self.cache = cache
+        self.snapshots = snapshots  # SnapshotStore donde se guardan las instantáneas de precios
+        self.root = root or os.environ.get("JOBS_DIR") or DEFAULT_JOBS_DIR
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._threads = {}
+        expired = time.time() - retention_days * 86400 if retention_days is not None else None
+        for name in sorted(os.listdir(self.root)):
+            if name.endswith(".jsonl"):
+                path = os.path.join(self.root, name)
+                job = Job.load(path)
+                if expired is not None and job.finished_at is not None and job.finished_at < expired:
+                    # Rotación: los journals de trabajos terminados hace más de retention_days se borran
+                    os.remove(path)
+                    continue
+                if job.kind is not None:
+                    self._jobs[job.id] = job
+
+    # ------------ Alta de trabajos ------------
+
+    def _create(self, kind, user, account, params):
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        job = Job(job_id, Journal(os.path.join(self.root, f"{job_id}.jsonl")))
+        # Nunca se anota la contraseña: al reanudar se usan las credenciales que ya tiene el pool
+        job.record("created", kind=kind, user=user, account=account, params=params)
+        with self._lock:
+            self._jobs[job_id] = job
+        self._start(job)
+        return job_id
+
+    def submit_replication(self, user, account, data_config, last_updated, destinations, skip_matching=True,
+                           workers=4, config_index=None, batch_budget=None, http_write=True, tenant=None):
+        return self._create("replicate", user, account, {
+            "tenant": tenant,
+            "data_config": data_config,
+            "last_updated": last_updated,
+            "destinations": list(destinations),
+            "skip_matching": skip_matching,
+            "workers": workers,
+            "config_index": dict(config_index or {}),
+            "batch_budget": batch_budget,
+            "http_write": http_write,
+        })
+
+    def submit_scan(self, user, account, cfgs, workers=4, config_index=None, batch_budget=None, tenant=None):
+        """Detecta la tarifa de cfgs; si ya hay un escaneo activo para la cuenta se reutiliza"""
+        active = self.active(account, "scan")
+        if active is not None:
+            return active
+        return self._create("scan", user, account, {
+            "tenant": tenant,
+            "cfgs": list(cfgs),
+            "workers": workers,
+            "config_index": dict(config_index or {}),
+            "batch_budget": batch_budget,
+        })
+
+    def submit_snapshot(self, user, account, cfgs, workers=4, config_index=None, batch_budget=None, tenant=None):
+        """Lee la tabla de precios de cfgs y la guarda como instantánea Parquet; reutiliza una activa"""
+        active = self.active(account, "snapshot")
+        if active is not None:
+            return active
+        return self._create("snapshot", user, account, {
+            "tenant": tenant,
+            "cfgs": list(cfgs),
+            "workers": workers,
+            "config_index": dict(config_index or {}),
+            "batch_budget": batch_budget,
+        })
+
+    # ------------ Consulta ------------
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.snapshot() if job is not None else None
+
+    def summary(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.summary() if job is not None else None
+
+    def active(self, account, kind):
+        """Id del último trabajo en curso de ese tipo para la cuenta (o None)"""
+        with self._lock:
+            running = [j for j in self._jobs.values()
+                       if j.account == account and j.kind == kind and j.status in ("pending", "running")]
+        return max(running, key=lambda j: j.created_at).id if running else None
+
+    def jobs(self, account=None):
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if account is None or j.account == account]
+        return [j.snapshot() for j in sorted(jobs, key=lambda j: j.created_at, reverse=True)]
+
+    # ------------ Ejecución ------------
+
+    def resume(self, account):
+        """Reanuda los trabajos interrumpidos de la cuenta (el pool ya debe tener sus credenciales)"""
+        with self._lock:
+            interrupted = [j for j in self._jobs.values() if j.account == account and j.status == "interrupted"]
+        for job in interrupted:
+            self._start(job)
+        return [j.id for j in interrupted]
+
+    def _start(self, job):
+        with self._lock:
+            thread = self._threads.get(job.id)
+            if thread is not None and thread.is_alive():
+                return
+            job.status = "pending"
+            thread = threading.Thread(target=self._run, args=(job,), name=f"job-{job.id}", daemon=True)
+            self._threads[job.id] = thread
+        thread.start()
+
+    def _run(self, job):
+        job.record("started")
+        try:
+            if job.kind == "replicate":
+                self._run_replication(job)
+            elif job.kind == "snapshot":
+                self._run_snapshot(job)
+            else:
+                self._run_scan(job)
+            job.record("finished")
+        except Exception as e:
+            job.record("failed", error=_describe(e))
+            return
+        try:
+            job.compact()
+        except OSError:
+            pass
+
+    def _pool(self, job, pending):
+        p = job.params
+        # Un navegador del pool compartido queda siempre libre para la interfaz
+        workers = min(p["workers"], max(1, self.browser_pool.size - 1), max(1, len(pending)))
+        return ManagementPool(
+            job.user, None, workers=workers,
+            config_index=p["config_index"], batch_budget=p["batch_budget"], browser_pool=self.browser_pool,
+            tenant=p.get("tenant")
+        )
+
+    def _reader(self, job, workers=8, cls=HttpConfigReader):
+        """Sesión HTTP con las cookies de un navegador del pool; None si no sirve (se usan los navegadores).
+
+        Si no queda ningún navegador libre a tiempo se lanza PoolExhausted y el trabajo falla en lugar de esperar.
+        """
+        try:
+            with self.browser_pool.lease(job.user, timeout=LEASE_TIMEOUT, tenant=job.params.get("tenant")) as manage:
+                return cls.from_management(manage, workers=workers)
+        except PoolExhausted:
+            raise
+        except Exception:
+            return None
+
+    def _run_replication(self, job):
+        p = job.params
+        done = job.done()
+        pending = [d for d in p["destinations"] if d not in done]
+        if not pending:
+            return
+
+        updated = []
+        reader = writer = pool = None
+        try:
+            # Las sesiones HTTP se preparan antes de que el pool del trabajo ocupe navegadores: después, el préstamo
+            # de las cookies podría quedarse esperando a los navegadores del propio trabajo
+            if p["skip_matching"]:
+                reader = self._reader(job)
+            if p.get("http_write", True):
+                writer = self._reader(job, cls=HttpConfigWriter)
+            pool = self._pool(job, pending)
+
+            to_write = pending
+            if p["skip_matching"]:
+                # Un destino guardado justo antes de una caída (sin llegar a anotarse) coincidirá aquí
+                job.record("phase", phase="preflight")
+                for report in iter_preflight(pool, p["data_config"], pending, reader=reader,
+                                             last_updated=p["last_updated"]):
+                    job.record("diff", report=report)
+                    if report["status"] == "matches":
+                        job.record("result", result=skipped_result(report))
+                done = job.done()
+                to_write = [d for d in pending if d not in done]
+
+            job.record("phase", phase="replication")
+            if writer is not None:
+                # La tarifa leída en la comprobación previa permite reutilizar la plantilla del formulario
+                writer.tariffs = {d: r["tariff"] for d, r in job.diffs.items() if r.get("tariff")}
+            for result in iter_replicate(pool, p["data_config"], p["last_updated"], to_write, writer=writer):
+                job.record("result", result=result)
+                if result["status"] == "updated":
+                    updated.append(result["destination"])
+        finally:
+            if pool is not None:
+                pool.close()
+            for session in (reader, writer):
+                if session is not None:
+                    session.close()
+
+        # Los destinos escritos dejan de estar al día en la caché persistente:
+        if self.cache is not None and updated:
+            self.cache.invalidate(job.account, updated)
+
+    def _store_tariff(self, job, cfg, last_update, tariff, error=None, data=None):
+        job.record("tariff", cfg=cfg, tariff=tariff, last_updated=last_update, data=data,
+                   error=_describe(error) if error is not None else None)
+        if self.cache is not None and error is None:
+            self.cache.put(job.account, cfg, tariff, last_update)
+
+    def _run_scan(self, job):
+        done = job.done()
+        pending = [c for c in job.params["cfgs"] if c not in done]
+        if not pending:
+            return
+
+        # Primero por HTTP con las cookies de la sesión; lo que falle, con los navegadores del pool:
+        job.record("phase", phase="http")
+        browser_pending = pending
+        reader = self._reader(job)
+        if reader is not None:
+            browser_pending = []
+            try:
+                for cfg, last_update, tariff, error in reader.detect_many(pending):
+                    if error is None:
+                        self._store_tariff(job, cfg, last_update, tariff)
+                    else:
+                        browser_pending.append(cfg)
+            finally:
+                reader.close()
+
+        if browser_pending:
+            job.record("phase", phase="browser")
+            pool = self._pool(job, browser_pending)
+            try:
+                for cfg, last_update, tariff, error in pool.detect_configs(browser_pending):
+                    self._store_tariff(job, cfg, last_update, tariff, error)
+            finally:
+                pool.close()
+
+    def _run_snapshot(self, job):
+        pending = [c for c in job.params["cfgs"] if c not in job.done()]
+
+        def _store(cfg, read, error):
+            last_update, data, tariff = read if error is None else (None, None, None)
+            self._store_tariff(job, cfg, last_update, tariff, error, data=data)
+
+        # Misma estrategia que el escaneo: HTTP primero y lo que falle con los navegadores del pool
+        job.record("phase", phase="http")
+        browser_pending = pending
+        reader = self._reader(job) if pending else None
+        if reader is not None:
+            browser_pending = []
+            try:
+                for cfg, read, error in reader.imap(pending, origin=True):
+                    if error is None:
+                        _store(cfg, read, None)
+                    else:
+                        browser_pending.append(cfg)
+            finally:
+                reader.close()
+
+        if browser_pending:
+            job.record("phase", phase="browser")
+            pool = self._pool(job, browser_pending)
+            try:
+                for cfg, read, error in pool.imap(lambda manage, c: manage.detect_config(c, origin=True),
+                                                  browser_pending):
+                    _store(cfg, read, error)
+            finally:
+                pool.close()
+
+        if self.snapshots is not None:
+            job.record("phase", phase="write")
+            with job._lock:
+                tables = [(cfg, job.tariffs[cfg], data) for cfg, data in job.prices.items()]
+            rows = [row for cfg, t, data in tables for row in price_rows(cfg, t["last_updated"], data, t["tariff"])]
+            job.record("output", path=self.snapshots.write(job.account, rows))
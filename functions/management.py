@@ -1,49 +1,95 @@
+import os
 from urllib.parse import urljoin, urlparse
 from selenium.common.exceptions import WebDriverException
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, ElementNotInteractableException
-import time
+from selenium.common.exceptions import NoSuchElementException, ElementNotInteractableException, JavascriptException
+from selenium.common.exceptions import ElementClickInterceptedException, StaleElementReferenceException
+import re
 from driver.chrome_driver import Driver
+from functions.extraction import config_rows, price_table_ready, to_data_config
+from functions.form_fill import fill_rate_form, mismatches
+from functions.instrumentation import tracer, traced
+from functions.diff import diff_names
+from functions.throttle import limiter
+from functions.waits import Waits, OperationTimeout, table_ready, datatables_filtered, form_visible, element_present
+
+
+class ConfigNotFoundError(NoSuchElementException):
+    """La configuración no existe en la tabla de powermanagement"""
+
+
+class SaveSentError(WebDriverException):
+    """Falló algo después de pulsar Guardar: el cambio puede haberse guardado y no se debe repetir"""
+    sent = True
+
+
+# Usuario cliente que se impersona si no se indica otro (SDS_TENANT para cambiarlo)
+DEFAULT_TENANT = os.environ.get("SDS_TENANT", "Irene López")
+
+
+def account_key(user, tenant=None):
+    """Clave de cachés, pools y trabajos: el usuario de plataforma y, si no es el habitual, el cliente"""
+    tenant = tenant or DEFAULT_TENANT
+    return user if tenant == DEFAULT_TENANT else f"{user}/{tenant}"
 
 
 class Management:
 
-    def __init__(self, user, pswd):
-        self.base_url = 'https://app.smartdatasystem.es'
-        self.driver_instance = Driver()
+    def __init__(self, user, pswd, budgets=None, fast_fill=True, base_url=None, lean=None, tenant=None):
+        # SDS_BASE_URL permite apuntar a otra instancia (p. ej. la plataforma simulada de benchmarks/)
+        self.base_url = (base_url or os.environ.get("SDS_BASE_URL") or 'https://app.smartdatasystem.es').rstrip("/")
+        self.driver_instance = Driver(lean=lean)  # Chrome no se lanza hasta que se usa self.driver
         self.user = user
         self.pswd = pswd
-        self.driver = self.driver_instance.iniciar_chrome()
-        self.wait = WebDriverWait(self.driver, 100)
+        self.waits = Waits(budgets)  # presupuestos de espera por operación (ver functions/waits.py)
         self.auth_url = f'{self.base_url}/?target=auth'
         self.cfgs_url = f'{self.base_url}/?target=powermanagement'
         self.logged_in = False
-
+        self.tenant = tenant or DEFAULT_TENANT  # usuario cliente que se impersona
+        self.impersonated = False  # True tras iniciar sesión como el usuario gestionado
+        self.config_index = {}  # { "cfg_name": "URL de edición" (o None si sólo se abre con click) }
+        self.fast_fill = fast_fill  # escribir el formulario con un único execute_script
+        self.last_fill_report = None  # celdas escritas en el último replicate_to
+        # Chrome crece con cada página: se relanza (con login e impersonación) al superar cualquiera de los dos
+        self.max_page_loads = int(os.environ.get("BROWSER_MAX_PAGE_LOADS", 300))
+        self.max_rss_mb = float(os.environ.get("BROWSER_MAX_RSS_MB", 1500))
+
+    @property
+    def driver(self):
+        """WebDriver de la sesión; se lanza Chrome la primera vez que se accede"""
+        # Cada comando queda contado y cronometrado en el span de la operación en curso:
+        return tracer.instrument(self.driver_instance.driver)
+
+    @property
+    def account(self):
+        """Clave del usuario de plataforma (y cliente) para las cachés persistentes"""
+        return account_key(self.user, self.tenant)
+
+    @traced("login")
     def login(self):
         try:
-            self.driver.get(self.auth_url)
+            self._navigate(self.auth_url)
             username_space = self.driver.find_element(By.XPATH, '//p/input[@id="username"]')
             username_space.send_keys(self.user)
             pswd_space = self.driver.find_element(By.XPATH, '//p/input[@id="password"]')
             pswd_space.send_keys(self.pswd)
             entry_button = self.driver.find_element(By.XPATH, '//p/input[@type="submit"]')
-            entry_button.click()
+            self._click_navigate(entry_button)
             # Esperamos a un elemento que corrobore que hemos hecho el login:
-            self.wait.until(EC.presence_of_element_located(
-                (By.XPATH, '//div[@class="gridster ready"]')
-            ))
+            self._until("login", element_present((By.XPATH, '//div[@class="gridster ready"]')), "el dashboard")
             self.logged_in = True
+            self.impersonated = False
             return True
         except Exception as e:
             self.logged_in = False
+            tracer.fail(e)
             print(f"Error al intentar hacer el login: {e}")
             return False
 
     def _init_driver(self):
-        if self.driver is None:
-            self.driver = self.driver_instance.iniciar_chrome()
+        """Lanza Chrome si todavía no está en marcha"""
+        return self.driver_instance.driver
 
     def _is_window_alive(self) -> bool:
         try:
@@ -55,20 +101,39 @@ class Management:
 
     def close(self, hard=False):
         try:
-            if self.driver:
-                (self.driver.quit() if hard else self.driver.quit())
+            self.driver_instance.quit()
         finally:
-            self.driver = None
             self.logged_in = False
+            self.impersonated = False
+
+    def memory_mb(self):
+        return self.driver_instance.memory_mb()
+
+    def needs_recycle(self) -> bool:
+        if not self.driver_instance.is_running:
+            return False
+        if self.max_page_loads and self.driver_instance.page_loads >= self.max_page_loads:
+            return True
+        rss = self.driver_instance.memory_mb() if self.max_rss_mb else None
+        return rss is not None and rss >= self.max_rss_mb
 
     def ensure_session(self):
+        # Si el navegador se reinicia, recuperamos también la impersonación que tenía
+        was_impersonated = self.impersonated
+        if self.needs_recycle():
+            # Entre operaciones, nunca a mitad de una: Chrome nuevo y sesión recuperada abajo
+            self.close(hard=True)
+            Driver.note_recycled()
         self._init_driver()
         if not self._is_window_alive():
+            # Si era un Chrome remoto, su nodo deja de recibir sesiones hasta que vuelva a responder
+            self.driver_instance.mark_node_failed("la sesión dejó de responder")
             self.close(hard=True)
             self._init_driver()
             self.logged_in = False
         if not self.logged_in:
-            self.login()
+            if self.login() and was_impersonated:
+                self.impersonate()
 
     def _is_editable(self, el):
         """True si el input está habilitado y no es readonly."""
@@ -82,35 +147,89 @@ class Management:
             return False
         return True
 
-    def _wait_visible(self, by, sel, timeout=20):
-        return WebDriverWait(self.driver, timeout).until(
-            EC.visibility_of_element_located((by, sel))
+    def _navigate(self, url):
+        """driver.get a través del limitador compartido; acabar en el login cuenta como error de la plataforma"""
+        excluded = self.driver_instance.is_lean_excluded(url)
+        with limiter.slot("page") as handle:
+            self.driver_instance.page_loads += 1
+            if excluded:
+                # Página que no funciona con el perfil ligero: la cargamos completa
+                self.driver_instance.set_blocking(False)
+            try:
+                self.driver.get(url)
+                if excluded:
+                    self._until("page", lambda d: d.execute_script("return document.readyState") == "complete",
+                                "la carga completa de la página")
+            finally:
+                if excluded:
+                    self.driver_instance.set_blocking(True)
+            if url != self.auth_url and "target=auth" in (self.driver.current_url or ""):
+                handle["error"] = "redirección al login"
+
+    def _click_navigate(self, element):
+        """Click que carga otra página (B4, Guardar, enlaces...), también bajo el limitador"""
+        with limiter.slot("click"):
+            self.driver_instance.page_loads += 1
+            element.click()
+
+    def _until(self, operation, condition, waited_for="la condición", timeout=None):
+        return self.waits.until(self.driver, operation, condition, waited_for, timeout=timeout)
+
+    def set_deadline(self, deadline):
+        """Limita todas las esperas al presupuesto total de un lote (None para quitarlo)"""
+        self.waits.deadline = deadline
+
+    def _wait_visible(self, by, sel, timeout=None, operation="form"):
+        return self._until(operation, form_visible((by, sel)), f"que {sel} sea visible", timeout=timeout)
+
+    def _wait_config_table(self):
+        """Filas de mainTable una vez renderizada la tabla (sustituye al antiguo sleep de 2 s)"""
+        return self._until(
+            "page", table_ready('//table[@id="mainTable"]/tbody/tr[position() >= 1]'), "la tabla de configuraciones"
         )
 
-    def _open_link_safely(self, link_el):
-        """Abre un <a> tanto si tiene href absoluto/relativo como si es hjavascript: (click)"""
-        href_raw = (link_el.get_attribute("href") or "").strip()
-        onclick = (link_el.get_attribute("onclick") or "").strip()
+    @staticmethod
+    def _link_href(link_el):
+        """Devuelve el destino de un <a>, extrayéndolo de window.open('...') si es un enlace JS"""
+        return Management._href_target(link_el.get_attribute("href"), link_el.get_attribute("onclick"))
+
+    @staticmethod
+    def _href_target(href_raw, onclick):
+        href_raw = (href_raw or "").strip()
+        onclick = (onclick or "").strip()
 
         # Si es un enlace JS (o vacío) intenta extraer URL de window.open('...')
         if (not href_raw or href_raw.lower().startswith("javascript")) and onclick:
-            import re
             m = re.search(r"window\.open\(['\"]([^'\"]+)", onclick)
             if m:
                 href_raw = m.group(1).strip()
+        return href_raw
+
+    @staticmethod
+    def _should_click(href: str) -> bool:
+        if not href:
+            return True
+        scheme = urlparse(href).scheme.lower()
+        return scheme not in ("http", "https", "file") # blob; data; chrome; javascript, etc.
 
-        def _should_click(href: str) -> bool:
-            if not href:
-                return True
-            scheme = urlparse(href).scheme.lower()
-            return scheme not in ("http", "https", "file") # blob; data; chrome; javascript, etc.
+    def _resolve_edit_url(self, href, onclick):
+        """URL absoluta a la que lleva el enlace, o None si sólo se puede abrir haciendo click"""
+        href_raw = self._href_target(href, onclick)
+        if self._should_click(href_raw):
+            return None
+        return urljoin(self.base_url, href_raw)
+
+    def _open_link_safely(self, link_el):
+        """Abre un <a> tanto si tiene href absoluto/relativo como si es hjavascript: (click)"""
+        href_raw = self._link_href(link_el)
 
-        if _should_click(href_raw):
+        if self._should_click(href_raw):
             before = list(self.driver.window_handles)
             current = self.driver.current_url
-            link_el.click()
+            self._click_navigate(link_el)
             # espera cambio de URL o nueva pestaña
-            self.wait.until(lambda d: d.current_url != current or len(d.window_handles) > len(before))
+            self._until("page", lambda d: d.current_url != current or len(d.window_handles) > len(before),
+                        "el cambio de página")
             if len(self.driver.window_handles) > len(before):
                 self.driver.switch_to.window(self.driver.window_handles[-1])
             return
@@ -118,206 +237,271 @@ class Management:
         edit_url = urljoin(self.base_url, href_raw)
 
         try:
-            self.driver.get(edit_url)
+            self._navigate(edit_url)
         except WebDriverException as e:
             # Fallback si el driver no soporta el protocolo (o algo raro)
             if "unsupported protocol" in str(e).lower():
                 before = list(self.driver.window_handles)
                 current = self.driver.current_url
-                link_el.click()
-                self.wait.until(lambda d: d.current_url != current or len(d.window_handles) > len(before))
+                self._click_navigate(link_el)
+                self._until("page", lambda d: d.current_url != current or len(d.window_handles) > len(before),
+                            "el cambio de página")
                 if len(self.driver.window_handles) > len(before):
                     self.driver.switch_to.window(self.driver.window_handles[-1])
             else:
                 raise
 
-    # Función para conocer los elementos clave de cada configuración:
-    def detect_config(self, cfg, origin=False):
-        self.ensure_session()
-        self.driver.get(self.cfgs_url)
-        time.sleep(2)
-        configurations_table = self.wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, '//table[@id="mainTable"]/tbody/tr[position() >= 1]')))
-
-        for config in configurations_table:
-            config_name = config.find_element(By.XPATH, './/td[1]').text.strip()
-            if config_name == cfg:
-                actions_cell = config.find_element(By.XPATH, './/td[6]')
-                edit_href = actions_cell.find_element(
-                    By.XPATH,
-                    ".//div/a[contains(@title,'Modificar configuración')]"
-                )
-                self._open_link_safely(edit_href)
-
-                last_update = self.wait.until(EC.presence_of_element_located(
-                    (By.XPATH, '//table[@id="mainTable"]/tbody/tr[1]/td[2]'))).text.strip()
-
-                add_new_change_button = self.driver.find_element(By.XPATH, '//p/input[@name="B4"]')
-                add_new_change_button.click()
-
-                # Una vez accedemos a la sección que permite añadir un nuevo cambio buscamos la tarifa:
-                tariff = self.wait.until(EC.presence_of_element_located(
-                    (By.XPATH, '//form[@id="powermanagementrate"]/fieldset/select[@name="timeschemaid"]/option[contains(@selected, "selected")]')
-                )).text.strip()
-
-                # Luego, en el caso de que origin = True --> guardamos la info a replicar para mostrarla en la app:
-
-                if origin:
-                    # Añadimos las columnas en la lista de claves que compondrán las columnas de nuestro dataframe en la app:
-                    cols_xpath = "(//div[@class='scrollabletable']/table/thead/tr/th[1] | " \
-                            "//div[@class='scrollabletable']/table/thead/tr/th[position()=2 or position()=5]" \
-                            "/p[@class='smalltext'])"
-
-                    target_cols = self.wait.until(EC.presence_of_all_elements_located((By.XPATH, cols_xpath)))
-
-                    keys = []
-                    for col in target_cols:
-                        txt_col = col.text.strip()
-                        keys.append(txt_col)
+    def _index_config_table(self, target=None):
+        """Recorre mainTable una sola vez y reconstruye el índice nombre -> URL de edición.
+
+        Devuelve la lista de nombres (sin duplicados) y, si se indica target, el enlace de edición de esa fila.
+        """
+        self._wait_config_table()
+
+        # Nombres y enlaces de todas las filas en una única llamada al navegador:
+        self.config_index = {}
+        config_names, target_row = [], None
+
+        for row in config_rows(self.driver):
+            config_name = row["name"]
+            if config_name in self.config_index:
+                continue
+            edit_url = self._resolve_edit_url(row["href"], row["onclick"]) if row["has_link"] else None
+            self.config_index[config_name] = edit_url
+            config_names.append(config_name)
+            if config_name == target:
+                target_row = row
+
+        if target_row is None or not target_row["has_link"]:
+            return config_names, None
+
+        # Sólo de la fila buscada necesitamos el elemento (por si hay que abrirlo con click):
+        target_link = self.driver.find_elements(
+            By.XPATH, '//table[@id="mainTable"]/tbody/tr'
+        )[target_row["index"]].find_element(
+            By.XPATH, ".//td[6]//div/a[contains(@title,'Modificar configuración')]"
+        )
+        return config_names, target_link
 
-                    # Añadimos los valores de las filas:
-                    rows_xpath = "//div[@class='scrollabletable']/table/tbody/tr[position()>=1]"
-                    rows = self.wait.until(EC.presence_of_all_elements_located((By.XPATH, rows_xpath)))
+    def _is_edit_page(self) -> bool:
+        try:
+            self._until("edit_page", element_present((By.XPATH, '//p/input[@name="B4"]')), "el botón B4")
+            return True
+        except OperationTimeout:
+            if self.waits.deadline and self.waits.deadline.expired():
+                raise
+            return False
 
-                    data = {k: [] for k in keys}
+    def _open_config(self, cfg):
+        """Abre la página de edición de cfg; sólo recorre mainTable si el índice no la resuelve"""
+        edit_url = self.config_index.get(cfg)
+        if edit_url:
+            self._navigate(edit_url)
+            if self._is_edit_page():
+                return
+
+        # Fallo en la búsqueda: invalidamos el índice y lo reconstruimos desde la tabla
+        self._navigate(self.cfgs_url)
+        _, edit_href = self._index_config_table(target=cfg)
+        if edit_href is None:
+            raise ConfigNotFoundError(f"No se encontró la configuración {cfg}")
+        self._open_link_safely(edit_href)
 
-                    for row in rows:
+    # Función para conocer los elementos clave de cada configuración:
+    @traced("detect_config")
+    def detect_config(self, cfg, origin=False):
+        self.ensure_session()
+        self._open_config(cfg)
 
-                        period = row.find_element(By.XPATH, ".//td[1]").text.strip()
+        last_update = self._until("page", element_present(
+            (By.XPATH, '//table[@id="mainTable"]/tbody/tr[1]/td[2]')), "el histórico de cambios").text.strip()
 
-                        energy_price = row.find_element(By.XPATH, ".//td[2]/input").get_attribute("value") or ""
+        add_new_change_button = self._until("page", element_present((By.XPATH, '//p/input[@name="B4"]')), "el botón B4")
+        self._click_navigate(add_new_change_button)
 
-                        power_price = row.find_element(By.XPATH, ".//td[5]/input").get_attribute("value") or ""
+        # Una vez accedemos a la sección que permite añadir un nuevo cambio buscamos la tarifa:
+        tariff = self._until("form", element_present(
+            (By.XPATH, '//form[@id="powermanagementrate"]/fieldset/select[@name="timeschemaid"]/option[contains(@selected, "selected")]')
+        ), "la tarifa del formulario").text.strip()
 
-                        data[keys[0]].append(period)
-                        data[keys[1]].append(energy_price)
-                        data[keys[2]].append(power_price)
+        # Luego, en el caso de que origin = True --> guardamos la info a replicar para mostrarla en la app:
 
-                    return last_update, data, tariff
+        if origin:
+            # Cabeceras y filas (periodo, precio energía, precio potencia) en una única llamada al navegador:
+            table = self._until("form", price_table_ready, "la tabla de precios")
+            data = to_data_config(table)
 
-                else:
-                    return last_update, tariff
+            return last_update, data, tariff
 
-        raise NoSuchElementException(f"No se encontró la configuración {cfg}")
+        else:
+            return last_update, tariff
 
+    @traced("replicate_to")
     def replicate_to(self, destination_cfg: str, data_config: dict, last_updated: str):
+        self.fill_replica(destination_cfg, data_config, last_updated)
+        self.save_replica()
+        return last_updated
 
+    @traced("fill_replica")
+    def fill_replica(self, destination_cfg: str, data_config: dict, last_updated: str):
+        """Abre un nuevo cambio en destination_cfg y escribe fecha y precios sin guardar (se puede repetir)"""
         self.ensure_session()
-        self.driver.get(self.cfgs_url)
-        time.sleep(2)
-        configurations_table = self.wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, '//table[@id="mainTable"]/tbody/tr[position() >= 1]')))
-        for config in configurations_table:
-            config_name = config.find_element(By.XPATH, './/td[1]').text.strip()
-            if config_name == destination_cfg:
-                actions_cell = config.find_element(By.XPATH, './/td[6]')
-                edit_href = actions_cell.find_element(
-                    By.XPATH,
-                    ".//div/a[contains(@title,'Modificar configuración')]"
-                )
-                self._open_link_safely(edit_href)
-                add_new_change_button = self.driver.find_element(By.XPATH, '//p/input[@name="B4"]')
-                add_new_change_button.click()
-
-                # modificamos el campo de la fecha del último cambio a la last_updated de origin:
-
-                # Esperamos a que el formulario estñe en el DOM y visible:
-                form_locator = (By.ID, "powermanagementrate")
-                self._wait_visible(*form_locator)
-
-                # Si el form está dentro de un iframe, entrar:
-                input_locator = (By.XPATH, '//form[@id="powermanagementrate"]/fieldset/input[contains(@class, "hasDatepicker")]')
-                # Localizamos el input:
-                last_updated_box = self._wait_visible(*input_locator, timeout=30)
-
-                # Al tratarse de un datepicker, muchos son readonly; mejor escribimos con JS:
-                try:
-                    self.driver.execute_script("""
-                    arguments[0].removeAttribute('readonly');
-                    arguments[0].value = arguments[1];
-                    arguments[0].dispatchEvent(new Event('change', {bubbles:true}));
-                    """, last_updated_box, last_updated)
-                except Exception:
-                    last_updated_box.clear()
-                    last_updated_box.send_keys(last_updated)
+        self._open_config(destination_cfg)
+
+        add_new_change_button = self._until("page", element_present((By.XPATH, '//p/input[@name="B4"]')), "el botón B4")
+        self._click_navigate(add_new_change_button)
+
+        # modificamos el campo de la fecha del último cambio a la last_updated de origin:
+
+        # Esperamos a que el formulario estñe en el DOM y visible:
+        form_locator = (By.ID, "powermanagementrate")
+        self._wait_visible(*form_locator)
+
+        energy_list = data_config.get('(precio/unidad energía)', [])
+        power_list = data_config.get('(precio/unidad potencia/día)', [])
+
+        report = None
+        if self.fast_fill:
+            try:
+                report = self._fill_rate_form_fast(last_updated, energy_list, power_list)
+            except JavascriptException:
+                report = None  # Si el script falla, escribimos campo a campo
+        if report is None:
+            report = self._fill_rate_form_slow(last_updated, energy_list, power_list)
+        self.last_fill_report = report
+        return report
+
+    @traced("save_replica")
+    def save_replica(self):
+        """Pulsa Guardar en el formulario ya relleno; no se repite nunca (duplicaría el cambio).
+
+        Los fallos antes del click (botón no encontrado, no clicable...) se propagan tal cual; los de después del
+        click se lanzan como SaveSentError.
+        """
+        save_button = self._until("save", element_present(
+            (By.XPATH, "//p[4][@class='right']/input[@value='Guardar']")
+        ), "el botón Guardar")
 
-                # Modificamos los campos de precio de energía y potencia en función de data_config:
-                valid_rows_xpath = "//div[@class='scrollabletable']/table/tbody/tr[not(contains(@style, 'display: none'))]"
-                rows = self.wait.until(EC.presence_of_all_elements_located((By.XPATH, valid_rows_xpath)))
+        try:
+            self._click_navigate(save_button)
+        except (ElementNotInteractableException, ElementClickInterceptedException, StaleElementReferenceException):
+            # Chrome rechazó el click: el formulario no llegó a enviarse
+            raise
+        except Exception as e:
+            raise SaveSentError(f"Error tras pulsar Guardar: {e}") from e
+
+    def _fill_rate_form_fast(self, last_updated, energy_list, power_list):
+        """Escribe fecha y precios con un único execute_script y comprueba lo escrito"""
+        self._wait_visible(By.XPATH, '//form[@id="powermanagementrate"]/fieldset/input[contains(@class, "hasDatepicker")]')
+        self._until("form", price_table_ready, "la tabla de precios")
+
+        report = fill_rate_form(self.driver, last_updated, energy_list, power_list)
+        if report["date"] is None:
+            return None  # Maquetación inesperada: mejor el modo clásico
+        report["mismatches"] = mismatches(report, last_updated, energy_list, power_list)
+        report["mode"] = "fast"
+        return report
+
+    def _fill_rate_form_slow(self, last_updated, energy_list, power_list):
+        """Escribe fecha y precios campo a campo con send_keys"""
+        # Si el form está dentro de un iframe, entrar:
+        input_locator = (By.XPATH, '//form[@id="powermanagementrate"]/fieldset/input[contains(@class, "hasDatepicker")]')
+        # Localizamos el input:
+        last_updated_box = self._wait_visible(*input_locator)
+
+        # Al tratarse de un datepicker, muchos son readonly; mejor escribimos con JS:
+        try:
+            self.driver.execute_script("""
+            arguments[0].removeAttribute('readonly');
+            arguments[0].value = arguments[1];
+            arguments[0].dispatchEvent(new Event('change', {bubbles:true}));
+            """, last_updated_box, last_updated)
+        except Exception:
+            last_updated_box.clear()
+            last_updated_box.send_keys(last_updated)
 
-                energy_list = data_config.get('(precio/unidad energía)', [])
-                power_list = data_config.get('(precio/unidad potencia/día)', [])
+        # Modificamos los campos de precio de energía y potencia en función de data_config:
+        valid_rows_xpath = "//div[@class='scrollabletable']/table/tbody/tr[not(contains(@style, 'display: none'))]"
+        rows = self._until("form", EC.presence_of_all_elements_located((By.XPATH, valid_rows_xpath)), "la tabla de precios")
 
-                n = min(len(rows), len(energy_list))
+        n = min(len(rows), len(energy_list))
+        report = {"date": last_updated, "cells": [], "skipped": [], "mismatches": [], "mode": "slow"}
 
-                for i, row in enumerate(rows[:n]):
-                    try:
-                        energy_box = row.find_element(By.XPATH, ".//td[2]/input")
-                        energy_box.clear()
-                        energy_box.send_keys(energy_list[i])
+        for i, row in enumerate(rows[:n]):
+            try:
+                energy_box = row.find_element(By.XPATH, ".//td[2]/input")
+                energy_box.clear()
+                energy_box.send_keys(energy_list[i])
+                report["cells"].append({"row": i, "field": "energy", "value": energy_list[i]})
 
-                        # El campo de potencia en las tarifas 2.0 en la última row está siempre disabled:
-                        try:
-                            power_box = row.find_element(By.XPATH, ".//td[5]/input")
-                        except NoSuchElementException:
-                            power_box = None
+                # El campo de potencia en las tarifas 2.0 en la última row está siempre disabled:
+                try:
+                    power_box = row.find_element(By.XPATH, ".//td[5]/input")
+                except NoSuchElementException:
+                    power_box = None
 
-                        if power_box and self._is_editable(power_box) and i < len(power_list):
-                            power_box.clear()
-                            power_box.send_keys(power_list[i])
+                if power_box and self._is_editable(power_box) and i < len(power_list):
+                    power_box.clear()
+                    power_box.send_keys(power_list[i])
+                    report["cells"].append({"row": i, "field": "power", "value": power_list[i]})
+                elif i < len(power_list):
+                    report["skipped"].append({"row": i, "field": "power"})
 
-                    except (NoSuchElementException, ElementNotInteractableException):
-                        pass
+            except (NoSuchElementException, ElementNotInteractableException):
+                pass
 
-                # Guardamos la configuración:
-                save_button = self.wait.until(EC.presence_of_element_located(
-                    (By.XPATH, "//p[4][@class='right']/input[@value='Guardar']")
-                ))
+        return report
 
-                save_button.click()
+    @traced("impersonate")
+    def impersonate(self):
+        """Inicia sesión como self.tenant y deja el driver en la app de powermanagement.
 
-                return last_updated
+        Si no lo consigue lanza la excepción (LookupError si el usuario no existe) en lugar de seguir: sin
+        impersonar veríamos las configuraciones de otro cliente.
+        """
 
+        users_attribute = self._until("impersonation", element_present(
+            (By.XPATH, '//ul[@class="submenu"]/li/a[contains(@href, "?target=users")]')), "el menú de usuarios")
+        users = users_attribute.get_attribute('href')
+        self._navigate(users)
+
+        search_field = self._until("impersonation", element_present((By.XPATH, '//input[@type="search"]')),
+                                   "el buscador de usuarios")
+        search_field.clear()
+        search_field.send_keys(self.tenant)
+        # Esperamos a que DataTables termine de filtrar (en lugar de un sleep fijo):
+        user_td_text, = self._until("impersonation", datatables_filtered('//tr[@class="odd"]/td', self.tenant),
+                                    "el filtrado de usuarios")
+        if user_td_text.strip() != self.tenant:
+            raise LookupError(f"No se encontró el usuario {self.tenant}")
+        user_attribute = self._until("impersonation", element_present(
+            (By.XPATH, '//a[@title="Iniciar sesión como este usuario"]')), "el enlace de impersonación")
+        self._click_navigate(user_attribute)
+
+        # Acceder a la app de powermanagement:
+        self._navigate(self.cfgs_url)
+        self._wait_config_table()
+        self.impersonated = True
+        return self.impersonated
+
+    @traced("get_config_list")
     def get_config_list(self):
 
         """Devuelve la lista de configuraciones sin cerrar la sesión ni el driver"""
 
         self.ensure_session()
+        if self.impersonated:
+            self._navigate(self.cfgs_url)
+        else:
+            self.impersonate()
 
-        users_attribute = self.wait.until(
-            EC.presence_of_element_located((By.XPATH, '//ul[@class="submenu"]/li/a[contains(@href, "?target=users")]')))
-        users = users_attribute.get_attribute('href')
-        self.driver.get(users)
-
-        try:
-            search_field = self.wait.until(EC.presence_of_element_located((By.XPATH, '//input[@type="search"]')))
-            search_field.clear()
-            search_field.send_keys("Irene")
-            time.sleep(2)
-            user_td_text = self.wait.until(EC.presence_of_element_located((By.XPATH, '//tr[@class="odd"]/td'))).text
-            if user_td_text.strip() == "Irene López":
-                user_attribute = self.wait.until(EC.presence_of_element_located((By.XPATH, '//a[@title="Iniciar sesión como este usuario"]')))
-                user_attribute.click()
-
-            # Acceder a la app de powermanagement:
-            self.driver.get(self.cfgs_url)
-            time.sleep(2)
-
-        except Exception as e:
-            print('Error al intentar acceder al usuario de Irene López. ' + str(e))
-
-        configurations_table = self.wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, '//table[@id="mainTable"]/tbody/tr[position() >= 1]')))
-
-        config_names, seen = [], set()
-
-        for name in configurations_table:
-            config_name = name.find_element(By.XPATH, './/td[1]').text.strip()
-            if config_name not in seen:
-                config_names.append(config_name)
-                seen.add(config_name)
+        config_names, _ = self._index_config_table()
 
         return config_names
 
-
-
+    @traced("refresh_config_list")
+    def refresh_config_list(self, known):
+        """Relee los nombres de mainTable y los compara con known: (configs, añadidas, eliminadas)"""
+        config_names = self.get_config_list()
+        added, removed = diff_names(known, config_names)
+        return config_names, added, removed
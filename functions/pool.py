@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from selenium.common.exceptions import WebDriverException
+from functions.management import Management
+from functions.waits import Deadline, OperationTimeout
+from functions.browser_pool import PoolExhausted
+
+
+class ManagementPool:
+    """Pool acotado de navegadores autenticados que se reparten una lista de tareas pendientes"""
+
+    def __init__(self, user, pswd, workers: int = 4, config_index=None, batch_budget=None, browser_pool=None,
+                 tenant=None, budgets=None):
+        self.user = user
+        self.pswd = pswd
+        self.tenant = tenant  # cliente impersonado (None = el habitual)
+        self.workers = max(1, int(workers))
+        self.config_index = dict(config_index or {})  # índice nombre -> URL de edición compartido por los navegadores
+        self.batch_budget = batch_budget  # segundos máximos por lote (None = sin límite)
+        self.budgets = budgets  # presupuestos de espera por operación de los navegadores propios
+        self.browser_pool = browser_pool  # BrowserPool compartido del que tomar prestados los navegadores
+        if browser_pool is not None:
+            self.workers = min(self.workers, browser_pool.size)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._instances = []
+
+    def _new_worker(self):
+        if self.browser_pool is not None:
+            manage = self.browser_pool.checkout(self.user, self.pswd, timeout=5, tenant=self.tenant)
+        else:
+            manage = Management(self.user, self.pswd, tenant=self.tenant, budgets=self.budgets)
+            if not manage.login():
+                manage.close(hard=True)
+                raise RuntimeError("Login fallido en el navegador del pool")
+            try:
+                manage.impersonate()
+            except Exception:
+                manage.close(hard=True)
+                raise
+        if not manage.config_index:
+            manage.config_index = dict(self.config_index)
+        return manage
+
+    def _acquire(self, deadline=None, exhausted_wait: float = 30.0):
+        """Devuelve un navegador libre, creando uno nuevo mientras no se supere el tamaño del pool.
+
+        Si el pool compartido está agotado se esperan los navegadores propios; sin ninguno propio se lanza
+        PoolExhausted tras exhausted_wait segundos, y con el presupuesto del lote agotado OperationTimeout.
+        """
+        give_up = None
+        while True:
+            if deadline is not None and deadline.expired():
+                raise OperationTimeout("lote", "un navegador libre", deadline.seconds)
+
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_create = len(self._instances) < self.workers
+                if can_create:
+                    # Reservamos el hueco antes de lanzar Chrome (que es lento) para no pasarnos del límite
+                    self._instances.append(None)
+
+            if not can_create:
+                # Pool completo: esperamos a que otro hilo devuelva su navegador (o a que quede un hueco libre)
+                try:
+                    return self._idle.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+            try:
+                manage = self._new_worker()
+            except PoolExhausted:
+                # El pool compartido está lleno: seguimos con los navegadores que ya tenemos (o reintentamos)
+                with self._lock:
+                    self._instances.remove(None)
+                    own = len(self._instances)
+                if own == 0:
+                    give_up = give_up or time.monotonic() + exhausted_wait
+                    if time.monotonic() >= give_up:
+                        raise
+                try:
+                    return self._idle.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+            except Exception:
+                with self._lock:
+                    self._instances.remove(None)
+                raise
+
+            with self._lock:
+                self._instances[self._instances.index(None)] = manage
+            return manage
+
+    def _release(self, manage):
+        self._idle.put(manage)
+
+    def imap(self, func, items):
+        """Ejecuta func(manage, item) en paralelo y devuelve (item, resultado, error) según van terminando"""
+        items = list(items)
+        if not items:
+            return
+        deadline = Deadline(self.batch_budget)
+
+        def _run(item, failover=True):
+            if deadline.expired():
+                raise OperationTimeout("lote", "el resto de elementos pendientes", deadline.seconds)
+            manage = self._acquire(deadline)
+            manage.set_deadline(deadline)
+            try:
+                return func(manage, item)
+            except WebDriverException as e:
+                if not failover or manage._is_window_alive():
+                    raise
+                # El navegador (o el nodo remoto que lo alojaba) murió a mitad de tarea: se repite una vez;
+                # ensure_session lo relanza en otro nodo sano y recupera el login y la impersonación
+                manage.driver_instance.mark_node_failed(e)
+            finally:
+                manage.set_deadline(None)
+                self._release(manage)
+            return _run(item, failover=False)
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as executor:
+            futures = {executor.submit(_run, item): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+
+    def detect_configs(self, cfgs):
+        """Detecta en paralelo la tarifa de cada configuración: (cfg, last_update, tariff, error)"""
+        for cfg, result, error in self.imap(lambda manage, c: manage.detect_config(c), cfgs):
+            if error is not None:
+                yield cfg, None, None, error
+            else:
+                last_update, tariff = result
+                yield cfg, last_update, tariff, None
+
+    def close(self):
+        with self._lock:
+            instances, self._instances = [m for m in self._instances if m is not None], []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for manage in instances:
+            try:
+                if self.browser_pool is not None:
+                    self.browser_pool.checkin(manage)
+                else:
+                    manage.close(hard=True)
+            except Exception:
+                pass
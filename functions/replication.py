@@ -0,0 +1,190 @@
+import time
+from selenium.common.exceptions import WebDriverException
+from tenacity import Retrying, stop_after_attempt, wait_exponential, retry_if_exception
+from functions.management import ConfigNotFoundError
+from functions.waits import OperationTimeout
+from functions.diff import diff_config
+from functions.instrumentation import tracer
+
+
+def _is_transient(error, deadline=None) -> bool:
+    """Errores de Selenium que merece la pena reintentar (timeouts, elementos obsoletos, sesión caída...).
+
+    Con el presupuesto del lote agotado no se reintenta nada: el siguiente intento ya no tendría tiempo.
+    """
+    if deadline is not None and deadline.expired():
+        return False
+    if isinstance(error, OperationTimeout) and error.timeout <= 0:
+        return False
+    return isinstance(error, WebDriverException) and not isinstance(error, ConfigNotFoundError)
+
+
+def _new_result(destination, status="failed", error=None):
+    return {
+        "destination": destination,
+        "status": status,  # updated | failed | skipped
+        "last_updated": None,
+        "error": error,
+        "attempts": 0,
+        "duration": 0.0,
+        "written": 0,
+        "mismatches": 0,
+        "backend": None,  # http | selenium
+        "sent": False,    # el guardado llegó a enviarse aunque no se confirmase: no se debe repetir
+    }
+
+
+def _describe(error) -> str:
+    return f"{type(error).__name__}: {error}".strip()
+
+
+def replicate_one(manage, destination, data_config, last_updated, attempts: int = 3):
+    """Replica en un destino reintentando los fallos transitorios con backoff exponencial.
+
+    Sólo se reintenta el relleno del formulario; el click en Guardar se hace una vez, porque un error después
+    de pulsarlo (timeout en la confirmación...) no significa que el cambio no se guardase.
+    """
+    start = time.monotonic()
+    result = _new_result(destination)
+    deadline = manage.waits.deadline
+    # Un span por destino que agrupa los intentos de relleno y el guardado
+    span = tracer.start("replicate_to", target=destination, account=getattr(manage, "account", None))
+    error = None
+    try:
+        for attempt in Retrying(
+            stop=stop_after_attempt(attempts) | (lambda state: deadline is not None and deadline.expired()),
+            wait=wait_exponential(multiplier=1, min=1, max=10),
+            retry=retry_if_exception(lambda e: _is_transient(e, deadline)),
+            reraise=True,
+        ):
+            with attempt:
+                result["attempts"] = attempt.retry_state.attempt_number
+                report = manage.fill_replica(destination, data_config, last_updated) or {}
+        try:
+            manage.save_replica()
+        except Exception as e:
+            # Sólo un fallo posterior al click (SaveSentError) puede haber guardado el cambio
+            result["sent"] = getattr(e, "sent", False)
+            raise
+        result["status"] = "updated"
+        result["backend"] = "selenium"
+        result["last_updated"] = last_updated
+        result["written"] = len(report.get("cells", []))
+        result["mismatches"] = len(report.get("mismatches", []))
+    except Exception as e:
+        error = e
+        result["error"] = _describe(e)
+    finally:
+        tracer.finish(span, error=error)
+    result["duration"] = round(time.monotonic() - start, 3)
+    return result
+
+
+def _http_result(destination, report=None, error=None):
+    """Resultado de un guardado por HTTP (HttpConfigWriter); un solo intento, sin reintentos"""
+    result = _new_result(destination, error=_describe(error) if error is not None else None)
+    result["backend"] = "http"
+    result["attempts"] = 1
+    result["sent"] = getattr(error, "sent", False)
+    if error is None:
+        result["status"] = "updated"
+        result["last_updated"] = report["date"]
+        result["written"] = len(report.get("cells", []))
+        result["duration"] = report.get("seconds", 0.0)
+    return result
+
+
+def iter_replicate(pool, data_config, last_updated, destinations, attempts: int = 3, writer=None):
+    """Reparte los destinos entre los navegadores del pool y devuelve cada resultado según termina.
+
+    Con un HttpConfigWriter cada destino se guarda con un POST directo; sólo los que no llegaron a enviarse
+    (formulario distinto, sesión caída...) se escriben con Selenium. Un POST enviado que falla no se repite.
+    """
+    pending = list(destinations)
+    if writer is not None:
+        browser_pending = []
+        for destination, report, error in writer.imap_write(pending, data_config, last_updated):
+            if error is None or getattr(error, "sent", False):
+                yield _http_result(destination, report, error)
+            else:
+                browser_pending.append(destination)
+        pending = browser_pending
+
+    def _task(manage, destination):
+        return replicate_one(manage, destination, data_config, last_updated, attempts=attempts)
+
+    for destination, result, error in pool.imap(_task, pending):
+        if error is not None:
+            # Fallo al preparar el navegador (login, impersonación...): no llegó a intentarse
+            result = _new_result(destination, error=_describe(error))
+        yield result
+
+
+def replicate_batch(pool, data_config, last_updated, destinations, attempts: int = 3, writer=None):
+    """Versión bloqueante de iter_replicate: devuelve todos los resultados, en el orden de destinations"""
+    results = {r["destination"]: r for r in iter_replicate(pool, data_config, last_updated, destinations,
+                                                           attempts, writer=writer)}
+    return [results[d] for d in destinations]
+
+
+def _diff_report(destination, data_config, read=None, error=None, last_updated=None):
+    """Compara lo leído de un destino ((last_update, data, tariff) de detect_config) con el origen.
+
+    Con last_updated (fecha del origen), un destino con los mismos precios pero otra fecha también difiere:
+    la réplica escribe esa fecha y, si se omitiera, el destino seguiría apareciendo como pendiente.
+    """
+    report = {"destination": destination, "status": "error", "last_updated": None, "tariff": None,
+              "differences": [], "error": None}
+    if error is not None:
+        report["error"] = _describe(error)
+        return report
+    last_update, data, tariff = read
+    report["last_updated"] = last_update
+    report["tariff"] = tariff
+    report["differences"] = diff_config(data_config, data)
+    if last_updated is not None and str(last_update or "").strip() != str(last_updated).strip():
+        report["differences"].append({"period": None, "field": "fecha", "origin": last_updated,
+                                      "destination": last_update})
+    report["status"] = "differs" if report["differences"] else "matches"
+    return report
+
+
+def iter_preflight(pool, data_config, destinations, reader=None, last_updated=None):
+    """Lee la tabla de precios actual de cada destino y la compara con el origen, según termina cada uno.
+
+    Si se pasa un HttpConfigReader se lee por HTTP y sólo lo que falle se lee con los navegadores del pool.
+    """
+    pending = list(destinations)
+    if reader is not None:
+        browser_pending = []
+        for destination, read, error in reader.imap(pending, origin=True):
+            if error is None:
+                yield _diff_report(destination, data_config, read, last_updated=last_updated)
+            else:
+                browser_pending.append(destination)
+        pending = browser_pending
+
+    def _read(manage, destination):
+        return manage.detect_config(destination, origin=True)
+
+    for destination, read, error in pool.imap(_read, pending):
+        yield _diff_report(destination, data_config, read, error, last_updated=last_updated)
+
+
+def skipped_result(report):
+    """Resultado de réplica para un destino que ya coincidía con el origen"""
+    result = _new_result(report["destination"], status="skipped")
+    result["last_updated"] = report["last_updated"]
+    return result
+
+
+def summarize(results, total=None, diffs=None):
+    """Resumen para la app: {updated: [], failed: [], skipped: [], total: int, results: [], diffs: []}"""
+    return {
+        "updated": [r["destination"] for r in results if r["status"] == "updated"],
+        "failed": [r["destination"] for r in results if r["status"] == "failed"],
+        "skipped": [r["destination"] for r in results if r["status"] == "skipped"],
+        "total": len(results) if total is None else total,
+        "results": list(results),
+        "diffs": list(diffs or []),
+    }
@@ -0,0 +1,148 @@
+import os
+import re
+import time
+from decimal import Decimal
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from functions.diff import normalize_price
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(".cache", "snapshots")
+
+# Una fila por configuración y periodo; los precios son numéricos (nulos si la celda está vacía o no es un número)
+SCHEMA = pa.schema([
+    ("config", pa.string()),
+    ("tariff", pa.string()),
+    ("last_updated", pa.string()),
+    ("last_updated_date", pa.date32()),
+    ("period_index", pa.int16()),
+    ("period", pa.string()),
+    ("energy", pa.float64()),
+    ("power", pa.float64()),
+    ("energy_raw", pa.string()),
+    ("power_raw", pa.string()),
+    ("taken_at", pa.timestamp("s", tz="UTC")),
+])
+
+FIELDS = ("energy", "power")
+
+
+def _column(data, position):
+    keys = list(data)
+    return list(data[keys[position]]) if len(keys) > position else []
+
+
+def _price(value):
+    price = normalize_price(value)
+    return float(price) if isinstance(price, Decimal) else None
+
+
+def price_rows(cfg, last_updated, data, tariff):
+    """Filas del dataset para una tabla de precios (data de detect_config(cfg, origin=True))"""
+    periods, energy, power = _column(data, 0), _column(data, 1), _column(data, 2)
+    rows = []
+    for i in range(max(len(periods), len(energy), len(power))):
+        e = energy[i] if i < len(energy) else None
+        p = power[i] if i < len(power) else None
+        rows.append({
+            "config": cfg,
+            "tariff": tariff,
+            "last_updated": last_updated,
+            "period_index": i,
+            "period": periods[i] if i < len(periods) else f"P{i + 1}",
+            "energy": _price(e),
+            "power": _price(p),
+            "energy_raw": e,
+            "power_raw": p,
+        })
+    return rows
+
+
+def to_frame(rows, taken_at=None):
+    """DataFrame con los tipos de SCHEMA a partir de las filas de price_rows"""
+    df = pd.DataFrame(rows, columns=[f.name for f in SCHEMA if f.name not in ("last_updated_date", "taken_at")])
+    dates = pd.to_datetime(df["last_updated"], errors="coerce", format="mixed", dayfirst=True)
+    df["last_updated_date"] = dates.dt.date
+    df["taken_at"] = pd.Timestamp(taken_at or time.time(), unit="s", tz="UTC").floor("s")
+    return df[[f.name for f in SCHEMA]]
+
+
+class SnapshotStore:
+    """Instantáneas en Parquet de las tablas de precios de todas las configuraciones de un usuario de plataforma.
+
+    Cada instantánea es un fichero {root}/{cuenta}/{fecha}.parquet; las consultas de deriva se hacen sobre él
+    con pandas en lugar de visitar cada configuración con el navegador.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("SNAPSHOT_DIR") or DEFAULT_SNAPSHOT_DIR
+
+    def _folder(self, account):
+        return os.path.join(self.root, re.sub(r"[^\w.@-]+", "_", account or "default"))
+
+    def write(self, account, rows, taken_at=None):
+        """Guarda las filas como una nueva instantánea y devuelve su ruta"""
+        taken_at = taken_at or time.time()
+        table = pa.Table.from_pandas(to_frame(rows, taken_at), schema=SCHEMA, preserve_index=False)
+
+        folder = self._folder(account)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, time.strftime("%Y%m%d-%H%M%S", time.gmtime(taken_at)) + ".parquet")
+        # Escritura atómica: un lector nunca ve un fichero a medias
+        pq.write_table(table, path + ".tmp", compression="zstd")
+        os.replace(path + ".tmp", path)
+        return path
+
+    def paths(self, account):
+        """Rutas de las instantáneas del usuario, de la más antigua a la más reciente"""
+        folder = self._folder(account)
+        if not os.path.isdir(folder):
+            return []
+        return [os.path.join(folder, n) for n in sorted(os.listdir(folder)) if n.endswith(".parquet")]
+
+    def load(self, account=None, path=None, columns=None):
+        """DataFrame de una instantánea (la más reciente del usuario si no se indica path), o None"""
+        if path is None:
+            paths = self.paths(account)
+            if not paths:
+                return None
+            path = paths[-1]
+        return pq.read_table(path, columns=columns).to_pandas()
+
+
+def drift(df, origin, tariff=None, period=None, field=None, tolerance=0.0):
+    """Configuraciones cuyo precio difiere del de origin (una config de df o un DataFrame de to_frame).
+
+    Filtra opcionalmente por tarifa, periodo ("P2") y campo ("energy" | "power"). Devuelve una fila por
+    configuración, periodo y campo distinto: [config, tariff, period, field, origin, destination, delta].
+    """
+    if isinstance(origin, str):
+        origin_df = df[df["config"] == origin]
+        df = df[df["config"] != origin]
+    else:
+        origin_df = origin
+    if tariff is not None:
+        df = df[df["tariff"] == tariff]
+    if period is not None:
+        df = df[df["period"] == period]
+        origin_df = origin_df[origin_df["period"] == period]
+
+    fields = [field] if field else list(FIELDS)
+    merged = df[["config", "tariff", "period_index", "period", *fields]].merge(
+        origin_df[["period_index", *fields]], on="period_index", suffixes=("", "_origin")
+    )
+
+    frames = []
+    for f in fields:
+        delta = merged[f] - merged[f"{f}_origin"]
+        # Un precio presente en un lado y vacío en el otro también es una diferencia
+        differs = (delta.abs() > tolerance) | (merged[f].isna() != merged[f"{f}_origin"].isna())
+        part = merged.loc[differs, ["config", "tariff", "period"]].copy()
+        part["field"] = f
+        part["origin"] = merged.loc[differs, f"{f}_origin"]
+        part["destination"] = merged.loc[differs, f]
+        part["delta"] = delta[differs]
+        frames.append(part)
+
+    result = pd.concat(frames, ignore_index=True)
+    return result.sort_values(["config", "field", "period"], ignore_index=True)
@@ -0,0 +1,95 @@
+from sortedcontainers import SortedList, SortedSet
+
+
+class TariffIndex:
+    """Índice tarifa -> configuraciones ordenadas, mantenido de forma incremental.
+
+    Evita recorrer todas las configuraciones en cada rerun de Streamlit: las altas, bajas y tarifas detectadas
+    sólo tocan las entradas afectadas, y las etiquetas del selector de destinos se calculan una vez por fecha
+    de referencia (la última actualización del origen).
+    """
+
+    def __init__(self, configs=(), tariffs=None, last_updated=None):
+        self.configs = SortedSet()
+        self.tariffs = {}        # { cfg: tarifa } (None si no se pudo detectar)
+        self.last_updated = {}   # { cfg: fecha del último cambio }
+        self._by_tariff = {}     # { tarifa: SortedList de cfgs }
+        self._labels = {}        # { cfg: (referencia, etiqueta) }
+        self.set_configs(configs)
+        for cfg, tariff in (tariffs or {}).items():
+            if cfg in self.configs:
+                self.set(cfg, tariff, (last_updated or {}).get(cfg))
+
+    # ------------ Altas y bajas ------------
+
+    def set_configs(self, configs):
+        """Sustituye la lista de configuraciones: (añadidas, eliminadas)"""
+        configs = set(configs)
+        added = sorted(configs - set(self.configs))
+        removed = [c for c in self.configs if c not in configs]
+        self.remove(removed)
+        self.configs.update(added)
+        return added, removed
+
+    def remove(self, cfgs):
+        for cfg in cfgs:
+            self.configs.discard(cfg)
+            self._unindex(cfg)
+            self.tariffs.pop(cfg, None)
+            self.last_updated.pop(cfg, None)
+
+    def _unindex(self, cfg):
+        old = self.tariffs.get(cfg)
+        if old is not None and cfg in self._by_tariff.get(old, ()):
+            self._by_tariff[old].remove(cfg)
+        self._labels.pop(cfg, None)
+
+    # ------------ Tarifas y fechas ------------
+
+    def set(self, cfg, tariff, last_updated=None):
+        """Anota la tarifa (None = detección fallida) y, si se indica, la fecha del último cambio"""
+        if cfg not in self.configs:
+            return
+        self._unindex(cfg)
+        self.tariffs[cfg] = tariff
+        if tariff is not None:
+            self._by_tariff.setdefault(tariff, SortedList()).add(cfg)
+        if last_updated is not None:
+            self.last_updated[cfg] = last_updated
+
+    def set_last_updated(self, cfg, last_updated):
+        if cfg in self.configs:
+            self.last_updated[cfg] = last_updated
+            self._labels.pop(cfg, None)
+
+    # ------------ Consulta ------------
+
+    def pending(self):
+        """Configuraciones cuya tarifa aún no se ha intentado detectar"""
+        return [c for c in self.configs if c not in self.tariffs]
+
+    def compatible(self, tariff, exclude=None):
+        """Configuraciones de la tarifa, ordenadas por nombre"""
+        return [c for c in self._by_tariff.get(tariff, ()) if c != exclude]
+
+    def incompatible(self, tariff, exclude=None):
+        """Configuraciones con otra tarifa conocida"""
+        return sorted(c for t, cfgs in self._by_tariff.items() if t != tariff for c in cfgs if c != exclude)
+
+    def label(self, cfg, reference=None):
+        """Etiqueta del selector con un icono según coincida la fecha con reference (la del origen)"""
+        reference = (reference or "").strip()
+        cached = self._labels.get(cfg)
+        if cached is not None and cached[0] == reference:
+            return cached[1]
+
+        lu = self.last_updated.get(cfg)
+        if lu is None:
+            icon, tag = "❓", "sin info"
+        elif reference and lu.strip() == reference:
+            icon, tag = "✅", "actualizada"
+        else:
+            icon, tag = "⚠️", "pendiente"
+        text = f"{icon} {cfg} - {lu or '--'} ({tag})"
+        self._labels[cfg] = (reference, text)
+        return text
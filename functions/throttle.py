@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class AdaptiveLimiter:
+    """Limita las peticiones a la plataforma: token bucket (peticiones/s) más un máximo de peticiones en vuelo.
+
+    El máximo en vuelo se ajusta solo (AIMD): sube de uno en uno mientras la plataforma responde rápido y
+    estamos usando todo el margen, y se reduce a la mitad ante errores o a 3/4 si la latencia se dispara.
+    Cada ajuste queda anotado en decisions.
+    """
+
+    def __init__(self, rate=4.0, burst=None, max_in_flight=8, min_in_flight=1, initial=None,
+                 target_latency=2.0, window=10, cooldown=2.0, max_backoff=30.0):
+        self.rate = float(rate)                                # peticiones por segundo
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.min_in_flight = max(1, min(int(min_in_flight), self.max_in_flight))
+        self.limit = min(self.max_in_flight, max(self.min_in_flight, int(initial or self.max_in_flight // 2 or 1)))
+        self.target_latency = float(target_latency)            # segundos por carga de página "sana"
+        self.window = max(1, int(window))                      # muestras entre ajustes por latencia
+        self.cooldown = cooldown                               # segundos mínimos entre dos reducciones
+        self.max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._saturated = False         # se llegó al límite desde el último ajuste
+        self._samples = deque(maxlen=self.window * 3)
+        self._since_adjust = 0
+        self._decreased_at = 0.0
+        self._errors_in_row = 0
+        self._paused_until = 0.0
+        self.decisions = deque(maxlen=200)
+        self.totals = {"requests": 0, "errors": 0, "waited_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            rate=float(os.environ.get("PLATFORM_RATE", 4)),
+            max_in_flight=int(os.environ.get("PLATFORM_MAX_IN_FLIGHT", 8)),
+            target_latency=float(os.environ.get("PLATFORM_TARGET_LATENCY", 2.0)),
+        )
+
+    # ------------ Reserva y liberación ------------
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self):
+        """Espera a tener token y hueco; devuelve los segundos esperados"""
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._in_flight >= self.limit:
+                    self._saturated = True
+                    wait = 1.0  # nos despierta el release
+                elif self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    if self._in_flight >= self.limit:
+                        self._saturated = True
+                    waited = time.monotonic() - start
+                    self.totals["requests"] += 1
+                    self.totals["waited_seconds"] += waited
+                    return waited
+                self._cond.wait(wait)
+
+    def release(self, latency, error=None):
+        with self._cond:
+            self._in_flight -= 1
+            self._samples.append(latency)
+            if error is not None:
+                self.totals["errors"] += 1
+                self._errors_in_row += 1
+                self._on_error(error)
+            else:
+                self._errors_in_row = 0
+                self._since_adjust += 1
+                if self._since_adjust >= self.window:
+                    self._on_window()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, kind="page"):
+        """Reserva una petición; el bloque puede marcarla como fallida con handle["error"] = ..."""
+        self.acquire()
+        handle = {"kind": kind, "error": None}
+        start = time.monotonic()
+        try:
+            yield handle
+        except Exception as e:
+            handle["error"] = handle["error"] or f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.release(time.monotonic() - start, handle["error"])
+
+    # ------------ Ajustes (llamar con el lock tomado) ------------
+
+    def _p90(self):
+        ordered = sorted(self._samples)
+        return ordered[int(0.9 * (len(ordered) - 1))] if ordered else 0.0
+
+    def _record(self, action, reason, before):
+        self.decisions.append({
+            "ts": round(time.time(), 3),
+            "action": action,          # increase | decrease | backoff
+            "reason": reason,
+            "limit_before": before,
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "p90_latency": round(self._p90(), 3),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+        })
+
+    def _on_error(self, error):
+        now = time.monotonic()
+        # Pausa global exponencial con los errores seguidos (1, 2, 4... s) para dejar respirar a la plataforma
+        pause = min(self.max_backoff, 2 ** (self._errors_in_row - 1))
+        self._paused_until = max(self._paused_until, now + pause)
+        before = self.limit
+        if now - self._decreased_at >= self.cooldown:
+            self.limit = max(self.min_in_flight, self.limit // 2)
+            self._decreased_at = now
+            self._record("decrease", f"error: {error}", before)
+        else:
+            self._record("backoff", f"error: {error}", before)
+        self._since_adjust = 0
+        self._saturated = False
+
+    def _on_window(self):
+        now = time.monotonic()
+        p90 = self._p90()
+        before = self.limit
+        if p90 > self.target_latency * 1.5 and now - self._decreased_at >= self.cooldown:
+            self.limit = max(self.min_in_flight, int(self.limit * 0.75))
+            self._decreased_at = now
+            if self.limit != before:
+                self._record("decrease", f"latencia p90 {p90:.2f}s > {self.target_latency * 1.5:.2f}s", before)
+        elif p90 <= self.target_latency and self._saturated and self.limit < self.max_in_flight:
+            self.limit += 1
+            self._record("increase", f"latencia p90 {p90:.2f}s y límite saturado", before)
+        self._since_adjust = 0
+        self._saturated = False
+
+    # ------------ Consulta ------------
+
+    def stats(self):
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "rate": self.rate,
+                "p90_latency": round(self._p90(), 3),
+                "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+                "requests": self.totals["requests"],
+                "errors": self.totals["errors"],
+                "waited_seconds": round(self.totals["waited_seconds"], 2),
+            }
+
+    def recent_decisions(self, limit=20):
+        with self._cond:
+            return list(self.decisions)[-limit:]
+
+
+# Un único limitador por proceso: todos los navegadores y lectores HTTP comparten el mismo margen
+limiter = AdaptiveLimiter.from_env()
@@ -0,0 +1,146 @@
+import os
+import time
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.by import By
+
+
+# Presupuesto máximo (segundos) de cada tipo de espera:
+DEFAULT_BUDGETS = {
+    "login": 30,          # formulario de acceso -> dashboard
+    "impersonation": 20,  # tabla de usuarios y cambio de usuario
+    "page": 20,           # navegación y carga de tablas
+    "edit_page": 10,      # comprobación rápida de que una URL del índice abre la edición
+    "form": 20,           # formulario de un nuevo cambio (powermanagementrate)
+    "save": 20,           # guardado del formulario
+}
+
+
+def parse_budgets(text):
+    """Presupuestos "login=40,save=30" (variable WAIT_BUDGETS u opción --budgets) -> {operación: segundos}"""
+    budgets = {}
+    for part in (text or "").split(","):
+        if not part.strip():
+            continue
+        operation, sep, seconds = part.partition("=")
+        operation = operation.strip()
+        if not sep or operation not in DEFAULT_BUDGETS:
+            raise ValueError(f"Presupuesto de espera no válido: {part.strip()!r} "
+                             f"(operaciones: {', '.join(DEFAULT_BUDGETS)})")
+        budgets[operation] = float(seconds)
+    return budgets
+
+
+class OperationTimeout(TimeoutException):
+    """Una espera superó su presupuesto de tiempo"""
+
+    def __init__(self, operation, waited_for, timeout):
+        self.operation = operation
+        self.waited_for = waited_for
+        self.timeout = timeout
+        super().__init__(f"Tiempo agotado en '{operation}' tras {timeout:.1f}s esperando {waited_for}")
+
+
+class Deadline:
+    """Presupuesto total de tiempo compartido por varias operaciones (p. ej. un lote de configuraciones)"""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+class Waits:
+    """Esperas por condición con presupuesto por operación, en lugar de sleeps fijos y una espera global"""
+
+    def __init__(self, budgets=None, deadline=None, poll: float = 0.1):
+        # Por defecto, ajustados con WAIT_BUDGETS; los budgets explícitos (p. ej. --budgets de cli.py) mandan
+        self.budgets = {**DEFAULT_BUDGETS, **parse_budgets(os.environ.get("WAIT_BUDGETS")), **(budgets or {})}
+        self.deadline = deadline
+        self.poll = poll
+
+    def timeout_for(self, operation):
+        timeout = self.budgets.get(operation, self.budgets["page"])
+        remaining = self.deadline.remaining() if self.deadline else None
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        return timeout
+
+    def until(self, driver, operation, condition, waited_for="la condición", timeout=None):
+        """Espera a condition(driver) y lanza OperationTimeout en cuanto se agota el presupuesto"""
+        timeout = self.timeout_for(operation) if timeout is None else min(timeout, self.timeout_for(operation))
+        if timeout <= 0:
+            raise OperationTimeout(operation, waited_for, 0.0)
+        try:
+            return WebDriverWait(
+                driver, timeout, poll_frequency=self.poll,
+                ignored_exceptions=(NoSuchElementException, StaleElementReferenceException)
+            ).until(condition)
+        except OperationTimeout:
+            raise
+        except TimeoutException:
+            raise OperationTimeout(operation, waited_for, timeout) from None
+
+
+# ------------ Condiciones de disponibilidad ------------
+
+_DATATABLES_IDLE_JS = """
+if (document.readyState !== 'complete') { return false; }
+if (window.jQuery && window.jQuery.active > 0) { return false; }
+var processing = document.querySelectorAll('.dataTables_processing');
+for (var i = 0; i < processing.length; i++) {
+    if (processing[i].offsetParent !== null) { return false; }
+}
+return true;
+"""
+
+
+def datatables_idle(driver):
+    """True cuando la página ha cargado y DataTables no está redibujando ni esperando peticiones AJAX"""
+    try:
+        return bool(driver.execute_script(_DATATABLES_IDLE_JS))
+    except Exception:
+        return False
+
+
+def table_ready(rows_xpath):
+    """Filas de la tabla una vez renderizada y con DataTables en reposo"""
+    presence = EC.presence_of_all_elements_located((By.XPATH, rows_xpath))
+
+    def _condition(driver):
+        if not datatables_idle(driver):
+            return False
+        return presence(driver)
+
+    return _condition
+
+
+def datatables_filtered(first_cell_xpath, term):
+    """[texto de la primera fila] tras filtrar un DataTable por term ([""] si el filtro no da resultados)"""
+    def _condition(driver):
+        if not datatables_idle(driver):
+            return False
+        if driver.find_elements(By.XPATH, '//td[contains(@class, "dataTables_empty")]'):
+            return [""]
+        cells = driver.find_elements(By.XPATH, first_cell_xpath)
+        if cells and term.lower() in cells[0].text.lower():
+            return [cells[0].text]
+        return False
+
+    return _condition
+
+
+def form_visible(locator):
+    return EC.visibility_of_element_located(locator)
+
+
+def element_present(locator):
+    return EC.presence_of_element_located(locator)
@@ -0,0 +1,19 @@
+import pytest
+import requests
+from benchmarks.fake_platform import FakePlatform
+
+
+@pytest.fixture
+def platform():
+    with FakePlatform(configs=4, mix={"3.0TD": 1.0}) as p:
+        yield p
+
+
+@pytest.fixture
+def cookies(platform):
+    """Cookies de una sesión autenticada e impersonada en la plataforma simulada (sin navegador)"""
+    with requests.Session() as session:
+        session.post(f"{platform.url}/?target=auth",
+                     data={"username": platform.user, "password": platform.password})
+        session.get(f"{platform.url}/?target=impersonate")
+        return [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path} for c in session.cookies]
@@ -0,0 +1,56 @@
+from decimal import Decimal
+import pytest
+from functions.diff import PriceTable, diff_config, diff_names, normalize_price
+
+ENERGY = "(precio/unidad energía)"
+POWER = "(precio/unidad potencia/día)"
+
+
+def _table(periods, energy, power, writable=None):
+    return PriceTable({"Periodo": periods, ENERGY: energy, POWER: power}, writable)
+
+
+def test_diff_without_flags_compares_every_cell():
+    origin = _table(["P1", "P2"], ["0,1", "0.2"], ["0.01", "0.02"])
+    dest = _table(["P1", "P2"], ["0.10", "0.3"], ["0.01", "0.05"])
+    assert diff_config(origin, dest) == [
+        {"period": "P2", "field": "energía", "origin": "0.2", "destination": "0.3"},
+        {"period": "P2", "field": "potencia", "origin": "0.02", "destination": "0.05"},
+    ]
+
+
+def test_disabled_and_hidden_cells_are_not_compared():
+    # 2.0TD: la potencia de P3 está deshabilitada y P4 está oculta; la réplica no escribe ninguna de las dos
+    writable = {"visible": [True, True, True, False], "energy": [True, True, True, True],
+                "power": [True, True, False, True]}
+    origin = _table(["P1", "P2", "P3", "P4"], ["0.1", "0.2", "0.3", ""], ["0.01", "0.02", "0.03", ""])
+    dest = _table(["P1", "P2", "P3", "P4"], ["0.1", "0.2", "0.3", "9"], ["0.01", "0.02", "0.07", "9"], writable)
+    assert diff_config(origin, dest) == []
+
+    dest[ENERGY][2] = "0.35"
+    assert diff_config(origin, dest) == [{"period": "P3", "field": "energía", "origin": "0.3", "destination": "0.35"}]
+
+
+def test_visible_rows_take_origin_values_in_order():
+    # Como fill_rate_form: la i-ésima fila visible del destino recibe el i-ésimo valor del origen
+    writable = {"visible": [False, True, True], "energy": [True, True, True], "power": [False, False, False]}
+    origin = _table(["P1", "P2"], ["0.1", "0.2"], ["", ""])
+    dest = _table(["X", "P1", "P2"], ["5", "0.1", "0.25"], ["", "", ""], writable)
+    assert diff_config(origin, dest) == [{"period": "P2", "field": "energía", "origin": "0.2", "destination": "0.25"}]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("0,123400", Decimal("0.1234")),
+    (" 0.12340 ", Decimal("0.1234")),
+    ("1.234,5", Decimal("1234.5")),
+    ("1,234.5", Decimal("1234.5")),
+    ("", None),
+    (None, None),
+    ("n/d", "n/d"),
+])
+def test_normalize_price(value, expected):
+    assert normalize_price(value) == expected
+
+
+def test_diff_names():
+    assert diff_names(["a", "b"], ["c", "a", "c", "d"]) == (["c", "d"], ["b"])
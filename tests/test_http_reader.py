@@ -0,0 +1,48 @@
+import pytest
+from benchmarks.fake_platform import FakePlatform, ENERGY_KEY, POWER_KEY
+from functions.http_reader import HttpConfigReader, parse_html
+
+
+@pytest.fixture
+def platform():
+    # Una configuración de cada tarifa: 2.0TD tiene la potencia de P3 deshabilitada y P4-P6 ocultas
+    with FakePlatform(configs=3, mix={"2.0TD": 1.0}) as p:
+        p.configs[1]["tariff"] = "3.0TD"
+        p.configs[1]["energy"] = [f"0.1{i}" for i in range(6)]
+        p.configs[1]["power"] = [f"0.0{i}" for i in range(6)]
+        yield p
+
+
+@pytest.fixture
+def reader(platform, cookies):
+    r = HttpConfigReader(platform.url, cookies)
+    yield r
+    r.close()
+
+
+def test_tree_builder_closes_implicit_tags():
+    root = parse_html("<table><tr><td>a<td>b<tr><td>c</table><p>uno<p>dos")
+    assert [[td.text for td in tr.findall("./td")] for tr in root.findall(".//tr")] == [["a", "b"], ["c"]]
+    assert [p.text for p in root.findall(".//p")] == ["uno", "dos"]
+
+
+def test_tree_builder_void_and_boolean_attributes():
+    root = parse_html('<select><option value="1">A<option value="2" selected>B</select><input disabled>texto')
+    assert root.find(".//option[@selected]").get("value") == "2"
+    assert len(root.find(".//select")) == 2
+    el = root.find(".//input")
+    assert el.get("disabled") == "disabled" and el.tail == "texto"
+
+
+def test_read_round_trip(platform, reader):
+    assert reader.get_config_list() == [c["name"] for c in platform.configs]
+    cfg = platform.configs[0]
+    last_update, data, tariff = reader.detect_config(cfg["name"], origin=True)
+    assert (last_update, tariff) == (cfg["changes"][-1], "2.0TD")
+    assert data[ENERGY_KEY][:3] == cfg["energy"]
+    assert data.writable["visible"] == [True, True, True, False, False, False]
+    assert data.writable["power"][:3] == [True, True, False]
+
+    assert reader.detect_config(platform.configs[1]["name"]) == (platform.configs[1]["changes"][-1], "3.0TD")
+    _, data, _ = reader.detect_config(platform.configs[1]["name"], origin=True)
+    assert data[POWER_KEY] == platform.configs[1]["power"]
@@ -0,0 +1,72 @@
+import pytest
+from benchmarks.fake_platform import ENERGY_KEY, POWER_KEY
+from functions.diff import diff_config
+from functions.http_reader import parse_html
+from functions.http_writer import HttpConfigWriter, HttpWriteError
+
+
+@pytest.fixture
+def writer(platform, cookies):
+    w = HttpConfigWriter(platform.url, cookies)
+    w.get_config_list()
+    yield w
+    w.close()
+
+
+def _prices(delta, periods=6, power=6):
+    return {"Periodo": [f"P{i + 1}" for i in range(periods)],
+            ENERGY_KEY: [f"{0.1 + delta + i / 100:.6f}" for i in range(periods)],
+            POWER_KEY: [f"{0.02 + delta + i / 100:.6f}" for i in range(power)]}
+
+
+def test_write_round_trip(platform, writer):
+    data = _prices(0.001)
+    report = writer.write("Config 0001", data, "2025-03-01")
+    assert len(report["cells"]) == 12
+    assert platform.configs[0]["energy"] == data[ENERGY_KEY]
+    last_update, read, tariff = writer.detect_config("Config 0001", origin=True)
+    assert (last_update, tariff) == ("2025-03-01", "3.0TD")
+    assert diff_config(data, read) == []
+
+
+def test_same_day_save_is_not_confirmed_without_a_new_change(platform, writer, monkeypatch):
+    monkeypatch.setattr(platform, "save_rate", lambda cfg, fields: None)
+    last = platform.configs[0]["changes"][-1]
+    with pytest.raises(HttpWriteError) as error:
+        writer.write("Config 0001", _prices(0.001), last)
+    assert error.value.sent
+
+
+def test_template_is_reused_only_after_two_configs_agree(platform, writer):
+    writer.write("Config 0001", _prices(0.001), "2025-03-01")
+    assert writer.templates == {}
+    writer.write("Config 0002", _prices(0.002), "2025-03-01")
+    assert "3.0TD" in writer.templates
+
+    writer.tariffs["Config 0003"] = "3.0TD"
+    before = platform.requests["GET powermanagement/newrate"]
+    old_power = list(platform.configs[2]["power"])
+    writer.write("Config 0003", _prices(0.003, power=2), "2025-03-02")
+    assert platform.requests["GET powermanagement/newrate"] == before
+    # Sin valores actuales, la potencia que no se escribe no se envía (y no se vacía)
+    assert platform.configs[2]["power"][2:] == old_power[2:]
+
+
+def test_value_does_not_interpolate_name():
+    form = parse_html('<form><input name="a\'b" value="1"><input name="c" value="2"></form>')
+    assert HttpConfigWriter._value(form, "a'b") == "1"
+    assert HttpConfigWriter._value(form, "x") == ""
+
+
+def test_locked_energy_input_is_skipped(platform, writer, monkeypatch):
+    render = platform.rate_form_page
+
+    def _locked(cfg):
+        return render(cfg).replace('name="energia_0"', 'name="energia_0" aria-readonly="true"')
+
+    monkeypatch.setattr(platform, "rate_form_page", _locked)
+    before = platform.configs[0]["energy"][0]
+    report = writer.write("Config 0001", _prices(0.001), "2025-03-01")
+    assert {"row": 0, "field": "energy"} in report["skipped"]
+    assert len(report["cells"]) == 11
+    assert platform.configs[0]["energy"][0] == before
@@ -0,0 +1,101 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from functions.browser_pool import PoolExhausted
+from functions.jobs import Job, Journal, JobManager
+
+
+def _job(tmp_path, events):
+    path = str(tmp_path / "job.jsonl")
+    journal = Journal(path)
+    for event in events:
+        journal.append({"ts": time.time(), **event})
+    return path
+
+
+def _created(destinations=("a", "b", "c")):
+    return {"event": "created", "kind": "replicate", "user": "ana", "account": "ana", "params": {
+        "destinations": list(destinations)}}
+
+
+def _result(destination, status, sent=False):
+    return {"event": "result", "result": {"destination": destination, "status": status, "sent": sent}}
+
+
+def test_replay_marks_unfinished_job_as_interrupted(tmp_path):
+    path = _job(tmp_path, [_created(), {"event": "started"}, {"event": "phase", "phase": "replication"},
+                           _result("a", "updated")])
+    job = Job.load(path)
+    assert job.status == "interrupted"
+    assert job.runs == 1
+    assert job.phase == "replication"
+    assert job.done() == {"a"}
+
+
+def test_replay_stops_at_truncated_line(tmp_path):
+    path = _job(tmp_path, [_created(), {"event": "started"}, _result("a", "updated")])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"event": "result", "res')
+    assert set(Job.load(path).results) == {"a"}
+
+
+def test_sent_results_are_not_repeated_on_resume(tmp_path):
+    path = _job(tmp_path, [_created(), {"event": "started"}, _result("a", "failed", sent=True),
+                           _result("b", "failed"), _result("c", "skipped")])
+    assert Job.load(path).done() == {"a", "c"}
+
+
+def test_compact_keeps_final_state(tmp_path):
+    path = _job(tmp_path, [_created(), {"event": "started"}, {"event": "phase", "phase": "replication"},
+                           _result("a", "failed"), {"event": "failed", "error": "caída"}, {"event": "started"},
+                           _result("a", "updated"), _result("b", "updated"), {"event": "finished"}])
+    before = Job.load(path)
+    before.compact()
+    after = Job.load(path)
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 7
+    assert (after.status, after.runs, after.error, after.results) == ("done", 2, None, before.results)
+
+
+def test_finished_journals_are_rotated(tmp_path):
+    old = _job(tmp_path, [_created(), {"event": "started"}, {"event": "finished"}])
+    with open(old, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": time.time() - 40 * 86400, "event": "finished"}) + "\n")
+    recent = str(tmp_path / "recent.jsonl")
+    os.rename(_job(tmp_path, [_created(), {"event": "started"}, {"event": "finished"}]), recent)
+    manager = JobManager(None, root=str(tmp_path), retention_days=30)
+    assert not os.path.exists(old)
+    assert [j["id"] for j in manager.jobs()] == ["recent"]
+
+
+def test_job_workers_leave_a_browser_for_the_ui(tmp_path):
+    class Pool:
+        size = 4
+
+    manager = JobManager(Pool(), root=str(tmp_path))
+    job = Job.load(_job(tmp_path, [_created()]))
+    job.params.update(workers=8, config_index={}, batch_budget=None)
+    assert manager._pool(job, ["a", "b", "c", "d", "e"]).workers == 3
+    assert manager._pool(job, ["a"]).workers == 1
+
+
+def test_exhausted_pool_fails_the_job_instead_of_waiting(tmp_path):
+    class Pool:
+        size = 2
+        timeouts = []
+
+        @contextmanager
+        def lease(self, user, pswd=None, timeout=None, tenant=None):
+            self.timeouts.append(timeout)
+            raise PoolExhausted("lleno")
+            yield
+
+    manager = JobManager(Pool(), root=str(tmp_path))
+    job = Job.load(_job(tmp_path, [_created()]))
+    job.params.update(workers=1, config_index={}, batch_budget=None, skip_matching=True, data_config={},
+                      last_updated="2025-01-01")
+    manager._run(job)
+    assert job.status == "failed"
+    assert "PoolExhausted" in job.error
+    assert Pool.timeouts and None not in Pool.timeouts
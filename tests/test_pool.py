@@ -0,0 +1,92 @@
+import pytest
+from functions.browser_pool import BrowserPool, PoolExhausted
+from functions.management import account_key
+from functions.pool import ManagementPool
+from functions.waits import Deadline, OperationTimeout
+
+
+class FakeManage:
+    def __init__(self):
+        self.user = self.pswd = self.tenant = None
+        self.config_index = {}
+        self.closed = False
+
+    @property
+    def account(self):
+        return account_key(self.user, self.tenant)
+
+
+class FakeBrowserPool(BrowserPool):
+    """BrowserPool sin Chrome: el login sólo acepta la contraseña de cada usuario en passwords"""
+
+    def __init__(self, size, passwords):
+        super().__init__(size)
+        self.passwords = passwords
+
+    def _launch(self):
+        return FakeManage()
+
+    def _authenticate(self, manage, user, pswd, tenant=None):
+        if self.passwords.get(user) != pswd:
+            raise RuntimeError("Login fallido")
+        manage.user, manage.pswd, manage.tenant = user, pswd, tenant
+        return manage
+
+    @staticmethod
+    def _is_healthy(manage):
+        return not manage.closed
+
+    def _dispose(self, manage):
+        manage.closed = True
+
+
+def test_wrong_password_is_rejected_without_closing_idle_browsers():
+    pool = FakeBrowserPool(2, {"ana": "ok"})
+    with pool.lease("ana", "ok") as manage:
+        pass
+    with pytest.raises(RuntimeError):
+        pool.checkout("ana", "mal", timeout=0)
+    assert not manage.closed
+    assert pool.checkout("ana", "ok") is manage
+
+
+def test_wrong_password_does_not_evict_other_accounts():
+    pool = FakeBrowserPool(1, {"ana": "ok", "luis": "ok"})
+    with pool.lease("luis", "ok") as other:
+        pass
+    pool._credentials["ana"] = "ok"
+    with pytest.raises(PoolExhausted):
+        pool.checkout("ana", "mal", timeout=0)
+    assert not other.closed
+
+
+def test_forget_closes_idle_browsers():
+    pool = FakeBrowserPool(2, {"ana": "ok"})
+    with pool.lease("ana", "ok") as manage:
+        pass
+    pool.forget("ana")
+    assert manage.closed
+    assert pool.stats()["alive"] == 0
+
+
+class ExhaustedPool:
+    size = 2
+
+    def checkout(self, *args, **kwargs):
+        raise PoolExhausted("lleno")
+
+
+def test_acquire_gives_up_when_shared_pool_is_exhausted():
+    pool = ManagementPool("ana", "ok", browser_pool=ExhaustedPool())
+    with pytest.raises(PoolExhausted):
+        pool._acquire(exhausted_wait=0)
+    assert pool._instances == []
+
+
+def test_acquire_stops_at_batch_deadline():
+    pool = ManagementPool("ana", "ok", browser_pool=ExhaustedPool())
+    deadline = Deadline(0.01)
+    while not deadline.expired():
+        pass
+    with pytest.raises(OperationTimeout):
+        pool._acquire(deadline)
@@ -0,0 +1,95 @@
+import pytest
+from selenium.common.exceptions import StaleElementReferenceException
+from functions.instrumentation import tracer
+from functions.management import ConfigNotFoundError, SaveSentError
+from functions.replication import _diff_report, _is_transient, replicate_one, skipped_result
+from functions.waits import Deadline, Waits, OperationTimeout
+
+
+class FakeManagement:
+    """Sólo lo que usa replicate_one: esperas, relleno y guardado"""
+
+    def __init__(self, fill_errors=(), save_error=None, deadline=None):
+        self.waits = Waits(deadline=deadline)
+        self.fill_errors = list(fill_errors)
+        self.save_error = save_error
+        self.fills = 0
+        self.saves = 0
+
+    def fill_replica(self, destination, data_config, last_updated):
+        self.fills += 1
+        if self.fill_errors:
+            raise self.fill_errors.pop(0)
+        return {"cells": [{"row": 0, "field": "energy", "value": "0.1"}], "mismatches": []}
+
+    def save_replica(self):
+        self.saves += 1
+        if self.save_error is not None:
+            raise self.save_error
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr("tenacity.nap.time.sleep", lambda seconds: None)
+
+
+def test_fill_is_retried_and_saved_once():
+    manage = FakeManagement(fill_errors=[StaleElementReferenceException("stale")])
+    result = replicate_one(manage, "cfg", {}, "2025-01-01")
+    assert result["status"] == "updated"
+    assert result["attempts"] == 2
+    assert (manage.fills, manage.saves) == (2, 1)
+    assert result["written"] == 1
+
+
+def test_error_after_save_click_is_not_retried():
+    manage = FakeManagement(save_error=SaveSentError("timeout tras guardar"))
+    result = replicate_one(manage, "cfg", {}, "2025-01-01")
+    assert result["status"] == "failed"
+    assert result["sent"] is True
+    assert (manage.fills, manage.saves) == (1, 1)
+
+
+def test_error_before_save_click_is_not_sent():
+    manage = FakeManagement(save_error=OperationTimeout("save", "el botón Guardar", 20.0))
+    result = replicate_one(manage, "cfg", {}, "2025-01-01")
+    assert result["status"] == "failed"
+    assert result["sent"] is False
+    assert manage.saves == 1
+
+
+def test_expired_deadline_is_not_retried():
+    deadline = Deadline(0.001)
+    while not deadline.expired():
+        pass
+    manage = FakeManagement(fill_errors=[OperationTimeout("form", "la tabla", 0.0)] * 3, deadline=deadline)
+    result = replicate_one(manage, "cfg", {}, "2025-01-01")
+    assert result["status"] == "failed"
+    assert manage.fills == 1 and manage.saves == 0
+
+
+def test_is_transient():
+    assert _is_transient(StaleElementReferenceException("x"))
+    assert _is_transient(OperationTimeout("page", "algo", 5.0))
+    assert not _is_transient(OperationTimeout("lote", "algo", 0.0))
+    assert not _is_transient(ConfigNotFoundError("no existe"))
+    assert not _is_transient(ValueError("x"))
+
+
+def test_same_prices_with_stale_date_still_differ():
+    data = {"Periodo": ["P1"], "Energía": ["0.1"], "Potencia": ["0.2"]}
+    stale = _diff_report("cfg", data, ("2025-01-01", data, "2.0TD"), last_updated="2025-02-01")
+    assert stale["status"] == "differs"
+    assert stale["differences"] == [{"period": None, "field": "fecha", "origin": "2025-02-01",
+                                     "destination": "2025-01-01"}]
+    same = _diff_report("cfg", data, ("2025-02-01", data, "2.0TD"), last_updated="2025-02-01")
+    assert same["status"] == "matches"
+    assert skipped_result(same)["last_updated"] == "2025-02-01"
+
+
+def test_each_destination_gets_a_replicate_to_span():
+    replicate_one(FakeManagement(), "cfg-ok", {}, "2025-01-01")
+    replicate_one(FakeManagement(save_error=SaveSentError("timeout")), "cfg-ko", {}, "2025-01-01")
+    spans = {s["target"]: s for s in tracer.recent() if s["operation"] == "replicate_to"}
+    assert spans["cfg-ok"]["error"] is None
+    assert spans["cfg-ko"]["error"].startswith("SaveSentError")
@@ -0,0 +1,41 @@
+import pytest
+from functions.snapshot import SnapshotStore, drift, price_rows, to_frame
+
+ENERGY = "(precio/unidad energía)"
+POWER = "(precio/unidad potencia/día)"
+
+
+def _rows(cfg, energy, power, tariff="2.0TD"):
+    data = {"Periodo": [f"P{i + 1}" for i in range(len(energy))], ENERGY: energy, POWER: power}
+    return price_rows(cfg, "01/02/2025", data, tariff)
+
+
+def test_price_rows_parse_prices():
+    rows = _rows("a", ["0,1234", ""], ["0.02", "n/d"])
+    assert [(r["energy"], r["power"]) for r in rows] == [(0.1234, 0.02), (None, None)]
+    assert rows[1]["power_raw"] == "n/d"
+
+
+def test_store_round_trip(tmp_path):
+    store = SnapshotStore(root=str(tmp_path))
+    assert store.load("ana") is None
+    store.write("ana", _rows("a", ["0.1"], ["0.01"]), taken_at=1_700_000_000)
+    path = store.write("ana", _rows("a", ["0.2"], ["0.01"]), taken_at=1_700_000_100)
+    assert store.paths("ana")[-1] == path
+    df = store.load("ana")
+    assert df["energy"].tolist() == [0.2]
+    assert str(df["last_updated_date"][0]) == "2025-02-01"
+
+
+def test_drift_against_origin_config():
+    df = to_frame(_rows("origen", ["0.1", "0.2"], ["0.01", "0.02"])
+                  + _rows("igual", ["0.1", "0.2"], ["0.01", "0.02"])
+                  + _rows("distinta", ["0.1", "0.25"], ["0.01", ""])
+                  + _rows("otra", ["0.5", "0.5"], ["0.5", "0.5"], tariff="3.0TD"))
+    result = drift(df, "origen", tariff="2.0TD")
+    assert result[["config", "period", "field"]].values.tolist() == [
+        ["distinta", "P2", "energy"], ["distinta", "P2", "power"]]
+    assert result["delta"][0] == pytest.approx(0.05)
+
+    assert drift(df, "origen", tariff="2.0TD", field="energy", tolerance=0.1).empty
+    assert drift(df, "origen", period="P1")["config"].tolist() == ["otra", "otra"]
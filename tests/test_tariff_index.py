@@ -0,0 +1,40 @@
+from functions.tariff_index import TariffIndex
+
+
+def _index():
+    return TariffIndex(["b", "a", "c", "d"], tariffs={"a": "2.0TD", "b": "3.0TD", "c": "2.0TD", "x": "2.0TD"},
+                       last_updated={"a": "2025-01-01", "c": "2024-12-01"})
+
+
+def test_groups_configs_by_tariff():
+    index = _index()
+    assert index.compatible("2.0TD") == ["a", "c"]
+    assert index.compatible("2.0TD", exclude="a") == ["c"]
+    assert index.incompatible("2.0TD") == ["b"]
+    assert index.pending() == ["d"]
+
+
+def test_set_moves_config_between_tariffs():
+    index = _index()
+    index.set("c", "3.0TD")
+    assert index.compatible("2.0TD") == ["a"]
+    assert index.compatible("3.0TD") == ["b", "c"]
+    index.set("c", None)
+    assert index.compatible("3.0TD") == ["b"]
+    assert "c" not in index.pending()
+
+
+def test_set_configs_reports_changes_and_unindexes_removed():
+    index = _index()
+    assert index.set_configs(["a", "b", "e"]) == (["e"], ["c", "d"])
+    assert index.compatible("2.0TD") == ["a"]
+    assert "c" not in index.tariffs and "c" not in index.last_updated
+
+
+def test_labels_follow_reference_date():
+    index = _index()
+    assert index.label("a", "2025-01-01") == "✅ a - 2025-01-01 (actualizada)"
+    assert index.label("a", "2025-02-01") == "⚠️ a - 2025-01-01 (pendiente)"
+    assert index.label("d") == "❓ d - -- (sin info)"
+    index.set_last_updated("a", "2025-02-01")
+    assert index.label("a", "2025-02-01") == "✅ a - 2025-02-01 (actualizada)"
@@ -0,0 +1,50 @@
+import pytest
+from functions.throttle import AdaptiveLimiter
+
+
+def _limiter(**kwargs):
+    return AdaptiveLimiter(**{"rate": 1000, "max_in_flight": 8, "cooldown": 0, "max_backoff": 0.01, **kwargs})
+
+
+def test_error_halves_the_limit_and_pauses():
+    limiter = _limiter(initial=8)
+    limiter.acquire()
+    limiter.release(0.1, error="HTTP 429")
+    assert limiter.limit == 4
+    assert limiter.decisions[-1]["action"] == "decrease"
+    assert limiter.stats()["errors"] == 1
+
+
+def test_errors_within_cooldown_only_back_off():
+    limiter = _limiter(initial=8, cooldown=60)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(0.1, error="HTTP 503")
+    assert limiter.limit == 4
+    assert [d["action"] for d in limiter.decisions] == ["decrease", "backoff"]
+
+
+def test_fast_saturated_window_increases_the_limit():
+    limiter = _limiter(initial=1, window=2, target_latency=1.0)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 2
+    assert limiter.decisions[-1]["action"] == "increase"
+
+
+def test_slow_window_decreases_the_limit():
+    limiter = _limiter(initial=4, window=2, target_latency=0.1)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(1.0)
+    assert limiter.limit == 3
+
+
+def test_slot_records_the_exception_as_error():
+    limiter = _limiter(initial=2)
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("caída")
+    assert limiter.stats()["errors"] == 1
+    assert limiter.stats()["in_flight"] == 0
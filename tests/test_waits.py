@@ -0,0 +1,24 @@
+import pytest
+from functions.waits import DEFAULT_BUDGETS, Deadline, Waits, parse_budgets
+
+
+def test_parse_budgets():
+    assert parse_budgets("login=40, save=7.5,") == {"login": 40.0, "save": 7.5}
+    assert parse_budgets(None) == {}
+    with pytest.raises(ValueError):
+        parse_budgets("guardar=10")
+    with pytest.raises(ValueError):
+        parse_budgets("login")
+
+
+def test_env_budgets_apply_unless_overridden(monkeypatch):
+    monkeypatch.setenv("WAIT_BUDGETS", "login=45,form=5")
+    waits = Waits({"form": 8})
+    assert waits.budgets["login"] == 45
+    assert waits.budgets["form"] == 8
+    assert waits.budgets["save"] == DEFAULT_BUDGETS["save"]
+
+
+def test_timeout_is_capped_by_deadline():
+    waits = Waits({"page": 20}, deadline=Deadline(1))
+    assert waits.timeout_for("page") <= 1